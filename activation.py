@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+
+import speech_recognition as sr
+
+from endpointing import load_keyword_spotter
+
+# Phrase that wakes the assistant, and how long it stays awake after each phrase
+WAKE_PHRASE = os.environ.get('VK_WAKE_PHRASE', "hey keyboard")
+WAKE_WINDOW = 8.0
+
+# Hold this key while speaking; a pynput Key name (scroll_lock, f9, ctrl_r) or a single character
+PUSH_TO_TALK_KEY = os.environ.get('VK_PUSH_TO_TALK', "scroll_lock")
+# A phrase still counts if the key was let go this long before it was closed (the closing pause)
+RELEASE_GRACE = 1.0
+
+ACTIVATION_MODES = ('always', 'wake', 'push')
+
+
+class ActivationGate:
+    """Decides which captured phrases are meant for the recognizer
+
+    The listener calls ``allow(audio)`` for every phrase before it is
+    recognized; phrases that are not let through never reach the backend.
+    ``stats`` counts both, with the audio seconds each side, so ``summary``
+    can show the recognition work saved.
+    """
+
+    name = 'always'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {'forwarded': 0, 'gated': 0, 'wakes': 0, 'seconds_forwarded': 0.0,
+                          'seconds_gated': 0.0, 'check_seconds': 0.0}
+
+    def prepare(self, backend, sample_rate):
+        """Called at the start of each session with the recognizer it feeds and the microphone rate"""
+        self.reset()
+
+    def allow(self, audio):
+        start = time.perf_counter()
+        allowed = self._allow(audio)
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        with self._lock:
+            stats = self.stats
+            stats['check_seconds'] += time.perf_counter() - start
+            if allowed:
+                stats['forwarded'] += 1
+                stats['seconds_forwarded'] += seconds
+            else:
+                stats['gated'] += 1
+                stats['seconds_gated'] += seconds
+        return allowed
+
+    def _allow(self, audio):
+        return True
+
+    def strip(self, text):
+        """The recognized text without any activation words"""
+        return text
+
+    def close(self):
+        pass
+
+    def summary(self, recognize_ms=0.0):
+        """Totals plus the recognizer time the gated phrases would have taken
+
+        ``recognize_ms`` is the backend's mean time per phrase.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        checked = stats['forwarded'] + stats['gated']
+        return {
+            'mode': self.name,
+            'forwarded': stats['forwarded'],
+            'gated': stats['gated'],
+            'wakes': stats['wakes'],
+            'gated_share': round(stats['gated'] / checked, 3) if checked else 0.0,
+            'seconds_gated': round(stats['seconds_gated'], 1),
+            'check_ms': round(1000 * stats['check_seconds'] / checked, 2) if checked else 0.0,
+            'saved_ms': round(stats['gated'] * recognize_ms, 1),
+        }
+
+
+class WakeWordGate(ActivationGate):
+    """Lets phrases through for ``window`` seconds after the wake phrase is heard
+
+    Asleep, each phrase is decoded by a Vosk grammar that knows only the
+    wake phrase (everything else comes out as [unk]), which costs a few
+    milliseconds on one core. Saying the wake phrase alone wakes the
+    assistant; saying it before a command ("hey keyboard go left") wakes it
+    and forwards that phrase too, with the wake words stripped from the
+    result. Every forwarded phrase keeps it awake for another ``window``.
+    """
+
+    name = 'wake'
+
+    def __init__(self, phrase=WAKE_PHRASE, window=WAKE_WINDOW):
+        self.phrase = phrase.lower().split()
+        self.window = window
+        self._backend = None
+        self._spotters = {}
+        self._awake_until = 0.0
+        super().__init__()
+
+    def prepare(self, backend, sample_rate):
+        super().prepare(backend, sample_rate)
+        self._awake_until = 0.0
+        if backend is not self._backend:
+            self._spotters = {}
+            self._backend = backend
+        # Fails early, with the reason, when Vosk or its model is missing
+        self._spotter(sample_rate)
+
+    def _spotter(self, sample_rate):
+        spotter = self._spotters.get(sample_rate)
+        if spotter is None:
+            spotter = load_keyword_spotter([" ".join(self.phrase)], self._backend, sample_rate)
+            self._spotters[sample_rate] = spotter
+        return spotter
+
+    def _allow(self, audio):
+        now = time.monotonic()
+        if now < self._awake_until:
+            self._awake_until = now + self.window
+            return True
+        spotter = self._spotter(audio.sample_rate)
+        spotter.reset()
+        spotter.accept(audio.get_raw_data(convert_width=2))
+        words = spotter.finish().split()
+        index = self._find(words)
+        if index is None:
+            return False
+        with self._lock:
+            self.stats['wakes'] += 1
+        self._awake_until = now + self.window
+        # Anything said after the wake phrase is worth recognizing
+        return index + len(self.phrase) < len(words)
+
+    def _find(self, words):
+        size = len(self.phrase)
+        for index in range(len(words) - size + 1):
+            if words[index:index + size] == self.phrase:
+                return index
+        return None
+
+    def strip(self, text):
+        words = text.split()
+        if words[:len(self.phrase)] != self.phrase:
+            return text
+        return " ".join(words[len(self.phrase):])
+
+
+class PushToTalkGate(ActivationGate):
+    """Lets through only phrases spoken while ``hotkey`` is held down
+
+    The key is watched globally with pynput (``pip install pynput``). A
+    phrase counts if the key was down at any point while it was spoken,
+    allowing ``grace`` seconds for the pause that closes it after release.
+    """
+
+    name = 'push'
+
+    def __init__(self, hotkey=PUSH_TO_TALK_KEY, grace=RELEASE_GRACE):
+        self.hotkey = hotkey
+        self.grace = grace
+        self._listener = None
+        self._held = False
+        self._released = float('-inf')
+        super().__init__()
+
+    def prepare(self, backend, sample_rate):
+        super().prepare(backend, sample_rate)
+        if self._listener is not None:
+            return
+        try:
+            from pynput import keyboard
+        except ImportError:
+            raise sr.RequestError("missing pynput module: pip install pynput for push-to-talk")
+        if len(self.hotkey) == 1:
+            target = keyboard.KeyCode.from_char(self.hotkey)
+        else:
+            try:
+                target = keyboard.Key[self.hotkey]
+            except KeyError:
+                raise ValueError(f"Unknown push-to-talk key '{self.hotkey}'")
+
+        def on_press(key):
+            if key == target:
+                self._held = True
+
+        def on_release(key):
+            if key == target:
+                self._held = False
+                self._released = time.monotonic()
+
+        self._listener = keyboard.Listener(on_press=on_press, on_release=on_release)
+        self._listener.daemon = True
+        self._listener.start()
+
+    def _allow(self, audio):
+        if self._held:
+            return True
+        spoken = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        return time.monotonic() - self._released <= spoken + self.grace
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+
+
+def create_gate(mode, phrase=WAKE_PHRASE, hotkey=PUSH_TO_TALK_KEY):
+    """The gate for one of ACTIVATION_MODES, or None to forward every phrase"""
+    if mode == 'always':
+        return None
+    if mode == 'wake':
+        return WakeWordGate(phrase)
+    if mode == 'push':
+        return PushToTalkGate(hotkey)
+    raise ValueError(f"Unknown activation mode '{mode}', choose from: {', '.join(ACTIVATION_MODES)}")
@@ -0,0 +1,164 @@
+import threading
+
+import speech_recognition as sr
+
+# Seconds of microphone audio kept in memory; readers further behind lose data
+RING_SECONDS = 30
+# A reader waiting this long for audio assumes the device has died
+READ_TIMEOUT = 5.0
+
+
+class AudioRingBuffer:
+    """Preallocated circular byte buffer addressed by absolute stream position
+
+    ``head`` is the total number of bytes ever written. Any range within the
+    last ``capacity`` bytes can be read back as memoryview slices without
+    copying; older audio has been overwritten.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._cond = threading.Condition()
+        self.head = 0
+        self.closed = False
+
+    @property
+    def oldest(self):
+        return max(0, self.head - self.capacity)
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        with self._cond:
+            if len(data) > self.capacity:
+                self.head += len(data) - self.capacity
+                data = data[-self.capacity:]
+            offset = self.head % self.capacity
+            first = min(len(data), self.capacity - offset)
+            self._view[offset:offset + first] = data[:first]
+            if first < len(data):
+                self._view[:len(data) - first] = data[first:]
+            self.head += len(data)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def wait_for(self, position, timeout=None):
+        """Block until ``position`` bytes have been written; False on timeout or close"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.head >= position or self.closed, timeout)
+            return self.head >= position
+
+    def views(self, start, end):
+        """One or two memoryviews covering [start, end); valid until overwritten"""
+        if start < self.oldest or end > self.head:
+            raise ValueError(f"audio range {start}-{end} is no longer buffered")
+        offset = start % self.capacity
+        length = end - start
+        if offset + length <= self.capacity:
+            return (self._view[offset:offset + length],)
+        first = self.capacity - offset
+        return (self._view[offset:], self._view[:length - first])
+
+    def copy(self, start, end):
+        """The bytes in [start, end), clamped to what is still buffered"""
+        with self._cond:
+            return b"".join(self.views(max(start, self.oldest), end))
+
+
+class RingReader:
+    """File-like cursor over an AudioRingBuffer, usable as an AudioSource stream"""
+
+    def __init__(self, ring, position, sample_width):
+        self.ring = ring
+        self.position = position
+        self.sample_width = sample_width
+        self.overruns = 0
+        self._scratch = bytearray()
+
+    def skip(self):
+        """Jump to the newest audio, discarding anything not yet read"""
+        self.position = self.ring.head
+
+    def _next(self, size):
+        end = self.position + size * self.sample_width
+        if not self.ring.wait_for(end, READ_TIMEOUT):
+            raise OSError("microphone stopped delivering audio")
+        if self.position < self.ring.oldest:
+            # Fell a whole ring behind: skip to the oldest audio still held
+            self.overruns += 1
+            self.position = self.ring.oldest
+            end = self.position + size * self.sample_width
+        start, self.position = self.position, end
+        return self.ring.views(start, end)
+
+    def read(self, size):
+        """``size`` frames as bytes, like pyaudio's Stream.read"""
+        return b"".join(self._next(size))
+
+    def read_view(self, size):
+        """``size`` frames without copying unless the ring wraps; valid until the next call"""
+        parts = self._next(size)
+        if len(parts) == 1:
+            return parts[0]
+        self._scratch[:] = parts[0]
+        self._scratch += parts[1]
+        return memoryview(self._scratch)
+
+
+class MicrophoneRing(sr.AudioSource):
+    """Microphone that records continuously into a ring buffer
+
+    PyAudio's callback thread writes every chunk into the ring, so audio that
+    arrives while a phrase is being recognized or typed is kept, and
+    ``stream`` reads on from exactly where the previous phrase ended. Works
+    anywhere an ``sr.Microphone`` does, including ``Recognizer.listen``.
+    """
+
+    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024, capacity_seconds=RING_SECONDS):
+        self._mic = sr.Microphone(device_index, sample_rate, chunk_size)
+        self.device_index = device_index
+        self.SAMPLE_RATE = self._mic.SAMPLE_RATE
+        self.SAMPLE_WIDTH = self._mic.SAMPLE_WIDTH
+        self.CHUNK = self._mic.CHUNK
+        self.ring = AudioRingBuffer(int(capacity_seconds * self.SAMPLE_RATE) * self.SAMPLE_WIDTH)
+        self.input_overflows = 0
+        self.audio = None
+        self.stream = None
+        self._pa_stream = None
+
+    def __enter__(self):
+        assert self.stream is None, "This audio source is already inside a context manager"
+        pyaudio = self._mic.pyaudio_module
+        self.audio = pyaudio.PyAudio()
+        try:
+            self._pa_stream = self.audio.open(
+                input_device_index=self.device_index, channels=1, format=self._mic.format,
+                rate=self.SAMPLE_RATE, frames_per_buffer=self.CHUNK, input=True,
+                stream_callback=self._callback,
+            )
+        except Exception:
+            self.audio.terminate()
+            raise
+        self.stream = RingReader(self.ring, self.ring.head, self.SAMPLE_WIDTH)
+        return self
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        pyaudio = self._mic.pyaudio_module
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        self.ring.write(in_data)
+        return None, pyaudio.paContinue
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._pa_stream.stop_stream()
+            self._pa_stream.close()
+        finally:
+            self.ring.close()
+            self.stream = None
+            self.audio.terminate()
@@ -0,0 +1,543 @@
+"""Headless benchmarks for the voice keyboard
+
+    python bench.py matcher     # compiled command matcher vs the old split/dict-chain path
+    python bench.py commands    # full command path into a virtual text buffer
+    python bench.py pipeline    # WAV corpus through VAD, recognition, commands and injection
+    python bench.py replay LOG  # a recorded session log through the command path again
+    python bench.py remote      # many simulated thin clients against a loopback recognition server
+
+The pipeline benchmark replays ``name.wav`` + ``name.txt`` fixtures (or a
+synthetic corpus) and writes per-stage latency percentiles, throughput and
+memory as JSON; pass ``--baseline`` with an earlier result to see the change.
+The replay benchmark re-plans every logged command against a virtual text
+buffer and reports any whose key events no longer match the log. The
+remote benchmark measures round trips and throughput of concurrent
+client sessions on one recognition server.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+import wave
+
+from commands import COMMAND_MATCHER, EDIT_KEYS, NAVIGATION_KEYS, SELECTION_KEYS, SPECIAL_KEYS, SYMBOLS, execute
+from injection import VirtualTextBuffer
+from preprocess import AudioPreprocessor, downmix, to_float, to_pcm16
+
+DICTATION = "the quick brown fox jumps over the lazy dog while we write some text".split()
+
+
+def legacy_segment(command):
+    """The pre-matcher parsing in test.py's process_command, minus the keystrokes"""
+    command = command.lower().strip()
+    results = []
+    separators = [' and ', ' then ', ', ', '; ']
+    commands = [command]
+    for separator in separators:
+        new_commands = []
+        for cmd in commands:
+            new_commands.extend(cmd.split(separator))
+        commands = [cmd.strip() for cmd in new_commands if cmd.strip()]
+    for single_command in commands:
+        if single_command in ['stop', 'stop listening', 'quit', 'exit']:
+            return results
+        if single_command in SPECIAL_KEYS:
+            results.append(('special', single_command))
+        elif single_command in NAVIGATION_KEYS:
+            results.append(('navigation', single_command))
+        elif single_command in SELECTION_KEYS:
+            results.append(('selection', single_command))
+        elif single_command in EDIT_KEYS:
+            results.append(('edit', single_command))
+        elif single_command in SYMBOLS:
+            results.append(('symbol', single_command))
+        else:
+            if not any(single_command in d for d in [SPECIAL_KEYS, NAVIGATION_KEYS, SELECTION_KEYS, EDIT_KEYS, SYMBOLS]):
+                results.append(('text', single_command))
+    return results
+
+
+def make_utterance(rng, commands):
+    """A long utterance mixing command phrases and dictated words, joined by 'and'"""
+    phrases = [phrase for phrase, (category, _) in COMMAND_MATCHER.phrases.items()
+               if category != 'stop' and '{' not in phrase]
+    parts = []
+    for _ in range(commands):
+        if rng.random() < 0.3:
+            parts.append(" ".join(rng.sample(DICTATION, 4)))
+        else:
+            parts.append(rng.choice(phrases))
+    return " and ".join(parts)
+
+
+def bench_matcher(args):
+    rng = random.Random(args.seed)
+    print(f"{'commands':>8} {'legacy us':>10} {'matcher us':>11} {'speedup':>8}")
+    for size in args.sizes:
+        utterances = [make_utterance(rng, size) for _ in range(20)]
+        legacy = min(timeit.repeat(lambda: [legacy_segment(u) for u in utterances], number=args.number, repeat=3))
+        matcher = min(timeit.repeat(lambda: [COMMAND_MATCHER.segment(u) for u in utterances], number=args.number, repeat=3))
+        per_call = 1e6 / (args.number * len(utterances))
+        print(f"{size:>8} {legacy * per_call:>10.1f} {matcher * per_call:>11.1f} {legacy / matcher:>7.2f}x")
+
+
+def bench_commands(args):
+    rng = random.Random(args.seed)
+    utterances = [make_utterance(rng, rng.randint(1, args.max_commands)) for _ in range(args.utterances)]
+    buffer = VirtualTextBuffer()
+    commands = 0
+    start = time.perf_counter()
+    for utterance in utterances:
+        result, _ = execute(utterance, buffer)
+        commands += result.count(" | ") + 1
+    elapsed = time.perf_counter() - start
+    print(f"utterances: {len(utterances)}  commands: {commands}  keystrokes: {buffer.keystrokes}")
+    print(f"{len(utterances) / elapsed:,.0f} utterances/s  {commands / elapsed:,.0f} commands/s  "
+          f"final buffer: {len(buffer.text)} chars, {len(buffer.undo_stack)} undo steps")
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def synthesize_corpus(directory, count, seed, sample_rate=16000):
+    """Write ``count`` speech-like WAV fixtures with command/dictation transcripts"""
+    import numpy as np
+
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+    for index in range(count):
+        transcript = make_utterance(rng, rng.randint(1, 4)).replace(" and ", " ")
+        words = len(transcript.split())
+        voiced = int(sample_rate * min(4.5, 0.25 + 0.3 * words))
+        t = np.arange(voiced) / sample_rate
+        f0 = rng.uniform(100, 220)
+        # Harmonics under a syllable-rate envelope, padded with room noise
+        tone = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 5))
+        envelope = 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3, 6) * t) ** 2
+        speech = 6000 * tone * envelope * np.hanning(voiced)
+        pad = np.zeros(int(sample_rate * 0.6))
+        audio = np.concatenate([pad, speech, pad]) + noise.normal(0, 150, voiced + 2 * pad.size)
+        name = os.path.join(directory, f"utterance_{index:04d}")
+        with wave.open(name + ".wav", "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.writeframes(np.clip(audio, -32768, 32767).astype(np.int16).tobytes())
+        with open(name + ".txt", "w", encoding="utf-8") as f:
+            f.write(transcript)
+
+
+def load_corpus(directory):
+    """[(name, pcm bytes, sample rate, sample width, transcript)] for every WAV with a transcript"""
+    corpus = []
+    for entry in sorted(os.listdir(directory)):
+        if not entry.endswith(".wav"):
+            continue
+        base = os.path.join(directory, entry[:-4])
+        if not os.path.exists(base + ".txt"):
+            continue
+        with wave.open(base + ".wav", "rb") as wav:
+            frames = wav.readframes(wav.getnframes())
+            rate, width, channels = wav.getframerate(), wav.getsampwidth(), wav.getnchannels()
+        if channels != 1:
+            frames = to_pcm16(downmix(to_float(frames, width), channels))
+            width = 2
+        with open(base + ".txt", encoding="utf-8") as f:
+            corpus.append((entry[:-4], frames, rate, width, f.read().strip()))
+    return corpus
+
+
+def segment_audio(frames, rate, width, chunk=1024, endpointer=None, pauses=None):
+    """Run one fixture through a fresh ring buffer + VAD, like the live capture thread
+
+    The silence waited before each segment was closed is appended to ``pauses``.
+    """
+    from audio_buffer import AudioRingBuffer, RingReader
+    from vad import SpeechSegmenter, VoiceActivityDetector
+
+    ring = AudioRingBuffer(len(frames) + chunk * width)
+    ring.write(frames)
+    ring.close()
+    reader = RingReader(ring, 0, width)
+    segmenter = SpeechSegmenter(VoiceActivityDetector(width), rate, width, endpointer=endpointer)
+    segments = []
+    while reader.position + chunk * width <= ring.head:
+        position = reader.position
+        span = segmenter.feed(reader.read_view(chunk), position)
+        if span:
+            segments.append(ring.copy(*span))
+            if pauses is not None:
+                pauses.append(segmenter.last_pause)
+    span = segmenter.flush(reader.position)
+    if span:
+        segments.append(ring.copy(*span))
+        if pauses is not None:
+            pauses.append(segmenter.last_pause)
+    return segments
+
+
+def percentiles(samples):
+    import numpy as np
+
+    if not samples:
+        return {'count': 0}
+    ms = np.array(samples) * 1000
+    return {
+        'count': len(samples),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def bench_pipeline(args):
+    import speech_recognition as sr
+
+    from commands import plan_actions
+    from endpointing import AdaptiveEndpointer, load_spotter
+    from recognizers import FakeRecognizer, create_recognizer
+
+    with tempfile.TemporaryDirectory() as scratch:
+        corpus_dir = args.corpus
+        if corpus_dir is None:
+            corpus_dir = scratch
+            synthesize_corpus(corpus_dir, args.synthesize, args.seed)
+        corpus = load_corpus(corpus_dir)
+    if not corpus:
+        raise SystemExit(f"No name.wav + name.txt fixtures found in {args.corpus}")
+
+    def endpointer(rate):
+        # A fresh endpointer per fixture; the spotter needs Vosk and a model
+        if not args.endpointing:
+            return None
+        spotter = load_spotter(COMMAND_MATCHER, backend, rate) if args.spotter else None
+        return AdaptiveEndpointer(COMMAND_MATCHER, spotter)
+
+    # The fake backend learns the exact segments the VAD cuts from each fixture
+    if args.backend == "fake":
+        backend = FakeRecognizer(delay=args.fake_delay)
+        for name, frames, rate, width, transcript in corpus:
+            segments = segment_audio(frames, rate, width, endpointer=endpointer(rate))
+            if segments:
+                audio = sr.AudioData(segments[0], rate, width)
+                if args.preprocess:
+                    audio = AudioPreprocessor(args.preprocess).process(audio)
+                backend.add(audio, transcript)
+    else:
+        backend = create_recognizer(args.backend)
+    preprocessor = None
+    if args.preprocess:
+        preprocessor = AudioPreprocessor(args.preprocess)
+
+    stages = {'vad': [], 'endpoint': [], 'preprocess': [], 'recognize': [], 'command': [], 'inject': [], 'total': [],
+              'response': []}
+    errors = {'no_speech': 0, 'unknown': 0, 'request': 0}
+    wer = []
+    buffer = VirtualTextBuffer()
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    utterances = 0
+    for _ in range(args.repeat):
+        for name, frames, rate, width, transcript in corpus:
+            t0 = time.perf_counter()
+            segments = segment_audio(frames, rate, width, endpointer=endpointer(rate), pauses=stages['endpoint'])
+            t1 = time.perf_counter()
+            stages['vad'].append(t1 - t0)
+            if not segments:
+                errors['no_speech'] += 1
+                continue
+            hypotheses = []
+            for segment in segments:
+                audio = sr.AudioData(segment, rate, width)
+                if preprocessor is not None:
+                    t1 = time.perf_counter()
+                    audio = preprocessor.process(audio)
+                    stages['preprocess'].append(time.perf_counter() - t1)
+                t1 = time.perf_counter()
+                try:
+                    text = backend.recognize(audio)
+                except sr.UnknownValueError:
+                    errors['unknown'] += 1
+                    continue
+                except sr.RequestError:
+                    errors['request'] += 1
+                    continue
+                t2 = time.perf_counter()
+                events, _, _ = plan_actions(text)
+                t3 = time.perf_counter()
+                buffer.send(events)
+                t4 = time.perf_counter()
+                stages['recognize'].append(t2 - t1)
+                stages['command'].append(t3 - t2)
+                stages['inject'].append(t4 - t3)
+                hypotheses.append(text)
+            stages['total'].append(time.perf_counter() - t0)
+            # From the end of speech to the last keystroke: the closing pause plus the processing
+            stages['response'].append(stages['endpoint'][-1] + stages['total'][-1])
+            wer.append(word_error_rate(transcript, " ".join(hypotheses)))
+            utterances += 1
+    elapsed = time.perf_counter() - start
+    memory = {'peak_rss_mb': peak_rss_mb()}
+    if args.memory:
+        memory['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+
+    results = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'config': {'backend': args.backend, 'corpus': args.corpus or f"synthetic:{args.synthesize}",
+                   'fixtures': len(corpus), 'repeat': args.repeat, 'endpointing': args.endpointing,
+                   'python': platform.python_version()},
+        'utterances': utterances,
+        'elapsed_s': round(elapsed, 3),
+        'utterances_per_s': round(utterances / elapsed, 1) if elapsed else None,
+        'stages': {stage: percentiles(samples) for stage, samples in stages.items()},
+        'errors': errors,
+        'word_error_rate': round(sum(wer) / len(wer), 4) if wer else None,
+        'memory': memory,
+    }
+    if preprocessor is not None:
+        results['preprocess'] = preprocessor.summary(results['stages']['recognize'].get('mean_ms', 0.0))
+    report(results, args.baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def report(results, baseline_path=None):
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(f"{results['utterances']} utterances in {results['elapsed_s']} s "
+          f"({results['utterances_per_s']} utterances/s), WER {results['word_error_rate']}, "
+          f"memory {results['memory']}")
+    if 'preprocess' in results:
+        prep = results['preprocess']
+        print(f"preprocessing: {prep['bytes_in']} -> {prep['bytes_out']} bytes ({100 * prep['reduction']:.0f}% less), "
+              f"{prep['seconds_trimmed']} s trimmed per phrase, about {prep['saved_ms']} ms saved per phrase")
+    print(f"{'stage':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}" + (f" {'p50 change':>11}" if baseline else ""))
+    for stage, stats in results['stages'].items():
+        if not stats['count']:
+            continue
+        line = f"{stage:>10} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}"
+        before = baseline and baseline['stages'].get(stage, {}).get('p50_ms')
+        if before:
+            line += f" {100 * (stats['p50_ms'] - before) / before:>+10.1f}%"
+        print(line)
+
+
+def normalized(events):
+    """Key events as they read back from the JSON log (tuples become lists)"""
+    return json.loads(json.dumps(events))
+
+
+def bench_replay(args):
+    from commands import plan_actions
+    from eventlog import read_events
+    from macros import MacroStore
+
+    records = [record for record in read_events(args.log)
+               if record.get('event') == 'command' and args.session in (None, record.get('session'))]
+    if not records:
+        raise SystemExit(f"No command records found in {args.log}")
+
+    stages = {'parse': [], 'inject': []}
+    logged = {'parse': [record['parse_ms'] / 1000 for record in records],
+              'inject': [record['inject_ms'] / 1000 for record in records]}
+    mismatches = []
+    with tempfile.TemporaryDirectory() as scratch:
+        # Macros recorded during the session are re-recorded, never the user's own file
+        macros = MacroStore(os.path.join(scratch, "macros.json"))
+        buffer = VirtualTextBuffer()
+        start = time.perf_counter()
+        for run in range(args.repeat):
+            for record in records:
+                t0 = time.perf_counter()
+                events, _, _ = plan_actions(record['text'], COMMAND_MATCHER, macros)
+                t1 = time.perf_counter()
+                buffer.send(events)
+                t2 = time.perf_counter()
+                stages['parse'].append(t1 - t0)
+                stages['inject'].append(t2 - t1)
+                if run == 0 and normalized(events) != record['actions']:
+                    mismatches.append((record, events))
+        elapsed = time.perf_counter() - start
+
+    sessions = len({record.get('session') for record in records})
+    print(f"{len(records)} commands from {sessions} sessions, {args.repeat} passes in {elapsed:.3f} s "
+          f"({len(records) * args.repeat / elapsed:,.0f} commands/s)")
+    print(f"{'stage':>10} {'logged p50':>11} {'logged p95':>11} {'replay p50':>11} {'replay p95':>11}")
+    for stage in stages:
+        before, after = percentiles(logged[stage]), percentiles(stages[stage])
+        print(f"{stage:>10} {before['p50_ms']:>11.3f} {before['p95_ms']:>11.3f} "
+              f"{after['p50_ms']:>11.3f} {after['p95_ms']:>11.3f}")
+    print(f"final buffer: {len(buffer.text)} chars, {buffer.keystrokes} keystrokes")
+    if args.show_text:
+        print(buffer.text)
+    print(f"{len(mismatches)} commands planned differently from the log")
+    for record, events in mismatches[:args.show_mismatches]:
+        print(f"  \"{record['text']}\"\n    logged: {record['actions']}\n    now:    {normalized(events)}")
+    if mismatches and args.check:
+        raise SystemExit(1)
+
+
+def bench_remote(args):
+    import threading
+
+    import speech_recognition as sr
+
+    from metrics import Metrics
+    from recognizers import FakeRecognizer
+    from remote import RecognitionServer, RemoteClient, decode_audio, encode_audio
+
+    with tempfile.TemporaryDirectory() as scratch:
+        synthesize_corpus(scratch, args.synthesize, args.seed)
+        corpus = load_corpus(scratch)
+    # The fake backend learns each phrase exactly as the server will decode it
+    backend = FakeRecognizer(delay=args.fake_delay)
+    phrases = []
+    for name, frames, rate, width, transcript in corpus:
+        segments = segment_audio(frames, rate, width)
+        if segments:
+            audio = sr.AudioData(segments[0], rate, width)
+            backend.add(decode_audio(encode_audio(audio)), transcript)
+            phrases.append((audio, transcript))
+
+    latencies = []
+    failures = {'mismatch': 0, 'busy': 0, 'error': 0}
+    stats = {'connects': 0, 'bytes_captured': 0, 'bytes_sent': 0}
+    lock = threading.Lock()
+
+    def session(index, port):
+        rng = random.Random(args.seed + index)
+        client = RemoteClient('127.0.0.1', port, client_id=f"client-{index}")
+        for _ in range(args.phrases):
+            audio, transcript = rng.choice(phrases)
+            t0 = time.perf_counter()
+            try:
+                answer = client.request(audio)
+                failure = None if answer['text'] == transcript else 'mismatch'
+            except sr.RequestError as e:
+                failure = 'busy' if type(e).__name__ == 'ServerBusy' else 'error'
+            elapsed = time.perf_counter() - t0
+            if args.new_connections:
+                client.close()
+            with lock:
+                latencies.append(elapsed)
+                if failure:
+                    failures[failure] += 1
+        client.close()
+        with lock:
+            for key in stats:
+                stats[key] += client.client_stats[key]
+
+    with tempfile.TemporaryDirectory() as macros_dir:
+        server = RecognitionServer(backend, port=0, macros_dir=macros_dir, metrics=Metrics()).start()
+        clients = [threading.Thread(target=session, args=(index, server.port)) for index in range(args.clients)]
+        start = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        server.server_close()
+
+    total = args.clients * args.phrases
+    latency = percentiles(latencies)
+    print(f"{args.clients} clients x {args.phrases} phrases in {elapsed:.3f} s ({total / elapsed:,.1f} phrases/s), "
+          f"at most {server.server_stats['max_active']} sessions at once, {stats['connects']} connections")
+    print(f"round trip: p50 {latency['p50_ms']:.2f} ms, p95 {latency['p95_ms']:.2f} ms, "
+          f"p99 {latency['p99_ms']:.2f} ms (recognition itself {args.fake_delay * 1000:.0f} ms)")
+    print(f"audio sent: {stats['bytes_sent']} of {stats['bytes_captured']} bytes captured "
+          f"({stats['bytes_captured'] / max(1, stats['bytes_sent']):.1f}x smaller)")
+    print(f"failures: {failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice keyboard benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    matcher = sub.add_parser("matcher", help="command matcher vs the legacy split/dict-chain parser")
+    matcher.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 20, 80], help="commands per utterance")
+    matcher.add_argument("--number", type=int, default=200, help="timed passes per repeat")
+    matcher.add_argument("--seed", type=int, default=0)
+    matcher.set_defaults(func=bench_matcher)
+
+    commands = sub.add_parser("commands", help="process utterances into a virtual text buffer")
+    commands.add_argument("--utterances", type=int, default=2000)
+    commands.add_argument("--max-commands", type=int, default=8, help="commands per utterance, at most")
+    commands.add_argument("--seed", type=int, default=0)
+    commands.set_defaults(func=bench_commands)
+
+    pipeline = sub.add_parser("pipeline", help="replay WAV fixtures through VAD, recognition, commands and injection")
+    pipeline.add_argument("--corpus", help="directory of name.wav + name.txt fixtures (default: synthetic)")
+    pipeline.add_argument("--synthesize", type=int, default=50, help="synthetic fixtures when no corpus is given")
+    pipeline.add_argument("--backend", default="fake", help="recognizer backend (default: fake)")
+    pipeline.add_argument("--fake-delay", type=float, default=0.0, help="simulated recognition time in seconds")
+    pipeline.add_argument("--preprocess", type=int, metavar="RATE",
+                          help="trim silence and resample phrases to RATE before recognition")
+    pipeline.add_argument("--endpointing", action="store_true",
+                          help="adapt the closing pause to commands and dictation instead of a fixed one")
+    pipeline.add_argument("--spotter", action="store_true",
+                          help="with --endpointing, spot commands with a Vosk grammar decoder")
+    pipeline.add_argument("--repeat", type=int, default=3, help="passes over the corpus")
+    pipeline.add_argument("--memory", action="store_true", help="trace Python allocations (slower)")
+    pipeline.add_argument("--output", help="write results as JSON")
+    pipeline.add_argument("--baseline", help="earlier JSON results to compare against")
+    pipeline.add_argument("--seed", type=int, default=0)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    replay = sub.add_parser("replay", help="feed a recorded session log back through the command path")
+    replay.add_argument("log", help="event log written with VK_EVENT_LOG or the session log option")
+    replay.add_argument("--session", help="only this session id (default: every session in the log)")
+    replay.add_argument("--repeat", type=int, default=1, help="passes over the log, for timing")
+    replay.add_argument("--show-text", action="store_true", help="print the final buffer text")
+    replay.add_argument("--show-mismatches", type=int, default=5, help="mismatching commands to print")
+    replay.add_argument("--check", action="store_true", help="exit with status 1 if any command changed")
+    replay.set_defaults(func=bench_replay)
+
+    remote = sub.add_parser("remote", help="simulated thin clients against a loopback recognition server")
+    remote.add_argument("--clients", type=int, default=50, help="concurrent client sessions")
+    remote.add_argument("--phrases", type=int, default=20, help="phrases each client sends, one after another")
+    remote.add_argument("--synthesize", type=int, default=20, help="synthetic phrases to draw from")
+    remote.add_argument("--fake-delay", type=float, default=0.05, help="simulated recognition time in seconds")
+    remote.add_argument("--new-connections", action="store_true",
+                        help="reconnect for every phrase instead of reusing the connection")
+    remote.add_argument("--seed", type=int, default=0)
+    remote.set_defaults(func=bench_remote)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
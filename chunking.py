@@ -0,0 +1,150 @@
+import concurrent.futures
+import threading
+
+import numpy as np
+import speech_recognition as sr
+
+from preprocess import to_float
+from recognizers import RecognizerBackend
+
+# Longest phrase the listener keeps when long dictation is chunked; fits in the 30 s ring
+LONG_PHRASE = 25.0
+
+# Target chunk length; phrases under one and a half of these are not split
+CHUNK_SECONDS = 5.0
+# Each chunk reaches this far into its neighbours, so a word cut at a boundary is heard whole once
+CHUNK_OVERLAP = 0.4
+# Cuts go at the quietest frame within this distance of each target
+SPLIT_SEARCH = 1.0
+SPLIT_FRAME = 0.02
+
+# Words repeated across a boundary that are looked for when stitching
+MAX_OVERLAP_WORDS = 6
+
+# Chunks recognized at once, across all phrases
+CHUNK_WORKERS = 4
+
+
+def split_points(samples, sample_rate, chunk=CHUNK_SECONDS, search=SPLIT_SEARCH):
+    """Sample offsets to cut at, one in the quietest frame near every ``chunk`` seconds"""
+    frame = max(1, int(sample_rate * SPLIT_FRAME))
+    frames = len(samples) // frame
+    if not frames:
+        return []
+    energy = np.square(samples[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    per_chunk = int(chunk / SPLIT_FRAME)
+    reach = int(search / SPLIT_FRAME)
+    points = []
+    last = 0
+    # The remainder after the last cut must be worth a chunk of its own
+    while last + per_chunk + per_chunk // 2 < frames:
+        target = last + per_chunk
+        low, high = max(last + 1, target - reach), min(frames, target + reach + 1)
+        cut = low + int(np.argmin(energy[low:high]))
+        points.append(cut * frame)
+        last = cut
+    return points
+
+
+def split_audio(audio, chunk=CHUNK_SECONDS, overlap=CHUNK_OVERLAP):
+    """The phrase as overlapping ``sr.AudioData`` chunks, split at low-energy points"""
+    raw, width, rate = audio.frame_data, audio.sample_width, audio.sample_rate
+    count = len(raw) // width
+    points = split_points(to_float(raw[:count * width], width), rate, chunk)
+    pad = int(overlap * rate)
+    bounds = zip([0] + points, points + [count])
+    return [sr.AudioData(raw[max(0, start - pad) * width:min(count, end + pad) * width], rate, width)
+            for start, end in bounds]
+
+
+def stitch(texts, max_overlap=MAX_OVERLAP_WORDS):
+    """Join chunk transcripts in order, dropping words both sides of a boundary heard
+
+    Returns (text, words removed).
+    """
+    words = []
+    removed = 0
+    for text in texts:
+        new = text.split()
+        longest = min(max_overlap, len(words), len(new))
+        overlap = next((size for size in range(longest, 0, -1) if words[-size:] == new[:size]), 0)
+        words.extend(new[overlap:])
+        removed += overlap
+    return " ".join(words), removed
+
+
+class ChunkedRecognizer(RecognizerBackend):
+    """Recognizes long phrases as overlapping chunks side by side
+
+    Phrases longer than one and a half ``chunk_seconds`` are cut at the
+    quietest points near every ``chunk_seconds``, each chunk padded with
+    ``overlap`` seconds of its neighbours. The chunks go to ``backend`` on
+    a thread pool at once, and the transcripts are joined in order with
+    words repeated across a boundary removed, so a 20-second paragraph takes
+    about as long as one chunk. Shorter phrases go straight through, and
+    so do command-mode constrained decodes, which phrases long enough to
+    chunk never need.
+    ``chunk_stats`` counts chunked phrases, chunks and words de-duplicated.
+    """
+
+    def __init__(self, backend, chunk_seconds=CHUNK_SECONDS, overlap=CHUNK_OVERLAP, workers=CHUNK_WORKERS):
+        super().__init__(backend.recognizer)
+        self.backend = backend
+        self.name = backend.name
+        self.supports_streaming = backend.supports_streaming
+        self.supports_vocabulary = backend.supports_vocabulary
+        self.workers = backend.workers
+        self.sample_rate = backend.sample_rate
+        self.chunk_seconds = chunk_seconds
+        self.overlap = overlap
+        # A worker pool behind the backend can take a chunk per process
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, backend.workers or 0),
+                                                           thread_name_prefix="vk-chunk")
+        self._lock = threading.Lock()
+        self.chunk_stats = {'phrases': 0, 'chunked': 0, 'chunks': 0, 'overlap_words': 0}
+
+    def set_hints(self, phrases):
+        self.backend.set_hints(phrases)
+
+    def _splits(self, audio):
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        return seconds >= 1.5 * self.chunk_seconds
+
+    def recognize_constrained(self, audio, phrases):
+        if self._splits(audio):
+            # No command runs this long, so it is dictation either way
+            raise sr.UnknownValueError()
+        return self.backend.recognize_constrained(audio, phrases)
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _recognize_scored(self, audio, hints=None):
+        chunks = split_audio(audio, self.chunk_seconds, self.overlap) if self._splits(audio) else []
+        with self._lock:
+            self.chunk_stats['phrases'] += 1
+        if len(chunks) < 2:
+            return self.backend.recognize_scored(audio, hints)
+        futures = [self._pool.submit(self._recognize_chunk, chunk, hints) for chunk in chunks]
+        # In chunk order, whichever finishes first
+        results = [future.result() for future in futures]
+        text, removed = stitch(text for text, _ in results)
+        with self._lock:
+            stats = self.chunk_stats
+            stats['chunked'] += 1
+            stats['chunks'] += len(chunks)
+            stats['overlap_words'] += removed
+        if not text:
+            raise sr.UnknownValueError()
+        heard = [confidence for chunk_text, confidence in results if chunk_text]
+        return text, min(heard)
+
+    def _recognize_chunk(self, audio, hints):
+        try:
+            return self.backend.recognize_scored(audio, hints)
+        except sr.UnknownValueError:
+            # A pause in the middle of dictation
+            return "", 0.0
+
+    def create_stream(self, sample_rate):
+        return self.backend.create_stream(sample_rate)
@@ -0,0 +1,549 @@
+import itertools
+import os
+import re
+import threading
+import time
+
+from eventlog import EVENT_LOG
+from grammar import FORMATS, GRAMMAR_PATH, NUMBER_WORDS, SLOTS, load_grammar, parse_count
+from macros import MacroStore
+from metrics import METRICS
+
+# The shipped grammar, compiled once; COMMAND_MATCHER follows later edits
+DEFAULT_GRAMMAR = load_grammar()
+
+# The command tables by category, for code written before the grammar file
+SPECIAL_KEYS = DEFAULT_GRAMMAR.commands('special')
+NAVIGATION_KEYS = DEFAULT_GRAMMAR.commands('navigation')
+SELECTION_KEYS = DEFAULT_GRAMMAR.commands('selection')
+EDIT_KEYS = DEFAULT_GRAMMAR.commands('edit')
+SYMBOLS = DEFAULT_GRAMMAR.commands('symbol')
+
+STOP_COMMANDS = DEFAULT_GRAMMAR.stop_commands
+JOINERS = set(DEFAULT_GRAMMAR.joiners)
+REPEAT_WORDS = set(DEFAULT_GRAMMAR.repeat_words)
+
+# Commands that cannot take a trailing repeat count
+NO_REPEAT = {'stop', 'format', 'macro', 'symbol'}
+# ...except with the repeat word, so "plus one" stays dictation but "plus three times" repeats
+TIMES_ONLY = {'symbol'}
+# Commands only heard at the start of the utterance or right after a joiner or command,
+# so "the capital of france" is dictation while "and capital paris" is not
+LEADING = {'format'}
+
+# Earlier tables win when the same phrase appears twice
+COMMAND_TABLES = DEFAULT_GRAMMAR.tables
+
+# Seconds between checks of the grammar file for edits
+RELOAD_CHECK_INTERVAL = 1.0
+
+_TOKEN_RE = re.compile(r"[,;]|[^\s,;]+")
+_END = object()
+_SLOTS = object()
+
+
+def tokenize(text):
+    text = text.lower()
+    if ',' in text or ';' in text:
+        return _TOKEN_RE.findall(text)
+    return text.split()
+
+
+class CommandMatcher:
+    """Token trie over every command phrase, compiled once
+
+    ``segment`` walks an utterance left to right and, at each word, follows
+    the trie as far as it goes, keeping the longest complete phrase ("close
+    square bracket" beats "square bracket"). Unmatched words become literal
+    text, so commands embedded in a dictated sentence are still found.
+    Joiner words next to a command are dropped; elsewhere they are dictation.
+    Slots such as {count} are edges that take any token their parser accepts
+    (see grammar.SLOTS); a literal word is always tried before a slot. Key
+    commands may be followed by a repeat count ("ten", "times ten").
+    """
+
+    def __init__(self, tables=COMMAND_TABLES, stop_commands=STOP_COMMANDS, joiners=JOINERS,
+                 repeat_words=REPEAT_WORDS):
+        self.joiners = set(joiners)
+        self.repeat_words = set(repeat_words)
+        # Words that can start a repeat count, besides digits
+        self._repeat_lead = self.repeat_words | set(NUMBER_WORDS)
+        self.standalone = set()
+        self.phrases = {}
+        self._root = {}
+        # Stop phrases only count said on their own, so "I said stop listening now" is dictation
+        for phrase in stop_commands:
+            self.add(phrase, 'stop', 'stop')
+            self.standalone.add(phrase)
+        for category, table in tables:
+            for phrase, action in table.items():
+                if phrase in self.phrases:
+                    continue
+                self.add(phrase, 'stop' if action == 'stop' else category, action)
+                if action == 'stop':
+                    self.standalone.add(phrase)
+
+    def add(self, phrase, category, action):
+        node = self._root
+        for token in tokenize(phrase):
+            if token[0] == '{' and token[-1] == '}':
+                edges = node.setdefault(_SLOTS, {})
+                node = edges.setdefault(token[1:-1], {})
+            else:
+                node = node.setdefault(token, {})
+        node[_END] = (category, phrase, action)
+        self.phrases[phrase] = (category, action)
+
+    def _longest(self, tokens, start, node=None, values=()):
+        """Longest phrase starting at tokens[start] as (end, match, slot values) or None
+
+        Follows literal words like the inline walk in ``segment`` and only
+        branches where a node has slot edges; on a tie the literal path wins.
+        """
+        if node is None:
+            node = self._root
+        n = len(tokens)
+        best = None
+        slot_best = None
+        i = start
+        while True:
+            if _END in node:
+                best = (i, node[_END], values)
+            if i == n:
+                break
+            slots = node.get(_SLOTS)
+            if slots is not None:
+                for slot, child in slots.items():
+                    value = SLOTS[slot](tokens[i])
+                    if value is not None:
+                        found = self._longest(tokens, i + 1, child, values + ((slot, value),))
+                        if found is not None and (slot_best is None or found[0] > slot_best[0]):
+                            slot_best = found
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            i += 1
+        if slot_best is not None and (best is None or slot_best[0] > best[0]):
+            return slot_best
+        return best
+
+    def _repeat(self, tokens, end, explicit=False):
+        """A repeat count after a command ("ten", "times ten", "ten times") as (count, end)
+
+        With ``explicit`` a bare number is not a count, only one with the repeat word.
+        """
+        n = len(tokens)
+        if end < n:
+            token = tokens[end]
+            if token in self.repeat_words and end + 1 < n:
+                count = parse_count(tokens[end + 1])
+                if count:
+                    return count, end + 2
+            count = parse_count(token)
+            if count:
+                if end + 1 < n and tokens[end + 1] in self.repeat_words:
+                    return count, end + 2
+                if not explicit:
+                    return count, end + 1
+        return 1, end
+
+    def check(self):
+        """A compiled matcher never changes; see ReloadingMatcher.check"""
+        return False
+
+    def is_command(self, text):
+        """True if the whole utterance is a single command phrase"""
+        tokens = tokenize(text)
+        match = self._longest(tokens, 0)
+        if match is None:
+            return False
+        end, (category, _, _), values = match
+        if values:
+            if end < len(tokens) and tokens[end] in self.repeat_words and any(slot == 'count' for slot, _ in values):
+                end += 1
+        elif category not in NO_REPEAT or category in TIMES_ONLY:
+            end = self._repeat(tokens, end, category in TIMES_ONLY)[1]
+        return end == len(tokens)
+
+    def is_prefix(self, text):
+        """True while a partial hypothesis may still turn into a command"""
+        tokens = tokenize(text)
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if i == len(tokens):
+                return True
+            if _END in node and (node[_END][0] not in NO_REPEAT or node[_END][0] in TIMES_ONLY) and len(tokens) - i <= 2:
+                # A repeat count may still be on its way
+                rest = tokens[i:]
+                if all(token in self.repeat_words or parse_count(token) for token in rest):
+                    return True
+            child = node.get(tokens[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            for slot, child in node.get(_SLOTS, {}).items():
+                if SLOTS[slot](tokens[i]) is not None:
+                    stack.append((child, i + 1))
+        return False
+
+    def is_final(self, text):
+        """True for a whole command that no longer command continues
+
+        "go left" is final although "go left 5" exists: a count follows
+        without a pause, so it does not count as a continuation. "copy" is
+        not, because "copy line" may be on its way.
+        """
+        if not self.is_command(text):
+            return False
+        tokens = tokenize(text)
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if i == len(tokens):
+                if any(key is not _END and key is not _SLOTS for key in node):
+                    return False
+                if any(slot != 'count' for slot in node.get(_SLOTS, {})):
+                    return False
+                continue
+            child = node.get(tokens[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            for slot, child in node.get(_SLOTS, {}).items():
+                if SLOTS[slot](tokens[i]) is not None:
+                    stack.append((child, i + 1))
+        return True
+
+    def segment(self, text, macros=None):
+        """Split an utterance into ('command', category, phrase, action, count) and ('text', words) items
+
+        A filled {count} or a trailing repeat count becomes ``count``; a filled
+        {word} is formatted and returned as a 'format' command whose action is
+        the text to type; a macro command's action is (action, name). Given
+        ``macros`` (anything supporting ``in``), playing a name that is not
+        among them is dictation, so "play music and dance" keeps its "and".
+        """
+        tokens = tokenize(text)
+        n = len(tokens)
+        root = self._root
+        joiners = self.joiners
+        standalone = self.standalone
+        repeat_lead = self._repeat_lead
+        items = []
+        words = []
+        after_command = False
+        i = 0
+        while i < n:
+            token = tokens[i]
+            if after_command and token in joiners:
+                i += 1
+                continue
+            node = root.get(token)
+            if node is None:
+                # Most words start no phrase at all
+                words.append(token)
+                after_command = False
+                i += 1
+                continue
+            # Inline longest-match walk
+            found = None
+            values = ()
+            j = i
+            while node is not None:
+                j += 1
+                if _END in node:
+                    end, found = j, node[_END]
+                if j == n:
+                    break
+                if _SLOTS in node and _takes_slot(node[_SLOTS], tokens[j]):
+                    # A slot can take the next word, so _longest branches from here
+                    longest = self._longest(tokens, j, node)
+                    if longest is not None:
+                        end, found, values = longest
+                    break
+                node = node.get(tokens[j])
+            if found is None or (found[1] in standalone and not _alone(tokens, i, end, joiners)) or (
+                    found[0] in LEADING and i and not after_command and tokens[i - 1] not in joiners):
+                words.append(token)
+                after_command = False
+                i += 1
+                continue
+            category, phrase, action = found
+            count = 1
+            if values:
+                for slot, value in values:
+                    if slot == 'count':
+                        count = value
+                        # "go left five times"
+                        if end < n and tokens[end] in self.repeat_words:
+                            end += 1
+                    elif slot == 'word':
+                        category, action = 'format', FORMATS[action](value)
+                    elif slot == 'name':
+                        action = (action, value)
+                if macros is not None and category == 'macro' and action[0] == 'play' and action[1] not in macros:
+                    words.append(token)
+                    after_command = False
+                    i += 1
+                    continue
+                # Report what was said, "go left 5" rather than "go left {count}"
+                phrase = " ".join(tokens[i:end])
+            elif end < n and (tokens[end] in repeat_lead or tokens[end][0] in _DIGITS) and (
+                    category not in NO_REPEAT or category in TIMES_ONLY):
+                count, end = self._repeat(tokens, end, category in TIMES_ONLY)
+                phrase = " ".join(tokens[i:end])
+            # Trailing joiners belong to the command that follows
+            while words and words[-1] in joiners:
+                words.pop()
+            if words:
+                items.append(('text', _join(words)))
+                words = []
+            items.append(('command', category, phrase, action, count))
+            after_command = True
+            i = end
+        if words:
+            items.append(('text', _join(words)))
+        return items
+
+
+def compile_grammar(grammar):
+    """CommandMatcher for a grammar.Grammar"""
+    return CommandMatcher(grammar.tables, grammar.stop_commands, grammar.joiners, grammar.repeat_words)
+
+
+class ReloadingMatcher:
+    """CommandMatcher for a grammar file, recompiled when the file changes
+
+    The file is checked at most every ``check_interval`` seconds, once per
+    utterance when plan_actions calls ``check()`` (the matching methods
+    themselves never touch the file), so an edit applies from the next
+    utterance on without restarting the listener. An edit that fails to
+    load keeps the previous grammar and is reported in ``last_error``.
+    ``stats`` counts reloads and times the last one.
+    """
+
+    def __init__(self, path=GRAMMAR_PATH, check_interval=RELOAD_CHECK_INTERVAL, grammar=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.stats = {'reloads': 0, 'errors': 0, 'reload_ms': None}
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._next_check = time.monotonic() + check_interval
+        self._signature = self._stat()
+        self.grammar = grammar or load_grammar(path)
+        self.matcher = compile_grammar(self.grammar)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reload if the file changed since the last look; True if it did"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            self._next_check = now + self.check_interval
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                return False
+            self._signature = signature
+            return self.reload()
+
+    def reload(self):
+        start = time.perf_counter()
+        try:
+            grammar = load_grammar(self.path)
+            matcher = compile_grammar(grammar)
+        except (OSError, ValueError) as e:
+            self.stats['errors'] += 1
+            self.last_error = str(e)
+            return False
+        self.grammar, self.matcher = grammar, matcher
+        self.last_error = None
+        self.stats['reloads'] += 1
+        self.stats['reload_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return True
+
+    @property
+    def phrases(self):
+        self.check()
+        return self.matcher.phrases
+
+    @property
+    def repeat_words(self):
+        return self.matcher.repeat_words
+
+    def segment(self, text, macros=None):
+        return self.matcher.segment(text, macros)
+
+    def is_command(self, text):
+        return self.matcher.is_command(text)
+
+    def is_prefix(self, text):
+        return self.matcher.is_prefix(text)
+
+    def is_final(self, text):
+        return self.matcher.is_final(text)
+
+    @property
+    def joiners(self):
+        return self.matcher.joiners
+
+    def help_markdown(self):
+        self.check()
+        return self.grammar.help_markdown()
+
+
+_DIGITS = frozenset("0123456789")
+
+
+def _takes_slot(slots, token):
+    for slot in slots:
+        if SLOTS[slot](token) is not None:
+            return True
+    return False
+
+
+def _alone(tokens, start, end, joiners):
+    before = start == 0 or tokens[start - 1] in joiners
+    after = end == len(tokens) or tokens[end] in joiners
+    return before and after
+
+
+def _join(words):
+    text = " ".join(words)
+    if ',' in words or ';' in words:
+        text = text.replace(" ,", ",").replace(" ;", ";")
+    return text
+
+
+# Compiled once at import, recompiled whenever grammar.toml is edited
+COMMAND_MATCHER = ReloadingMatcher(grammar=DEFAULT_GRAMMAR)
+
+# Macros recorded by voice, shared by every keyboard
+MACROS = MacroStore()
+
+
+def plan_actions(text, matcher=COMMAND_MATCHER, macros=MACROS):
+    """Turn an utterance into (key events, result messages, stop requested)
+
+    Key events are ('write', text), ('press', [keys]) and ('hotkey', [keys]);
+    a command with a count repeats its keys.
+    Everything before a stop command is still planned, as before.
+    While a macro is being recorded in ``macros`` the planned events are
+    added to it, and playing a macro splices its stored events in.
+    """
+    events = []
+    results = []
+    stop = False
+    # Events from here on belong to the macro being recorded
+    mark = 0 if macros.recording is not None else None
+    # Grammar edits are picked up between utterances, never in the middle of one
+    matcher.check()
+    for item in matcher.segment(text, macros):
+        if item[0] == 'text':
+            events.append(('write', item[1] + " "))
+            results.append(f"Typed: {item[1]}")
+            continue
+        _, category, phrase, action, count = item
+        if category == 'stop':
+            stop = True
+            break
+        if category == 'symbol':
+            events.append(('write', action * count))
+            results.append(f"Typed symbol: {phrase}")
+            continue
+        if category == 'format':
+            events.append(('write', action + " "))
+            results.append(f"Typed: {action}")
+            continue
+        if category == 'macro':
+            kind, name = action if isinstance(action, tuple) else (action, None)
+            if kind == 'record':
+                macros.start(name)
+                mark = len(events)
+                results.append(f"Recording macro: {name}")
+            elif kind == 'finish':
+                if mark is not None:
+                    macros.capture(events[mark:])
+                    mark = None
+                saved = macros.finish()
+                results.append(f"Saved macro: {saved[0]} ({saved[1]} events)" if saved else "Not recording a macro")
+            elif kind == 'play':
+                stored = macros.get(name)
+                if stored is None:
+                    # Not a macro after all, so it was dictation ("play music")
+                    events.append(('write', phrase + " "))
+                    results.append(f"Typed: {phrase}")
+                else:
+                    events.extend(stored)
+                    results.append(f"Played macro: {name}")
+            elif kind == 'delete':
+                results.append(f"Deleted macro: {name}" if macros.delete(name) else f"No macro named {name}")
+            continue
+        if isinstance(action, list):
+            events.extend(('hotkey', list(action)) for _ in range(count))
+        else:
+            events.append(('press', [action] * count))
+        if category == 'selection':
+            results.append(f"Selected: {phrase}")
+        else:
+            results.append(f"Executed: {phrase}")
+    if mark is not None:
+        macros.capture(events[mark:])
+    return events, results, stop
+
+
+def after_typed(events, typed):
+    """The events that turn ``typed``, already on screen, into the planned ``events``
+
+    Streaming dictation types words before the utterance is final. Whatever
+    of it the plan also starts by typing stays; the rest is erased with
+    backspaces, and the plan is sent from there.
+    """
+    lead = "".join(value for _, value in itertools.takewhile(lambda event: event[0] == 'write', events))
+    common = 0
+    for typed_char, planned_char in zip(typed, lead):
+        if typed_char != planned_char:
+            break
+        common += 1
+    rest = [('press', ['backspace'] * (len(typed) - common))] if len(typed) > common else []
+    skip = common
+    for kind, value in events:
+        if skip:
+            if len(value) <= skip:
+                skip -= len(value)
+                continue
+            value = value[skip:]
+            skip = 0
+        rest.append((kind, value))
+    return rest
+
+
+def execute(text, keyboard, matcher=COMMAND_MATCHER, macros=MACROS, metrics=METRICS, log=EVENT_LOG, typed=""):
+    """Plan an utterance and send it through an injection backend
+
+    Returns (result message, stop requested); this is the whole command path
+    behind process_command, minus the UI. Repeats and macros go out as one
+    batch like everything else. ``typed`` is text streaming dictation has
+    already put on screen for this utterance; only what differs from the
+    plan is erased (see after_typed). Planning and sending are timed as the
+    'parse' and 'inject' stages of ``metrics``, and the utterance, its key
+    events and both timings are written to ``log`` as a 'command' record.
+    """
+    start = time.perf_counter()
+    with metrics.span('parse'):
+        events, results, stop = plan_actions(text, matcher, macros)
+        if typed:
+            events = after_typed(events, typed)
+    planned = time.perf_counter()
+    if events:
+        with metrics.span('inject'):
+            keyboard.send(events)
+    message = " | ".join(results) if results else "No valid commands found"
+    log.record('command', text=text, actions=events, result=message, stop=stop,
+               parse_ms=round((planned - start) * 1000, 3), inject_ms=round((time.perf_counter() - planned) * 1000, 3))
+    return message, stop
@@ -0,0 +1,192 @@
+"""Headless voice keyboard, without the Streamlit UI
+
+    python -m voice_keyboard                        # listen until "stop" or Ctrl+C
+    python -m voice_keyboard --recognizer vosk --streaming
+    python -m voice_keyboard --check                # start up, report timings, exit
+
+Only the modules the chosen configuration needs are imported, and the
+text-to-speech engine is not loaded unless ``--speak`` is given, so the
+daemon is listening a fraction of a second after launch. Startup time is
+reported per phase on stderr.
+"""
+import argparse
+import functools
+import os
+import sys
+import threading
+import time
+
+_T0 = time.perf_counter()
+
+# Seconds between metrics dumps with --metrics
+METRICS_INTERVAL = 5.0
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def elapsed_ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m voice_keyboard", description="Headless voice keyboard")
+    parser.add_argument("--recognizer", default=os.environ.get('VK_RECOGNIZER', 'google'),
+                        help="recognizer backend (default: VK_RECOGNIZER or google)")
+    parser.add_argument("--injector", default=os.environ.get('VK_INJECTOR', 'pyautogui'),
+                        help="keystroke backend (default: VK_INJECTOR or pyautogui)")
+    parser.add_argument("--race", default="",
+                        help="comma-separated backends to race against --recognizer, e.g. vosk,whisper")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="recognize in this many worker processes, for CPU-bound offline models")
+    parser.add_argument("--streaming", action="store_true", help="type partial results while speaking")
+    parser.add_argument("--no-vad", action="store_true", help="fixed energy threshold instead of adaptive detection")
+    parser.add_argument("--fixed-pause", action="store_true",
+                        help="end every phrase after the same pause instead of adapting it to commands and dictation")
+    parser.add_argument("--raw-audio", action="store_true",
+                        help="send phrases as captured, without trimming silence or downsampling")
+    parser.add_argument("--activation", choices=("always", "wake", "push"), default="always",
+                        help="recognize every phrase, only after --wake-phrase, or only while --push-key is held")
+    parser.add_argument("--wake-phrase", default=os.environ.get('VK_WAKE_PHRASE', "hey keyboard"),
+                        help="phrase that wakes the assistant with --activation wake (needs vosk and a model)")
+    parser.add_argument("--push-key", default=os.environ.get('VK_PUSH_TO_TALK', "scroll_lock"),
+                        help="key to hold while speaking with --activation push (needs pynput)")
+    parser.add_argument("--long-dictation", action="store_true",
+                        help="allow phrases up to 25 s and recognize long ones in overlapping chunks side by side")
+    parser.add_argument("--cache-commands", action="store_true", help="reuse results for repeated short commands")
+    parser.add_argument("--command-mode", action="store_true",
+                        help="prefer command phrases and correct near misses such as \"go lift\"")
+    parser.add_argument("--metrics", default=os.environ.get('VK_METRICS'),
+                        help="write per-stage latency JSON to this file every few seconds and on exit")
+    parser.add_argument("--metrics-port", type=int, help="serve the same JSON at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--event-log", default=os.environ.get('VK_EVENT_LOG'),
+                        help="append every phrase, its key events and timings to this JSON-lines file")
+    parser.add_argument("--speak", action="store_true", help="read out start, stop and command results")
+    parser.add_argument("--check", action="store_true", help="exit as soon as listening has started")
+    parser.add_argument("--quiet", action="store_true", help="only report startup and errors")
+    args = parser.parse_args(argv)
+
+    phases = {}
+    start = time.perf_counter()
+    import speech_recognition as sr
+    from commands import COMMAND_MATCHER, execute
+    from eventlog import EVENT_LOG
+    from injection import create_backend
+    from listener_service import LISTENING_MESSAGE, MAX_PHRASE, ListenerService
+    from metrics import METRICS
+    from recognizers import CachedRecognizer, CommandModeRecognizer, RacingRecognizer, create_recognizer
+    phases['imports_ms'] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    keyboard = create_backend(args.injector)
+    recognizer = sr.Recognizer()
+    recognizer.pause_threshold = 0.5
+    recognizer.energy_threshold = 300
+    names = [args.recognizer] + [name for name in args.race.split(",") if name and name != args.recognizer]
+    if args.processes:
+        from process_pool import ProcessPoolRecognizer
+        backends = [ProcessPoolRecognizer(name, workers=args.processes) for name in names]
+    else:
+        backends = [create_recognizer(name, recognizer) for name in names]
+    # Models load after startup, off the main thread
+    preloads = [backend.load_model for backend in backends if hasattr(backend, 'load_model')]
+    racer = RacingRecognizer(backends) if len(backends) > 1 else None
+    backend = racer or backends[0]
+    chunker = None
+    max_phrase = MAX_PHRASE
+    if args.long_dictation:
+        from chunking import LONG_PHRASE, ChunkedRecognizer
+        backend = chunker = ChunkedRecognizer(backend)
+        max_phrase = LONG_PHRASE
+    if args.command_mode:
+        from fuzzy import CommandCorrector
+        backend = CommandModeRecognizer(backend, CommandCorrector(COMMAND_MATCHER))
+    if args.cache_commands:
+        backend = CachedRecognizer(backend, cacheable=COMMAND_MATCHER.is_command)
+    phases['backends_ms'] = elapsed_ms(start)
+
+    stop_message = "Stopping voice assistant..."
+
+    def act(text, typed=""):
+        result, stop = execute(text, keyboard, typed=typed)
+        return stop_message if stop else result
+
+    ready = threading.Event()
+
+    def on_status(message, message_type):
+        if message == LISTENING_MESSAGE:
+            ready.set()
+        if message_type == "error" or not args.quiet:
+            log(f"[{message_type}] {message}")
+
+    feedback = None
+    if args.speak:
+        from tts import SpeechQueue
+        feedback = SpeechQueue()
+    endpointer_factory = None
+    if not args.fixed_pause:
+        from endpointing import create_endpointer
+        endpointer_factory = functools.partial(create_endpointer, COMMAND_MATCHER)
+    service = ListenerService(act, recognizer, keyboard, COMMAND_MATCHER.is_command, COMMAND_MATCHER.is_prefix,
+                              stop_message, on_status=on_status, feedback=feedback,
+                              endpointer_factory=endpointer_factory)
+    gate = None
+    if args.activation != "always":
+        from activation import create_gate
+        gate = create_gate(args.activation, args.wake_phrase, args.push_key)
+    if args.event_log:
+        EVENT_LOG.open(args.event_log)
+    server = None
+    if args.metrics_port:
+        import metrics
+        server = metrics.serve(METRICS, args.metrics_port)
+    start = time.perf_counter()
+    service.start(backend, streaming=args.streaming, adaptive_vad=not args.no_vad, spoken_feedback=args.speak,
+                  preprocess=not args.raw_audio, activation=gate, max_phrase=max_phrase)
+    try:
+        while service.listening and not ready.wait(0.05):
+            pass
+        if ready.is_set():
+            phases['microphone_ms'] = elapsed_ms(start)
+            phases['cold_start_ms'] = elapsed_ms(_T0)
+            log("Ready in {cold_start_ms} ms (imports {imports_ms} ms, backends {backends_ms} ms, "
+                "microphone {microphone_ms} ms)".format(**phases))
+            if not args.check:
+                for preload in preloads:
+                    threading.Thread(target=preload, name="vk-preload", daemon=True).start()
+            if feedback is not None and not args.check:
+                feedback.say("Voice keyboard ready")
+        last_dump = time.monotonic()
+        while service.listening and not args.check:
+            time.sleep(0.2)
+            if args.metrics and time.monotonic() - last_dump > METRICS_INTERVAL:
+                METRICS.dump(args.metrics)
+                last_dump = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+        if args.metrics:
+            METRICS.dump(args.metrics)
+        if server is not None:
+            server.shutdown()
+        EVENT_LOG.close(timeout=5)
+        if gate is not None:
+            gate_stats = gate.summary(backend.stats.summary()['mean_ms'])
+            log(f"Activation: {gate_stats['forwarded']} phrases recognized, {gate_stats['gated']} ignored, "
+                f"about {gate_stats['saved_ms']} ms of recognition saved")
+            gate.close()
+        if chunker is not None and chunker.chunk_stats['chunked']:
+            log(f"Long dictation: {chunker.chunk_stats['chunked']} phrases in {chunker.chunk_stats['chunks']} chunks, "
+                f"{chunker.chunk_stats['overlap_words']} repeated words removed")
+        if racer is not None and racer.race_stats['races']:
+            log(f"Race wins: {racer.race_stats['wins']}, undecided {racer.race_stats['undecided']}, "
+                f"sat out while busy {racer.race_stats['sat_out']}, median lead {racer.lead.summary()['p50_ms']} ms")
+    if feedback is not None:
+        feedback.close(wait=True, timeout=5)
+    return 0 if ready.is_set() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import json
+
+import speech_recognition as sr
+
+from fuzzy import CommandCorrector
+
+# Silence that ends a phrase once a complete command has been heard
+COMMAND_PAUSE = 0.2
+# Silence dictation may contain before the phrase ends
+DICTATION_PAUSE = 0.9
+# Without a spotter, phrases with this much speech are taken for dictation
+DICTATION_AFTER = 1.5
+
+_fallback_model = None
+
+
+def command_vocabulary(matcher):
+    """Every word sequence a command can be made of, for a grammar decoder"""
+    return CommandCorrector(matcher).vocabulary() + sorted(joiner for joiner in matcher.joiners if joiner.isalpha())
+
+
+class CommandSpotter:
+    """Vosk decoder restricted to the command vocabulary, fed while the phrase is spoken
+
+    Words outside the vocabulary come out as [unk], so ``text`` says whether
+    what has been said so far can still be a command. Decoding a small
+    grammar keeps well ahead of real time on one core.
+    """
+
+    def __init__(self, model, vocabulary, sample_rate):
+        import vosk
+
+        self._decoder = vosk.KaldiRecognizer(model, sample_rate, json.dumps(list(vocabulary) + ['[unk]']))
+        self._final = ""
+        self.text = ""
+
+    def reset(self):
+        self._decoder.Reset()
+        self._final = self.text = ""
+
+    def accept(self, frame):
+        """Feed raw PCM; returns everything heard since the last reset"""
+        if self._decoder.AcceptWaveform(bytes(frame)):
+            # Vosk closed an utterance of its own; keep it and start a new partial
+            self._final = " ".join(filter(None, [self._final, json.loads(self._decoder.Result()).get('text', '')]))
+            partial = ""
+        else:
+            partial = json.loads(self._decoder.PartialResult()).get('partial', '')
+        self.text = " ".join(filter(None, [self._final, partial]))
+        return self.text
+
+    def finish(self):
+        """Everything heard, once the phrase is over"""
+        self._final = " ".join(filter(None, [self._final, json.loads(self._decoder.FinalResult()).get('text', '')]))
+        self.text = self._final
+        return self.text
+
+
+def _vosk_model(backend):
+    # Share the model with a Vosk backend in use, wrapped or racing
+    from recognizers import VoskRecognizer
+
+    pending = [backend]
+    while pending:
+        backend = pending.pop()
+        if isinstance(backend, VoskRecognizer):
+            return backend.load_model()
+        pending.extend(getattr(backend, 'backends', []))
+        if getattr(backend, 'backend', None) is not None:
+            pending.append(backend.backend)
+    global _fallback_model
+    if _fallback_model is None:
+        _fallback_model = VoskRecognizer()
+    return _fallback_model.load_model()
+
+
+def load_keyword_spotter(vocabulary, backend, sample_rate):
+    """A CommandSpotter for any word list; raises sr.RequestError without Vosk or a model"""
+    return CommandSpotter(_vosk_model(backend), vocabulary, sample_rate)
+
+
+def load_spotter(matcher, backend, sample_rate):
+    """A CommandSpotter on the Vosk model, or None when Vosk or a model is missing"""
+    try:
+        return load_keyword_spotter(command_vocabulary(matcher), backend, sample_rate)
+    except sr.RequestError:
+        return None
+
+
+class AdaptiveEndpointer:
+    """Chooses how much silence ends the current phrase, from what has been said so far
+
+    With a spotter, a complete command that nothing longer continues
+    ("enter", "go left", "copy line") ends after ``command_pause``; words
+    outside the command vocabulary mean dictation and get
+    ``dictation_pause``; anything else keeps the normal ``pause``. Without
+    one, phrases with more than ``dictation_after`` seconds of speech get the
+    dictation pause. ``kind`` says which applied last.
+    """
+
+    def __init__(self, matcher, spotter=None, pause=0.5, command_pause=COMMAND_PAUSE,
+                 dictation_pause=DICTATION_PAUSE, dictation_after=DICTATION_AFTER):
+        self.matcher = matcher
+        self.spotter = spotter
+        self.pause = pause
+        self.command_pause = command_pause
+        self.dictation_pause = dictation_pause
+        self.dictation_after = dictation_after
+        self.kind = 'normal'
+
+    def reset(self):
+        self.kind = 'normal'
+        if self.spotter is not None:
+            self.spotter.reset()
+
+    def pause_for(self, frame, speech_seconds):
+        """The pause that would end the phrase after ``frame``"""
+        self.kind = 'normal'
+        if self.spotter is not None:
+            text = self.spotter.accept(frame)
+            if text:
+                if '[unk]' in text.split() or not self.matcher.is_prefix(text):
+                    self.kind = 'dictation'
+                elif self.matcher.is_final(text):
+                    self.kind = 'command'
+        elif speech_seconds >= self.dictation_after:
+            self.kind = 'dictation'
+        if self.kind == 'command':
+            return self.command_pause
+        if self.kind == 'dictation':
+            return self.dictation_pause
+        return self.pause
+
+
+def create_endpointer(matcher, backend, sample_rate, pause=0.5):
+    """An AdaptiveEndpointer with a command spotter if Vosk is available"""
+    return AdaptiveEndpointer(matcher, load_spotter(matcher, backend, sample_rate), pause)
@@ -0,0 +1,174 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+# Session log location; logging is off unless this is set or the UI turns it on
+EVENT_LOG_PATH = os.environ.get('VK_EVENT_LOG')
+DEFAULT_EVENT_LOG = os.path.join(os.path.expanduser('~'), '.voice_keyboard_events.jsonl')
+
+# The live file is compressed into path.1.gz once it reaches this size
+MAX_BYTES = 5 * 1024 * 1024
+# Compressed segments kept, path.1.gz (newest) to path.N.gz (oldest)
+BACKUPS = 5
+
+# Records waiting for the writer beyond this are dropped rather than block
+MAX_PENDING = 10000
+
+_STOP = object()
+
+
+class EventLog:
+    """Append-only JSON-lines log of everything a listening session does
+
+    ``record(event, **fields)`` only puts the record on a queue; a background
+    thread serializes, appends and flushes it, so the recognition and
+    injection threads never wait on the disk. Each record carries the time,
+    the event name and the current session id. When the file grows past
+    ``max_bytes`` it is gzip-compressed into ``path.1.gz`` and older segments
+    shift up, keeping ``backups`` of them. ``read_events`` reads them all back
+    in order.
+    """
+
+    def __init__(self, path=EVENT_LOG_PATH, max_bytes=MAX_BYTES, backups=BACKUPS, max_pending=MAX_PENDING):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.session = None
+        self.stats = {'written': 0, 'dropped': 0, 'rotations': 0, 'errors': 0}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._exit_hook = False
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def open(self, path=DEFAULT_EVENT_LOG):
+        """Start logging to ``path``"""
+        self.path = path
+
+    def disable(self):
+        """Stop logging; records already queued are still written"""
+        self.path = None
+
+    def begin_session(self, **info):
+        """Start a new session id and log its settings"""
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.record('session_start', **info)
+
+    def record(self, event, **fields):
+        """Queue one record; returns at once and never raises for a full queue"""
+        path = self.path
+        if path is None:
+            return
+        record = {'t': round(time.time(), 3), 'session': self.session, 'event': event}
+        record.update(fields)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="vk-eventlog", daemon=True)
+                self._thread.start()
+                if not self._exit_hook:
+                    # The writer restarts after close(); one exit hook covers every restart
+                    atexit.register(self.close, timeout=2)
+                    self._exit_hook = True
+        try:
+            self._queue.put_nowait((path, record))
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def close(self, timeout=None):
+        """Write what is queued and stop the writer"""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        f = None
+        current = None
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # Everything that piled up while writing goes out in one flush
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = False
+                for item in batch:
+                    if item is _STOP:
+                        stopping = True
+                        continue
+                    path, record = item
+                    try:
+                        if path != current:
+                            if f is not None:
+                                f.close()
+                            f, current = open(path, 'a', encoding='utf-8'), path
+                        f.write(json.dumps(record, default=str) + "\n")
+                        self.stats['written'] += 1
+                    except OSError:
+                        self.stats['errors'] += 1
+                        f, current = None, None
+                if f is not None:
+                    f.flush()
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        f, path, current = None, current, None
+                        self._rotate(path)
+                if stopping:
+                    return
+        finally:
+            if f is not None:
+                f.close()
+
+    def _rotate(self, path):
+        try:
+            for index in range(self.backups - 1, 0, -1):
+                older = f"{path}.{index}.gz"
+                if os.path.exists(older):
+                    os.replace(older, f"{path}.{index + 1}.gz")
+            if self.backups:
+                with open(path, 'rb') as src, gzip.open(path + ".1.gz.tmp", 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(path + ".1.gz.tmp", path + ".1.gz")
+            os.remove(path)
+            self.stats['rotations'] += 1
+        except OSError:
+            self.stats['errors'] += 1
+
+
+def read_events(path):
+    """Every record in ``path`` and its compressed segments, oldest first
+
+    A line cut short by a crash is skipped.
+    """
+    segments = []
+    index = 1
+    while os.path.exists(f"{path}.{index}.gz"):
+        segments.append(f"{path}.{index}.gz")
+        index += 1
+    segments.reverse()
+    if os.path.exists(path):
+        segments.append(path)
+    for segment in segments:
+        opener = gzip.open if segment.endswith(".gz") else open
+        with opener(segment, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+# Shared by the listener and the command path
+EVENT_LOG = EventLog()
@@ -0,0 +1,128 @@
+from grammar import NUMBER_WORDS, parse_count
+
+# Near misses at least this similar to a command phrase become that command
+FUZZY_THRESHOLD = 0.8
+
+# Similarity given to words that sound the same even if spelled differently
+PHONETIC_SCORE = 0.9
+
+_SOUNDEX_DIGITS = {
+    letter: digit
+    for digit, letters in {'1': 'bfpv', '2': 'cgjkqsxz', '3': 'dt', '4': 'l', '5': 'mn', '6': 'r'}.items()
+    for letter in letters
+}
+
+
+def phonetic_key(word):
+    """American Soundex code of a word: "left" and "lift" are both L130"""
+    letters = [c for c in word.lower() if 'a' <= c <= 'z']
+    if not letters:
+        return word
+    code = letters[0].upper()
+    last = _SOUNDEX_DIGITS.get(letters[0])
+    for letter in letters[1:]:
+        digit = _SOUNDEX_DIGITS.get(letter)
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def sound_of(text):
+    return " ".join(phonetic_key(word) for word in text.split())
+
+
+def levenshtein(a, b):
+    """Character edit distance"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+class CommandCorrector:
+    """Snaps recognizer near misses ("go lift") onto the command they resemble
+
+    The index holds every fixed command phrase, by spelling and by Soundex
+    key, and is rebuilt whenever the matcher's grammar is reloaded. Only short
+    utterances that are not already commands are considered; a trailing
+    repeat count is kept aside and put back. Stop phrases are never guessed.
+    """
+
+    def __init__(self, matcher, threshold=FUZZY_THRESHOLD):
+        self.matcher = matcher
+        self.threshold = threshold
+        self.stats = {'checked': 0, 'corrected': 0}
+        self._source = None
+        self._phrases = []
+        self._by_sound = {}
+        self._vocabulary = []
+        self._max_words = 0
+
+    def _index(self):
+        phrases = self.matcher.phrases
+        if phrases is self._source:
+            return
+        fixed = [phrase for phrase in phrases if '{' not in phrase]
+        self._vocabulary = fixed + list(NUMBER_WORDS) + sorted(self.matcher.repeat_words)
+        self._phrases = [phrase for phrase in fixed if phrases[phrase][0] != 'stop']
+        self._by_sound = {}
+        for phrase in self._phrases:
+            self._by_sound.setdefault(sound_of(phrase), phrase)
+        self._max_words = max((len(phrase.split()) for phrase in self._phrases), default=0)
+        self._source = phrases
+
+    def vocabulary(self):
+        """Everything a command can be made of, for backends that take a word list"""
+        self._index()
+        return self._vocabulary
+
+    def is_command(self, text):
+        return self.matcher.is_command(text)
+
+    def closest(self, text):
+        """(command phrase, similarity 0..1) nearest to ``text``, or (None, 0.0)"""
+        self._index()
+        best, best_score = None, 0.0
+        sound_match = self._by_sound.get(sound_of(text))
+        if sound_match is not None:
+            best, best_score = sound_match, PHONETIC_SCORE
+        # A phrase whose length alone rules out beating the threshold is skipped
+        slack = len(text) * (1 - self.threshold) + 1
+        for phrase in self._phrases:
+            if abs(len(phrase) - len(text)) > slack:
+                continue
+            score = 1 - levenshtein(text, phrase) / max(len(text), len(phrase))
+            if score > best_score:
+                best, best_score = phrase, score
+        return best, best_score
+
+    def correct(self, text):
+        """``text``, or the command it was most likely meant to be, with the similarity
+
+        Returns (text, 1.0) for utterances that are already commands and
+        (text, 0.0) for ones too long to be a single command.
+        """
+        if not text or self.matcher.is_command(text):
+            return text, 1.0
+        self._index()
+        words = text.split()
+        suffix = ""
+        if len(words) > 1 and parse_count(words[-1]):
+            words, suffix = words[:-1], " " + words[-1]
+        if len(words) > self._max_words:
+            return text, 0.0
+        self.stats['checked'] += 1
+        phrase, score = self.closest(" ".join(words))
+        if phrase is None or score < self.threshold:
+            return text, score
+        self.stats['corrected'] += 1
+        return phrase + suffix, score
@@ -0,0 +1,158 @@
+import os
+import re
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+# Command grammar used unless VK_GRAMMAR points elsewhere
+GRAMMAR_PATH = os.environ.get('VK_GRAMMAR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar.toml'))
+
+# A spoken count is capped so a misheard number cannot run away
+MAX_COUNT = 100
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14,
+    'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+}
+
+FORMATS = {
+    'capitalize': str.capitalize,
+    'upper': str.upper,
+    'lower': str.lower,
+    'title': str.title,
+}
+
+_SLOT_RE = re.compile(r"\{(\w+)\}")
+
+
+def parse_count(token):
+    """A repeat count from one spoken token ("5", "five"), or None"""
+    if token.isdigit():
+        count = int(token)
+    else:
+        count = NUMBER_WORDS.get(token)
+    if not count:
+        return None
+    return min(count, MAX_COUNT)
+
+
+def parse_word(token):
+    """Any single word fills a {word} or {name} slot; punctuation does not"""
+    return token if token.isalnum() else None
+
+
+# Slot name -> parser returning the slot value or None
+SLOTS = {
+    'count': parse_count,
+    'word': parse_word,
+    'name': parse_word,
+}
+
+# What the phrases in the "macro" group can do
+MACRO_ACTIONS = ('record', 'finish', 'play', 'delete')
+
+
+class Grammar:
+    """Command groups, stop phrases and joiners read from a grammar file"""
+
+    def __init__(self, groups, stop_commands, joiners, repeat_words=(), path=None):
+        self.groups = groups
+        self.stop_commands = stop_commands
+        self.joiners = joiners
+        self.repeat_words = repeat_words
+        self.path = path
+
+    @property
+    def tables(self):
+        """[(category, {phrase: action})] in priority order, as CommandMatcher takes them"""
+        return [(group['name'], group['commands']) for group in self.groups]
+
+    def commands(self, name):
+        for group in self.groups:
+            if group['name'] == name:
+                return group['commands']
+        return {}
+
+    def help_markdown(self):
+        """The Help tab: every group with its phrases, synonyms on one line"""
+        lines = ["### Available Commands", ""]
+        for group in self.groups:
+            lines.append(f"#### {group['title']}")
+            by_action = {}
+            for phrase, action in group['commands'].items():
+                key = tuple(action) if isinstance(action, list) else action
+                by_action.setdefault(key, []).append(_display(phrase))
+            for action, phrases in by_action.items():
+                spoken = ", ".join(f'"{phrase}"' for phrase in phrases)
+                if group['name'] in ('symbol', 'format', 'macro'):
+                    lines.append(f"- {spoken} ({action})")
+                else:
+                    lines.append(f"- {spoken}")
+            lines.append("")
+        lines.append("#### Stop")
+        lines.append("- " + ", ".join(f'"{phrase}"' for phrase in self.stop_commands) + " (stops the assistant)")
+        lines.append("")
+        lines.append("[count] is a number (\"go left 5\"), [word] and [name] are any word (\"capital paris\"). "
+                     "Chain commands with " + ", ".join(f'"{joiner}"' for joiner in self.joiners if joiner.isalpha()) + ".")
+        if self.repeat_words:
+            lines.append("")
+            lines.append(f"Repeat any key command by adding a number: \"go down ten\", "
+                         f"\"backspace {self.repeat_words[0]} five\".")
+        return "\n".join(lines)
+
+
+def _display(phrase):
+    return _SLOT_RE.sub(r"[\1]", phrase)
+
+
+def _check_action(path, group, phrase, action):
+    slots = _SLOT_RE.findall(phrase)
+    for slot in slots:
+        if slot not in SLOTS:
+            raise ValueError(f"{path}: unknown slot {{{slot}}} in \"{phrase}\", use one of: "
+                             f"{', '.join('{' + name + '}' for name in SLOTS)}")
+    if group == 'macro':
+        if action not in MACRO_ACTIONS:
+            raise ValueError(f"{path}: macro command \"{phrase}\" must be one of: {', '.join(MACRO_ACTIONS)}")
+        if action != 'finish' and 'name' not in slots:
+            raise ValueError(f"{path}: macro command \"{phrase}\" needs a {{name}} slot")
+    elif 'name' in slots:
+        raise ValueError(f"{path}: {{name}} slots are only for the macro group (\"{phrase}\")")
+    elif 'word' in slots:
+        if action not in FORMATS:
+            raise ValueError(f"{path}: \"{phrase}\" has a {{word}} slot, so its value must be one of: "
+                             f"{', '.join(FORMATS)}")
+    elif isinstance(action, list):
+        if not action or not all(isinstance(key, str) for key in action):
+            raise ValueError(f"{path}: \"{phrase}\" must map to a key name or a list of key names")
+    elif not isinstance(action, str):
+        raise ValueError(f"{path}: \"{phrase}\" must map to a key name or a list of key names")
+
+
+def load_grammar(path=GRAMMAR_PATH):
+    """Read and validate a grammar file; raises ValueError on mistakes"""
+    try:
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    except tomllib.TOMLDecodeError as e:
+        raise ValueError(f"{path}: {e}")
+    groups = []
+    for index, group in enumerate(data.get('group', [])):
+        name = group.get('name')
+        commands = group.get('commands')
+        if not name or not isinstance(commands, dict):
+            raise ValueError(f"{path}: group {index + 1} needs a name and a [group.commands] table")
+        normalized = {}
+        for phrase, action in commands.items():
+            phrase = " ".join(phrase.lower().split())
+            _check_action(path, name, phrase, action)
+            normalized[phrase] = action
+        groups.append({'name': name, 'title': group.get('title', name.title()), 'commands': normalized})
+    stop_commands = [" ".join(phrase.lower().split()) for phrase in data.get('stop', [])]
+    joiners = [joiner.lower() for joiner in data.get('joiners', [])]
+    repeat_words = [word.lower() for word in data.get('repeat', [])]
+    return Grammar(groups, stop_commands, joiners, repeat_words, path)
@@ -0,0 +1,358 @@
+import collections
+import os
+import subprocess
+import sys
+import time
+
+# Backend used when nothing else is configured
+DEFAULT_INJECTOR = os.environ.get('VK_INJECTOR', 'pyautogui')
+
+# Pause between injected events; 0 is fine for most editors, raise it for
+# targets that drop fast keystrokes (remote desktops, some games)
+INJECT_DELAY = float(os.environ.get('VK_INJECT_DELAY', '0'))
+
+# Dictated text at least this long is pasted instead of typed (0 disables)
+PASTE_MIN_CHARS = int(os.environ.get('VK_PASTE_MIN_CHARS', '40'))
+
+# Give the target app time to read the clipboard before it is restored
+CLIPBOARD_SETTLE = 0.05
+PASTE_KEYS = ('command', 'v') if sys.platform == 'darwin' else ('ctrl', 'v')
+
+MODIFIERS = {'ctrl', 'shift', 'alt', 'win'}
+
+# Undo steps kept by the virtual text buffer
+UNDO_LIMIT = 1000
+
+
+def batch(events):
+    """Merge adjacent writes into one string and adjacent presses into one key list"""
+    merged = []
+    for kind, value in events:
+        if merged and merged[-1][0] == kind and kind in ('write', 'press'):
+            previous = merged[-1][1]
+            merged[-1] = (kind, previous + value)
+        else:
+            merged.append((kind, value))
+    return merged
+
+
+class InjectionBackend:
+    """Delivers key events to whatever has keyboard focus
+
+    The three primitives mirror pyautogui: ``write(text)``, ``press(keys,
+    presses)`` and ``hotkey(*keys)``, where a hotkey holds each key down in
+    order and releases them in reverse. ``send`` takes the event lists built
+    by commands.plan_actions and issues one primitive per merged run.
+    """
+
+    name = None
+
+    def __init__(self, delay=INJECT_DELAY):
+        self.delay = delay
+
+    def send(self, events):
+        for index, (kind, value) in enumerate(batch(events)):
+            if index and self.delay:
+                time.sleep(self.delay)
+            if kind == 'write':
+                self.write(value)
+            elif kind == 'press':
+                self.press(value)
+            elif kind == 'hotkey':
+                self.hotkey(*value)
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def press(self, keys, presses=1):
+        raise NotImplementedError
+
+    def hotkey(self, *keys):
+        raise NotImplementedError
+
+
+class PyAutoGUIBackend(InjectionBackend):
+    """Synthetic input through pyautogui (Windows, macOS, X11)"""
+
+    name = 'pyautogui'
+
+    def __init__(self, delay=INJECT_DELAY, paste_min_chars=PASTE_MIN_CHARS):
+        super().__init__(delay)
+        self.paste_min_chars = paste_min_chars
+        import pyautogui
+        # Keep the corner failsafe; delays between keystrokes are set here instead
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = 0
+        self.pyautogui = pyautogui
+        try:
+            import pyperclip
+        except ImportError:
+            # Without clipboard access long text is typed like the rest
+            pyperclip = None
+        self.pyperclip = pyperclip
+
+    def write(self, text):
+        if self.pyperclip and self.paste_min_chars and len(text) >= self.paste_min_chars and self._paste(text):
+            return
+        self.pyautogui.write(text, interval=self.delay)
+
+    def press(self, keys, presses=1):
+        self.pyautogui.press(keys, presses=presses, interval=self.delay)
+
+    def hotkey(self, *keys):
+        self.pyautogui.hotkey(*keys, interval=self.delay)
+
+    def _paste(self, text):
+        """Type text through the clipboard, keeping whatever was there before"""
+        pyperclip = self.pyperclip
+        try:
+            previous = pyperclip.paste()
+            pyperclip.copy(text)
+            self.pyautogui.hotkey(*PASTE_KEYS)
+            time.sleep(CLIPBOARD_SETTLE)
+            pyperclip.copy(previous)
+        except pyperclip.PyperclipException:
+            return False
+        return True
+
+
+# pyautogui key names -> X keysyms
+XDOTOOL_KEYS = {
+    'enter': 'Return',
+    'esc': 'Escape',
+    'backspace': 'BackSpace',
+    'delete': 'Delete',
+    'tab': 'Tab',
+    'space': 'space',
+    'left': 'Left',
+    'right': 'Right',
+    'up': 'Up',
+    'down': 'Down',
+    'home': 'Home',
+    'end': 'End',
+    'ctrl': 'ctrl',
+    'shift': 'shift',
+    'alt': 'alt',
+    'win': 'super',
+}
+
+
+class XdotoolBackend(InjectionBackend):
+    """X11 input through the xdotool command, one process per merged event"""
+
+    name = 'xdotool'
+
+    def _run(self, *args):
+        try:
+            subprocess.run(['xdotool', *args], check=True)
+        except FileNotFoundError:
+            raise RuntimeError("xdotool not found: install it with your package manager")
+
+    def write(self, text):
+        self._run('type', '--delay', str(int(self.delay * 1000)), '--', text)
+
+    def press(self, keys, presses=1):
+        if isinstance(keys, str):
+            keys = [keys]
+        keysyms = [XDOTOOL_KEYS.get(key, key) for key in keys] * presses
+        self._run('key', '--delay', str(int(self.delay * 1000)), *keysyms)
+
+    def hotkey(self, *keys):
+        keysyms = [XDOTOOL_KEYS.get(key, key) for key in keys]
+        args = []
+        for keysym in keysyms:
+            args += ['keydown', keysym]
+        for keysym in reversed(keysyms):
+            args += ['keyup', keysym]
+        self._run(*args)
+
+
+class VirtualTextBuffer(InjectionBackend):
+    """In-memory text field for headless tests and benchmarks
+
+    Tracks text, cursor, selection anchor, clipboard and an undo/redo stack,
+    and interprets keys the way a Windows text box does, so commands such as
+    "select line", "cut word" or "word left" leave checkable state.
+    """
+
+    name = 'virtual'
+
+    def __init__(self, text="", delay=0.0):
+        super().__init__(delay)
+        self.text = text
+        self.cursor = len(text)
+        self.anchor = None
+        self.clipboard = ""
+        self.undo_stack = collections.deque(maxlen=UNDO_LIMIT)
+        self.redo_stack = []
+        self.keystrokes = 0
+
+    @property
+    def selection(self):
+        if self.anchor is None or self.anchor == self.cursor:
+            return ""
+        start, end = sorted((self.anchor, self.cursor))
+        return self.text[start:end]
+
+    # Editing helpers
+
+    def _snapshot(self):
+        self.undo_stack.append((self.text, self.cursor, self.anchor))
+        self.redo_stack.clear()
+
+    def _delete_selection(self):
+        start, end = sorted((self.anchor, self.cursor))
+        self.text = self.text[:start] + self.text[end:]
+        self.cursor = start
+        self.anchor = None
+
+    def _insert(self, text):
+        if self.selection:
+            self._delete_selection()
+        self.anchor = None
+        self.text = self.text[:self.cursor] + text + self.text[self.cursor:]
+        self.cursor += len(text)
+
+    def _line_bounds(self, pos):
+        start = self.text.rfind('\n', 0, pos) + 1
+        end = self.text.find('\n', pos)
+        return start, len(self.text) if end == -1 else end
+
+    def _word_right(self, pos):
+        n = len(self.text)
+        while pos < n and not self.text[pos].isspace():
+            pos += 1
+        while pos < n and self.text[pos].isspace():
+            pos += 1
+        return pos
+
+    def _word_left(self, pos):
+        while pos > 0 and self.text[pos - 1].isspace():
+            pos -= 1
+        while pos > 0 and not self.text[pos - 1].isspace():
+            pos -= 1
+        return pos
+
+    def _vertical(self, pos, direction):
+        start, end = self._line_bounds(pos)
+        column = pos - start
+        if direction < 0:
+            if start == 0:
+                return 0
+            prev_start, prev_end = self._line_bounds(start - 1)
+            return min(prev_start + column, prev_end)
+        if end == len(self.text):
+            return end
+        next_start, next_end = self._line_bounds(end + 1)
+        return min(next_start + column, next_end)
+
+    def _move(self, target, shift):
+        if shift:
+            if self.anchor is None:
+                self.anchor = self.cursor
+        else:
+            self.anchor = None
+        self.cursor = target
+
+    # Key handling
+
+    def _key(self, key, held):
+        self.keystrokes += 1
+        ctrl = 'ctrl' in held
+        shift = 'shift' in held
+        if key in ('left', 'right') and not shift and not ctrl and self.selection:
+            start, end = sorted((self.anchor, self.cursor))
+            self._move(start if key == 'left' else end, False)
+        elif key == 'left':
+            self._move(self._word_left(self.cursor) if ctrl else max(0, self.cursor - 1), shift)
+        elif key == 'right':
+            self._move(self._word_right(self.cursor) if ctrl else min(len(self.text), self.cursor + 1), shift)
+        elif key in ('up', 'down'):
+            self._move(self._vertical(self.cursor, -1 if key == 'up' else 1), shift)
+        elif key == 'home':
+            self._move(0 if ctrl else self._line_bounds(self.cursor)[0], shift)
+        elif key == 'end':
+            self._move(len(self.text) if ctrl else self._line_bounds(self.cursor)[1], shift)
+        elif ctrl and key == 'a':
+            self.anchor, self.cursor = 0, len(self.text)
+        elif ctrl and key == 'l':
+            start, end = self._line_bounds(self.cursor)
+            self.anchor, self.cursor = start, min(len(self.text), end + 1)
+        elif ctrl and key == 'c':
+            if self.selection:
+                self.clipboard = self.selection
+        elif ctrl and key == 'x':
+            if self.selection:
+                self._snapshot()
+                self.clipboard = self.selection
+                self._delete_selection()
+        elif ctrl and key == 'v':
+            self._snapshot()
+            self._insert(self.clipboard)
+        elif ctrl and key == 'z':
+            if self.undo_stack:
+                self.redo_stack.append((self.text, self.cursor, self.anchor))
+                self.text, self.cursor, self.anchor = self.undo_stack.pop()
+        elif ctrl and key == 'y':
+            if self.redo_stack:
+                self.undo_stack.append((self.text, self.cursor, self.anchor))
+                self.text, self.cursor, self.anchor = self.redo_stack.pop()
+        elif key == 'backspace':
+            self._snapshot()
+            if self.selection:
+                self._delete_selection()
+            elif self.cursor:
+                start = self._word_left(self.cursor) if ctrl else self.cursor - 1
+                self.text = self.text[:start] + self.text[self.cursor:]
+                self.cursor = start
+            self.anchor = None
+        elif key == 'delete':
+            self._snapshot()
+            if self.selection:
+                self._delete_selection()
+            else:
+                end = self._word_right(self.cursor) if ctrl else self.cursor + 1
+                self.text = self.text[:self.cursor] + self.text[end:]
+            self.anchor = None
+        elif key == 'esc':
+            self.anchor = None
+        elif key in ('enter', 'tab', 'space'):
+            self._snapshot()
+            self._insert({'enter': '\n', 'tab': '\t', 'space': ' '}[key])
+        elif len(key) == 1 and not ctrl:
+            self._snapshot()
+            self._insert(key)
+
+    def write(self, text):
+        # One undo step per write call, like typing a word in most editors
+        self.keystrokes += len(text)
+        self._snapshot()
+        self._insert(text)
+
+    def press(self, keys, presses=1):
+        if isinstance(keys, str):
+            keys = [keys]
+        for key in keys:
+            for _ in range(presses):
+                self._key(key, ())
+
+    def hotkey(self, *keys):
+        held = []
+        for key in keys:
+            if key in MODIFIERS:
+                held.append(key)
+            else:
+                self._key(key, held)
+
+
+INJECTION_BACKENDS = {
+    backend.name: backend
+    for backend in [PyAutoGUIBackend, XdotoolBackend, VirtualTextBuffer]
+}
+
+
+def create_backend(name=DEFAULT_INJECTOR, **options):
+    """Instantiate an injection backend by name"""
+    if name not in INJECTION_BACKENDS:
+        raise ValueError(f"Unknown injector '{name}', choose from: {', '.join(INJECTION_BACKENDS)}")
+    return INJECTION_BACKENDS[name](**options)
@@ -0,0 +1,318 @@
+import atexit
+import collections
+import queue
+import threading
+
+import speech_recognition as sr
+
+import tts
+from audio_buffer import MicrophoneRing
+from eventlog import EVENT_LOG
+from metrics import METRICS
+from pipeline import RECOGNIZER_WORKERS, VoicePipeline
+from preprocess import AudioPreprocessor
+from streaming import StreamingDictation
+from vad import SpeechSegmenter, VoiceActivityDetector, read_segment
+
+# Recognized phrases kept for the status panel
+HISTORY_SIZE = 20
+
+# Phrases are cut off after this many seconds unless ``start`` allows longer ones
+MAX_PHRASE = 5
+
+# Status message once the microphone is open and the workers are running
+LISTENING_MESSAGE = "🎤 Listening... Speak your command"
+
+
+def spoken_result(result):
+    """The part of a command result worth reading out: dictation is left out"""
+    return ", ".join(part for part in result.split(" | ") if not part.startswith("Typed: "))
+
+
+class _Session:
+    """One start..stop period of listening"""
+
+    def __init__(self, feedback=None):
+        self.feedback = feedback
+        self.stopping = threading.Event()
+        self.worker = None
+        self.thread = None
+
+
+class ListenerService:
+    """Owns the microphone and the listening workers for the life of the process
+
+    The microphone is opened on the first ``start`` and stays open; stopping
+    only pauses the workers, so toggling listening never reopens the device.
+    ``start``/``stop`` may be called from any thread and return at once, and
+    ``status()`` returns a snapshot the UI can poll. Commands are executed by
+    ``act(text)``, or ``act(text, typed)`` when streaming dictation has
+    already typed part of it; a result equal to ``stop_message`` ends the
+    session.
+    ``on_status(message, message_type)``, if given, sees every status change.
+
+    ``feedback`` is a tts.SpeechQueue. Whenever it is talking the microphone
+    side ignores audio that is not clearly someone speaking over it, and
+    speech onset interrupts it. With ``spoken_feedback`` on, command results
+    and errors are read out through it.
+
+    Stage latencies (calibration, capture, recognition, total) go to
+    ``metrics``; with adaptive voice detection that includes 'endpoint', the
+    silence waited before each phrase was closed. ``endpointer_factory(backend,
+    sample_rate, pause)``, if given, supplies the endpointing.AdaptiveEndpointer
+    used when ``start`` is asked for adaptive endpointing. Session starts and
+    stops, recognized and gated phrases, errors and per-phrase timings are
+    written to ``event_log``, next to the 'command' records that
+    commands.execute adds.
+    """
+
+    def __init__(self, act, recognizer, keyboard, is_command, is_prefix, stop_message,
+                 source_factory=MicrophoneRing, on_status=None, feedback=None, metrics=METRICS,
+                 event_log=EVENT_LOG, endpointer_factory=None):
+        self.act = act
+        self.recognizer = recognizer
+        self.keyboard = keyboard
+        self.is_command = is_command
+        self.is_prefix = is_prefix
+        self.stop_message = stop_message
+        self.source_factory = source_factory
+        self.on_status = on_status
+        self.feedback = feedback
+        self.metrics = metrics
+        self.event_log = event_log
+        self.endpointer_factory = endpointer_factory
+        self._lock = threading.RLock()
+        self._source = None
+        self._session = None
+        self._status = {
+            'listening': False,
+            'message': "Click the button to begin",
+            'message_type': 'info',
+            'current_query': "",
+            'vad_stats': None,
+            'first_char_stats': None,
+            'feedback_stats': None,
+            'preprocess_stats': None,
+            'activation_stats': None,
+        }
+        self._history = collections.deque(maxlen=HISTORY_SIZE)
+        atexit.register(self.shutdown)
+
+    @property
+    def listening(self):
+        with self._lock:
+            return self._session is not None
+
+    def status(self):
+        """Thread-safe snapshot of the current status"""
+        with self._lock:
+            return dict(self._status, history=list(self._history))
+
+    def _set_status(self, message, message_type='info', **fields):
+        with self._lock:
+            self._status.update(fields, message=message, message_type=message_type)
+        if self.on_status is not None:
+            self.on_status(message, message_type)
+
+    def start(self, backend, streaming=False, adaptive_vad=True, spoken_feedback=False, preprocess=True,
+              endpointing=True, activation=None, max_phrase=MAX_PHRASE):
+        """Begin listening with the given recognizer backend
+
+        With ``preprocess``, phrases are trimmed and resampled to the
+        backend's preferred rate before recognition. An ``activation`` gate
+        (activation.py) decides which phrases reach the recognizer at all;
+        streaming dictation is never gated. Phrases are cut off after
+        ``max_phrase`` seconds; raise it for a chunking.ChunkedRecognizer.
+        """
+        with self._lock:
+            if self._session is not None:
+                return
+            session = _Session(self.feedback if spoken_feedback else None)
+            self._session = session
+            self._set_status("Starting voice assistant... Say commands clearly!", listening=True)
+            self.event_log.begin_session(backend=backend.name, streaming=streaming, adaptive_vad=adaptive_vad)
+        session.thread = threading.Thread(target=self._run,
+                                          args=(session, backend, streaming, adaptive_vad, preprocess, endpointing,
+                                                activation, max_phrase),
+                                          name="vk-listener", daemon=True)
+        session.thread.start()
+
+    def stop(self, message="Voice assistant stopped!", message_type="warning"):
+        """Stop listening; the microphone stays open for the next start"""
+        with self._lock:
+            session = self._session
+            if session is None:
+                return
+            self._session = None
+            self._set_status(message, message_type, listening=False)
+            self.event_log.record('session_stop', message=message)
+        session.stopping.set()
+        if session.worker is not None:
+            session.worker.stop()
+
+    def shutdown(self):
+        """Stop listening and release the microphone"""
+        self.stop()
+        with self._lock:
+            source, self._source = self._source, None
+        if source is not None:
+            source.__exit__(None, None, None)
+
+    def _end(self, session, message, message_type):
+        with self._lock:
+            if self._session is not session:
+                return
+        self.stop(message, message_type)
+
+    def _open_source(self):
+        with self._lock:
+            if self._source is None:
+                source = self.source_factory()
+                source.__enter__()
+                self._source = source
+            return self._source
+
+    def _run(self, session, backend, streaming, adaptive_vad, preprocess, endpointing, activation, max_phrase):
+        segmenter = None
+        preprocessor = AudioPreprocessor(backend.sample_rate) if preprocess and backend.sample_rate else None
+        gate = self.feedback.gated if self.feedback is not None else None
+        on_onset = self.feedback.interrupt if self.feedback is not None else None
+        try:
+            source = self._open_source()
+            # Audio recorded while paused is stale
+            source.stream.skip()
+            if adaptive_vad:
+                endpointer = None
+                if endpointing and self.endpointer_factory is not None:
+                    endpointer = self.endpointer_factory(backend, source.SAMPLE_RATE, self.recognizer.pause_threshold)
+                # The VAD tracks the noise floor itself, no calibration pause needed
+                segmenter = SpeechSegmenter(VoiceActivityDetector(source.SAMPLE_WIDTH), source.SAMPLE_RATE,
+                                            source.SAMPLE_WIDTH, pause=self.recognizer.pause_threshold,
+                                            max_phrase=max_phrase, gate=gate, on_onset=on_onset, endpointer=endpointer)
+            else:
+                with self.metrics.span('calibrate'):
+                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        except Exception as e:
+            self._end(session, f"Microphone Error: {str(e)}", "error")
+            return
+        if streaming and backend.supports_streaming:
+            activation = None
+        if activation is not None:
+            try:
+                activation.prepare(backend, source.SAMPLE_RATE)
+            except Exception as e:
+                self._end(session, f"Activation Error: {str(e)}", "error")
+                return
+
+        def listen():
+            if segmenter is not None:
+                segment = read_segment(source, segmenter)
+                if not segment:
+                    return None
+                self.metrics.record('endpoint', segmenter.last_pause)
+                return sr.AudioData(segment, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+            try:
+                return self.recognizer.listen(source, timeout=1, phrase_time_limit=max_phrase)
+            except sr.WaitTimeoutError:
+                return None
+
+        def capture():
+            audio = listen()
+            if audio is not None and activation is not None and not activation.allow(audio):
+                self.event_log.record('gated', mode=activation.name,
+                                      seconds=round(len(audio.frame_data) / (audio.sample_rate * audio.sample_width), 3))
+                return None
+            if audio is None or preprocessor is None:
+                return audio
+            with self.metrics.span('preprocess'):
+                return preprocessor.process(audio)
+
+        def recognize(audio):
+            text = backend.recognize(audio)
+            if activation is not None:
+                # "hey keyboard go left" is only "go left"
+                text = activation.strip(text)
+                if not text:
+                    raise sr.UnknownValueError()
+            return text
+
+        stop_on = lambda result: result == self.stop_message
+        if streaming and backend.supports_streaming:
+            worker = StreamingDictation(source, backend, self.keyboard, self.act, self.is_command,
+                                        holdback=self.is_prefix, energy_threshold=self.recognizer.energy_threshold,
+                                        stop_on=stop_on, gate=gate, on_onset=on_onset)
+        else:
+            # Enough recognizer threads to keep every worker process of a pool busy
+            workers = max(RECOGNIZER_WORKERS, backend.workers or 0)
+            worker = VoicePipeline(capture, recognize, self.act, workers=workers, stop_on=stop_on,
+                                   metrics=self.metrics)
+        session.worker = worker
+        if session.stopping.is_set():
+            return
+        worker.start()
+        self._set_status(LISTENING_MESSAGE)
+        try:
+            self._relay(session, worker)
+        finally:
+            worker.stop()
+            worker.join(timeout=2)
+            with self._lock:
+                if isinstance(worker, StreamingDictation):
+                    self._status['first_char_stats'] = worker.first_char.summary()
+                elif segmenter is not None:
+                    self._status['vad_stats'] = segmenter.summary()
+                if self.feedback is not None:
+                    self._status['feedback_stats'] = dict(self.feedback.stats)
+                if preprocessor is not None:
+                    self._status['preprocess_stats'] = preprocessor.summary(backend.stats.summary()['mean_ms'])
+                if activation is not None:
+                    self._status['activation_stats'] = activation.summary(backend.stats.summary()['mean_ms'])
+
+    @staticmethod
+    def _say(session, text, priority):
+        if session.feedback is not None:
+            # All results share a key, so only the latest waiting one is read out
+            session.feedback.say(text, priority, key='result')
+
+    def _relay(self, session, worker):
+        """Turn worker events into status updates until the worker stops"""
+        while True:
+            try:
+                kind, seq, payload = worker.events.get(timeout=0.5)
+            except queue.Empty:
+                if session.stopping.is_set() and not worker.running:
+                    return
+                continue
+
+            if kind == 'recognized':
+                self.event_log.record('recognized', seq=seq, text=payload)
+                with self._lock:
+                    self._history.append(payload)
+                self._set_status(f"Recognized: {payload}", "info", current_query=payload)
+            elif kind == 'result':
+                if payload == self.stop_message:
+                    self._say(session, "Stopped", tts.URGENT)
+                    self._end(session, "Voice assistant stopped!", "warning")
+                else:
+                    self._say(session, spoken_result(payload), tts.LOW)
+                    self._set_status(payload, "success")
+            elif kind == 'timing':
+                self.event_log.record('timing', seq=seq, **payload)
+            elif kind == 'error':
+                self.event_log.record('error', seq=seq, error=type(payload).__name__, message=str(payload))
+                if isinstance(payload, sr.UnknownValueError):
+                    self._say(session, "Sorry?", tts.NORMAL)
+                    self._set_status("Could not understand audio", "error")
+                elif isinstance(payload, sr.RequestError):
+                    self._say(session, "Recognition service error", tts.URGENT)
+                    self._end(session, f"Recognition service error: {str(payload)}", "error")
+                else:
+                    self._say(session, "Error", tts.URGENT)
+                    self._end(session, f"Error: {str(payload)}", "error")
+            elif kind == 'fatal':
+                self.event_log.record('error', seq=seq, error=type(payload).__name__, message=str(payload))
+                self._say(session, "Error", tts.URGENT)
+                self._end(session, f"Error: {str(payload)}", "error")
+            elif kind == 'stopped':
+                self._end(session, "Voice assistant stopped!", "warning")
+                return
@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+import threading
+
+# Recorded macros survive restarts in this file
+MACROS_PATH = os.environ.get('VK_MACROS', os.path.join(os.path.expanduser('~'), '.voice_keyboard_macros.json'))
+
+
+class MacroStore:
+    """Named key-event sequences, recorded from commands and kept on disk
+
+    A macro is the list of ('write' | 'press' | 'hotkey', value) events that
+    commands.plan_actions produced while it was being recorded, so playing
+    it back is a single ``keyboard.send`` with no parsing or recognition.
+    The file is read on first use and rewritten whenever a macro is saved
+    or deleted. A file that cannot be read is moved aside to ``<path>.bad``
+    and the store starts empty, with the reason in ``last_error``.
+    """
+
+    def __init__(self, path=MACROS_PATH):
+        self.path = path
+        self.recording = None
+        self._events = []
+        self._macros = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._macros is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    data = json.load(f)
+                self._macros = {name: [tuple(event) for event in events] for name, events in data.items()}
+            except FileNotFoundError:
+                self._macros = {}
+            except (ValueError, TypeError, AttributeError) as e:
+                # A broken file must not take the listener down; keep it for inspection
+                self._macros = {}
+                self.last_error = f"could not read {self.path} ({e}), starting with no macros"
+                try:
+                    os.replace(self.path, self.path + ".bad")
+                    self.last_error += f"; the file was moved to {self.path}.bad"
+                except OSError:
+                    pass
+                print(f"[macros] {self.last_error}", file=sys.stderr, flush=True)
+        return self._macros
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves half a file
+        temporary = self.path + ".tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self._macros, f, indent=1)
+        os.replace(temporary, self.path)
+
+    def names(self):
+        with self._lock:
+            return sorted(self._load())
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._load()
+
+    def get(self, name):
+        """The events of macro ``name``, or None"""
+        with self._lock:
+            events = self._load().get(name)
+            return list(events) if events is not None else None
+
+    def start(self, name):
+        """Begin recording ``name``; a recording already running is discarded"""
+        with self._lock:
+            self.recording = name
+            self._events = []
+
+    def capture(self, events):
+        """Add events to the macro being recorded"""
+        with self._lock:
+            if self.recording is not None:
+                self._events.extend(events)
+
+    def finish(self):
+        """Save the macro being recorded; returns (name, event count) or None"""
+        with self._lock:
+            if self.recording is None:
+                return None
+            name, events = self.recording, self._events
+            self.recording = None
+            self._events = []
+            self._load()[name] = events
+            self._save()
+            return name, len(events)
+
+    def delete(self, name):
+        with self._lock:
+            if self._load().pop(name, None) is None:
+                return False
+            self._save()
+            return True
@@ -0,0 +1,168 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets: upper bounds from 50 us, each 25% wider, up to ~80 s
+BUCKET_COUNT = 64
+BUCKET_BASE_MS = 0.05
+BUCKET_GROWTH = 1.25
+BUCKET_BOUNDS_MS = [BUCKET_BASE_MS * BUCKET_GROWTH ** i for i in range(BUCKET_COUNT)]
+
+# Stages in the order a phrase passes through them, for reports
+STAGES = ('calibrate', 'capture', 'endpoint', 'preprocess', 'recognize', 'parse', 'inject', 'total')
+
+
+class Histogram:
+    """Fixed-size latency histogram: memory stays the same however long it runs
+
+    Samples land in log-spaced buckets, so percentiles are estimates within
+    one bucket width (25%). Failed operations are timed like the rest and
+    also counted by exception type.
+    """
+
+    def __init__(self, bounds=BUCKET_BOUNDS_MS):
+        self.bounds = bounds
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = {}
+
+    def record(self, seconds, error=None):
+        ms = seconds * 1000
+        index = bisect.bisect_left(self.bounds, ms)
+        with self._lock:
+            self._buckets[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            if error is not None:
+                kind = type(error).__name__
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def percentile(self, pct):
+        """Estimated ``pct`` percentile in milliseconds, interpolated inside its bucket"""
+        with self._lock:
+            buckets, count, max_ms = list(self._buckets), self.count, self.max_ms
+        if not count:
+            return 0.0
+        rank = pct / 100.0 * count
+        seen = 0
+        for index, n in enumerate(buckets):
+            if n and seen + n >= rank:
+                low = self.bounds[index - 1] if index else 0.0
+                high = self.bounds[index] if index < len(self.bounds) else max_ms
+                return min(max_ms, low + (high - low) * (rank - seen) / n)
+            seen += n
+        return max_ms
+
+    def summary(self):
+        with self._lock:
+            count, total_ms, max_ms, errors = self.count, self.total_ms, self.max_ms, dict(self.errors)
+        failed = sum(errors.values())
+        return {
+            'count': count,
+            'mean_ms': round(total_ms / count, 2) if count else 0.0,
+            'p50_ms': round(self.percentile(50), 2),
+            'p95_ms': round(self.percentile(95), 2),
+            'p99_ms': round(self.percentile(99), 2),
+            'max_ms': round(max_ms, 2),
+            'errors': errors,
+            'error_rate': round(failed / count, 4) if count else 0.0,
+        }
+
+
+class Metrics:
+    """Per-stage latency histograms for the whole listening path
+
+    ``with metrics.span('recognize'):`` times a block and records it under
+    that stage, counting it as an error if the block raises. Stages are
+    created on first use; ``snapshot()`` is what the UI panel, the JSON dump
+    and the metrics endpoint all show.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def histogram(self, stage):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            return histogram
+
+    def record(self, stage, seconds, error=None):
+        self.histogram(stage).record(seconds, error)
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(stage, time.perf_counter() - start, e)
+            raise
+        self.record(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        """{'uptime_s', 'stages': {stage: summary}} with the known stages first"""
+        with self._lock:
+            stages = dict(self._stages)
+        order = [stage for stage in STAGES if stage in stages] + sorted(set(stages) - set(STAGES))
+        return {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'uptime_s': round(time.time() - self.started, 1),
+            'stages': {stage: stages[stage].summary() for stage in order},
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def dump(self, path):
+        """Write the snapshot as JSON, replacing ``path`` atomically"""
+        temporary = path + ".tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+        os.replace(temporary, path)
+
+
+def serve(metrics, port, host='127.0.0.1'):
+    """Answer ``GET /metrics`` with the JSON snapshot from a background thread
+
+    Returns the server; call ``shutdown()`` on it to stop.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.to_json().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="vk-metrics", daemon=True).start()
+    return server
+
+
+# Shared by the listener, the command path and both front ends
+METRICS = Metrics()
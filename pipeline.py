@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+
+# Queue sizes bound how far capture may run ahead of recognition and typing
+AUDIO_QUEUE_SIZE = 4
+ACTION_QUEUE_SIZE = 16
+RECOGNIZER_WORKERS = 2
+
+_SENTINEL = object()
+
+
+class VoicePipeline:
+    """Capture -> recognition workers -> in-order injection, each on its own thread
+
+    capture() returns an audio segment or None when nothing was heard,
+    recognize(audio) returns text, and act(text) performs the keystrokes and
+    returns a status string. Progress is reported on the ``events`` queue as
+    (kind, seq, payload) tuples so the UI thread never touches the workers.
+    After each result a ('timing', seq, {'capture_ms', 'recognize_ms',
+    'total_ms'}) event follows, total being from the end of capture until
+    the keystrokes were sent; with ``metrics`` (a metrics.Metrics) the same
+    figures are recorded there.
+    """
+
+    def __init__(self, capture, recognize, act, workers=RECOGNIZER_WORKERS,
+                 audio_queue_size=AUDIO_QUEUE_SIZE, action_queue_size=ACTION_QUEUE_SIZE,
+                 stop_on=None, metrics=None):
+        self.capture = capture
+        self.recognize = recognize
+        self.act = act
+        self.stop_on = stop_on or (lambda result: False)
+        self.workers = workers
+        self.metrics = metrics
+        self.events = queue.Queue()
+        self.stats = {'captured': 0, 'recognized': 0, 'injected': 0, 'errors': 0, 'max_audio_depth': 0}
+
+        self._audio = queue.Queue(maxsize=audio_queue_size)
+        self._actions = queue.Queue(maxsize=action_queue_size)
+        self._stopping = threading.Event()
+        self._order = threading.Condition()
+        self._pending = {}
+        self._next_seq = 0
+        self._live_workers = 0
+        self._threads = []
+
+    @property
+    def running(self):
+        return not self._stopping.is_set() and any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """Start capture, recognizer and injector threads"""
+        self._live_workers = self.workers
+        self._threads = [threading.Thread(target=self._capture_loop, name="vk-capture", daemon=True)]
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(target=self._recognize_loop, name=f"vk-recognize-{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._inject_loop, name="vk-inject", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Ask every stage to finish; pending audio is discarded"""
+        self._stopping.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _put(self, q, item):
+        # Block while the next stage is saturated (backpressure), but keep
+        # checking for shutdown so a stop never hangs on a full queue
+        while not self._stopping.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _capture_loop(self):
+        seq = 0
+        try:
+            while not self._stopping.is_set():
+                start = time.perf_counter()
+                audio = self.capture()
+                if audio is None:
+                    continue
+                captured = time.perf_counter()
+                if self.metrics is not None:
+                    self.metrics.record('capture', captured - start)
+                if not self._put(self._audio, (seq, audio, (captured, captured - start))):
+                    break
+                seq += 1
+                self.stats['captured'] += 1
+                self.stats['max_audio_depth'] = max(self.stats['max_audio_depth'], self._audio.qsize())
+        except Exception as e:
+            self.events.put(('fatal', None, e))
+            self.stop()
+        finally:
+            for _ in range(self.workers):
+                self._audio.put(_SENTINEL)
+
+    def _recognize_loop(self):
+        while True:
+            item = self._audio.get()
+            if item is _SENTINEL:
+                break
+            seq, audio, timing = item
+            if self._stopping.is_set():
+                continue
+            start = time.perf_counter()
+            try:
+                text, error = self.recognize(audio), None
+            except Exception as e:
+                text, error = None, e
+            elapsed = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.record('recognize', elapsed, error)
+            self._release(seq, text, error, timing + (elapsed,))
+        with self._order:
+            self._live_workers -= 1
+            if self._live_workers == 0:
+                self._actions.put(_SENTINEL)
+
+    def _release(self, seq, text, error, timing):
+        """Hand results to the injector strictly in capture order"""
+        with self._order:
+            self._pending[seq] = (text, error, timing)
+            while self._next_seq in self._pending:
+                ready = self._pending.pop(self._next_seq)
+                if not self._put(self._actions, (self._next_seq,) + ready):
+                    return
+                self._next_seq += 1
+
+    def _inject_loop(self):
+        while True:
+            item = self._actions.get()
+            if item is _SENTINEL:
+                break
+            if self._stopping.is_set():
+                continue
+            seq, text, error, (captured, capture_time, recognize_time) = item
+            if error is not None:
+                self.stats['errors'] += 1
+                self.events.put(('error', seq, error))
+                continue
+            if not text:
+                continue
+            self.stats['recognized'] += 1
+            self.events.put(('recognized', seq, text))
+            try:
+                result = self.act(text)
+            except Exception as e:
+                self.events.put(('fatal', seq, e))
+                self.stop()
+                continue
+            self.stats['injected'] += 1
+            total = time.perf_counter() - captured
+            if self.metrics is not None:
+                self.metrics.record('total', total)
+            self.events.put(('result', seq, result))
+            self.events.put(('timing', seq, {'capture_ms': round(capture_time * 1000, 2),
+                                             'recognize_ms': round(recognize_time * 1000, 2),
+                                             'total_ms': round(total * 1000, 2)}))
+            if self.stop_on(result):
+                self.stop()
+        self.events.put(('stopped', None, None))
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+# Frames quieter than the loudest by this much are trimmed from either end
+TRIM_RANGE_DB = 30.0
+# Silence kept around the speech so soft onsets and endings survive
+TRIM_PAD = 0.15
+# Frame length used to find the speech
+TRIM_FRAME = 0.01
+
+# Taps of the low-pass filter applied before downsampling
+FILTER_TAPS = 63
+
+_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def to_float(raw, sample_width):
+    """Little-endian PCM bytes -> float32 samples in [-1, 1]"""
+    dtype = _DTYPES[sample_width]
+    return np.frombuffer(raw, dtype=dtype).astype(np.float32) / float(np.iinfo(dtype).max)
+
+
+def to_pcm16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def downmix(samples, channels):
+    """Interleaved multi-channel samples -> mono, by averaging the channels"""
+    if channels == 1:
+        return samples
+    return samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+
+
+def trim_silence(samples, sample_rate, range_db=TRIM_RANGE_DB, pad=TRIM_PAD):
+    """The samples from just before the first sound to just after the last one"""
+    frame = max(1, int(sample_rate * TRIM_FRAME))
+    frames = len(samples) // frame
+    if frames < 2:
+        return samples
+    energy = np.square(samples[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    level_db = 10.0 * np.log10(np.maximum(energy, 1e-12))
+    loud = np.flatnonzero(level_db > level_db.max() - range_db)
+    keep = int(pad * sample_rate)
+    start = max(0, loud[0] * frame - keep)
+    end = min(len(samples), (loud[-1] + 1) * frame + keep)
+    return samples[start:end]
+
+
+def _low_pass(cutoff):
+    # Windowed sinc; ``cutoff`` is in cycles per sample
+    n = np.arange(FILTER_TAPS) - (FILTER_TAPS - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(FILTER_TAPS)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(samples, source_rate, target_rate):
+    """Resample with linear interpolation, low-pass filtered first when downsampling"""
+    if source_rate == target_rate or not len(samples):
+        return samples
+    if target_rate < source_rate:
+        # Keep 90% of the new Nyquist band so nothing folds back as aliasing
+        samples = np.convolve(samples, _low_pass(0.45 * target_rate / source_rate), mode='same')
+    count = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(count, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+class AudioPreprocessor:
+    """Shrinks each phrase before it goes to the recognizer
+
+    Leading and trailing silence is trimmed and the audio is resampled to
+    ``sample_rate`` as 16-bit mono, so less audio is uploaded or decoded.
+    Byte counts, audio seconds and the time spent are kept in ``stats``.
+    """
+
+    def __init__(self, sample_rate, trim=True):
+        self.sample_rate = sample_rate
+        self.trim = trim
+        self._lock = threading.Lock()
+        self.stats = {'phrases': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds_in': 0.0, 'seconds_out': 0.0,
+                      'seconds': 0.0}
+
+    def process(self, audio):
+        start = time.perf_counter()
+        samples = to_float(audio.frame_data, audio.sample_width)
+        if self.trim:
+            samples = trim_silence(samples, audio.sample_rate)
+        samples = resample(samples, audio.sample_rate, self.sample_rate)
+        result = sr.AudioData(to_pcm16(samples), self.sample_rate, 2)
+        with self._lock:
+            stats = self.stats
+            stats['phrases'] += 1
+            stats['bytes_in'] += len(audio.frame_data)
+            stats['bytes_out'] += len(result.frame_data)
+            stats['seconds_in'] += len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+            stats['seconds_out'] += len(result.frame_data) / (self.sample_rate * 2)
+            stats['seconds'] += time.perf_counter() - start
+        return result
+
+    def summary(self, recognize_ms=0.0):
+        """Totals plus the estimated recognition time saved per phrase
+
+        ``recognize_ms`` is the backend's mean time per preprocessed phrase.
+        Recognition time is taken to grow with audio length, as it does for
+        uploads and local decoders, so audio trimmed to two thirds would
+        have taken half as long again, less the time spent preprocessing.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        phrases = stats['phrases']
+        if not phrases:
+            return {'phrases': 0}
+        kept = stats['seconds_out'] / stats['seconds_in'] if stats['seconds_in'] else 1.0
+        cost_ms = 1000 * stats['seconds'] / phrases
+        return {
+            'phrases': phrases,
+            'bytes_in': stats['bytes_in'],
+            'bytes_out': stats['bytes_out'],
+            'reduction': round(1 - stats['bytes_out'] / stats['bytes_in'], 3) if stats['bytes_in'] else 0.0,
+            'seconds_trimmed': round((stats['seconds_in'] - stats['seconds_out']) / phrases, 3),
+            'preprocess_ms': round(cost_ms, 2),
+            'saved_ms': round(recognize_ms * (1 / kept - 1) - cost_ms, 1) if kept else 0.0,
+        }
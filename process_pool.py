@@ -0,0 +1,165 @@
+import atexit
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import speech_recognition as sr
+
+from recognizers import RECOGNIZER_BACKENDS, LatencyStats, RecognizerBackend, create_recognizer
+
+# Leave one core for capture, injection and the UI
+DEFAULT_PROCESSES = max(1, (os.cpu_count() or 2) - 1)
+
+# Largest phrase a shared-memory slot holds: 30 s of 16-bit 48 kHz mono
+SLOT_BYTES = 30 * 48000 * 2
+
+# Each worker gets this many slots, so the next phrase is ready when it finishes one
+SLOTS_PER_WORKER = 2
+
+# State of one worker process, set up once by _init_worker
+_backend = None
+_init_error = None
+_attached = {}
+
+
+def _init_worker(name, options):
+    global _backend, _init_error
+    try:
+        _backend = create_recognizer(name, **options)
+        load_model = getattr(_backend, 'load_model', None)
+        if load_model is not None:
+            load_model()
+    except Exception as e:
+        # Reported on every call rather than breaking the whole pool
+        _init_error = f"{type(e).__name__}: {e}"
+
+
+def _warm_up():
+    # Keeps the worker busy for a moment, so each warm-up lands on a new process
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def _recognize_in_worker(slot, length, data, sample_rate, sample_width, hints=None):
+    started = time.time()
+    if _init_error is not None:
+        raise sr.RequestError(f"recognizer failed to load in worker process: {_init_error}")
+    if slot is not None:
+        memory = _attached.get(slot)
+        if memory is None:
+            memory = _attached[slot] = shared_memory.SharedMemory(name=slot)
+        data = bytes(memory.buf[:length])
+    text, confidence = _backend.recognize_scored(sr.AudioData(data, sample_rate, sample_width), hints)
+    return text, confidence, started
+
+
+class ProcessPoolRecognizer(RecognizerBackend):
+    """Runs a CPU-bound recognizer in worker processes, one model per worker
+
+    Each of the ``workers`` processes creates the ``name`` backend and loads
+    its model once, so several phrases decode on different cores instead of
+    queueing behind the GIL. Audio goes through reusable shared-memory slots
+    and only the slot name and length are pickled. When every slot is in use
+    a new phrase waits for one to free up. ``pool_stats`` tracks phrases in
+    flight and queued beyond the worker count, and ``queue_wait`` the time
+    each phrase waited for a free worker.
+    """
+
+    def __init__(self, name, workers=DEFAULT_PROCESSES, slot_bytes=SLOT_BYTES, **options):
+        if name not in RECOGNIZER_BACKENDS:
+            raise ValueError(f"Unknown recognizer '{name}', choose from: {', '.join(RECOGNIZER_BACKENDS)}")
+        super().__init__()
+        self.name = name
+        self.workers = workers
+        self.sample_rate = RECOGNIZER_BACKENDS[name].sample_rate
+        self.slot_bytes = slot_bytes
+        self.options = options
+        self.queue_wait = LatencyStats()
+        self.pool_stats = {'submitted': 0, 'in_flight': 0, 'max_in_flight': 0, 'queued': 0, 'max_queued': 0,
+                           'oversize': 0}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._slots = []
+        self._free = queue.Queue()
+        atexit.register(self.close)
+
+    def load_model(self):
+        """Start the workers and wait until each has loaded its model"""
+        pool = self._start()
+        warm = [pool.submit(_warm_up) for _ in range(self.workers)]
+        concurrent.futures.wait(warm)
+
+    def _start(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: the parent runs audio and UI threads
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker, initargs=(self.name, self.options))
+                if not self._slots:
+                    for _ in range(self.workers * SLOTS_PER_WORKER):
+                        self._slots.append(shared_memory.SharedMemory(create=True, size=self.slot_bytes))
+                        self._free.put(self._slots[-1])
+            return self._pool
+
+    def _track(self, change):
+        with self._lock:
+            stats = self.pool_stats
+            stats['in_flight'] += change
+            stats['queued'] = max(0, stats['in_flight'] - self.workers)
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+            stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+            if change > 0:
+                stats['submitted'] += 1
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _recognize_scored(self, audio, hints=None):
+        pool = self._start()
+        data = audio.get_raw_data()
+        memory = self._free.get()
+        self._track(1)
+        try:
+            if len(data) <= self.slot_bytes:
+                memory.buf[:len(data)] = data
+                args = (memory.name, len(data), None)
+            else:
+                with self._lock:
+                    self.pool_stats['oversize'] += 1
+                args = (None, 0, data)
+            submitted = time.time()
+            try:
+                text, confidence, started = pool.submit(_recognize_in_worker, *args, audio.sample_rate,
+                                                        audio.sample_width, hints).result()
+            except concurrent.futures.process.BrokenProcessPool as e:
+                # A worker died (out of memory, crash in native code); start afresh next time
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                pool.shutdown(wait=False)
+                raise sr.RequestError(f"recognizer worker process died: {e}")
+            self.queue_wait.record(max(0.0, started - submitted))
+            return text, confidence
+        finally:
+            self._track(-1)
+            self._free.put(memory)
+
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            slots, self._slots = self._slots, []
+            self._free = queue.Queue()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for memory in slots:
+            memory.close()
+            try:
+                memory.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,684 @@
+import collections
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+# Backend used when nothing else is configured
+DEFAULT_RECOGNIZER = os.environ.get('VK_RECOGNIZER', 'google')
+
+# Vosk models expect 16 kHz, 16-bit mono PCM
+VOSK_SAMPLE_RATE = 16000
+VOSK_MODEL_PATH = os.environ.get('VK_VOSK_MODEL', 'model')
+
+# WAV + transcript pairs for the fake backend
+FIXTURES_DIR = os.environ.get('VK_FIXTURES')
+
+# Acoustic fingerprints: 25 ms frames every 10 ms at 16 kHz, squeezed into
+# a fixed grid of time steps x log-spaced frequency bands
+FINGERPRINT_RATE = 16000
+FINGERPRINT_FRAME = 400
+FINGERPRINT_HOP = 160
+FINGERPRINT_STEPS = 24
+FINGERPRINT_BANDS = 12
+_FINGERPRINT_WINDOW = np.hanning(FINGERPRINT_FRAME).astype(np.float32)
+# Band edges in FFT bins, from ~160 Hz up to Nyquist
+_FINGERPRINT_EDGES = np.geomspace(4, FINGERPRINT_FRAME // 2 + 1, FINGERPRINT_BANDS + 1).astype(int)[:-1]
+
+# Sphinx decodes 16 kHz audio in 10 ms frames
+SPHINX_SAMPLE_RATE = 16000
+SPHINX_FRAME = 160
+# Keyword sensitivity passed to recognize_sphinx, 0 (fewer detections) to 1
+SPHINX_SENSITIVITY = 0.8
+# Frames within this many dB of the loudest one count as speech
+SPEECH_RANGE_DB = 30.0
+
+# Command mode accepts a constrained or corrected result at this confidence
+COMMAND_THRESHOLD = 0.8
+# Whisper's prompt is limited to a couple of hundred tokens
+WHISPER_PROMPT_CHARS = 600
+
+# Racing backends: the first answer at least this confident wins outright
+RACE_THRESHOLD = 0.7
+# Phrases each raced backend may be decoding at once, lost races included
+RACE_IN_FLIGHT = 4
+
+# Recognition cache defaults
+CACHE_SIZE = 64
+CACHE_SIMILARITY = 0.92
+CACHE_MAX_SECONDS = 2.0
+
+
+def speech_frames(raw, frame=SPHINX_FRAME, range_db=SPEECH_RANGE_DB):
+    """Which ``frame``-sample frames of 16-bit PCM hold speech, by energy"""
+    samples = np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype=np.int16).astype(np.float32)
+    frames = len(samples) // frame
+    if not frames:
+        return np.zeros(0, dtype=bool)
+    energy = np.square(samples[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    level_db = 10.0 * np.log10(np.maximum(energy, 1e-12))
+    # Digital silence (below one step of the 16-bit scale) is never speech
+    return level_db > max(level_db.max() - range_db, 0.0)
+
+
+class LatencyStats:
+    """Thread-safe running latency figures for one recognizer backend"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._recent = collections.deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.count += 1
+            if not ok:
+                self.errors += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._recent.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def summary(self):
+        """Latency figures in milliseconds"""
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean_ms': round(1000 * self.total / self.count, 1) if self.count else 0.0,
+            'p50_ms': round(1000 * self.percentile(50), 1),
+            'p95_ms': round(1000 * self.percentile(95), 1),
+            'max_ms': round(1000 * self.max, 1),
+        }
+
+
+class RecognizerBackend:
+    """Turns an ``sr.AudioData`` into lower-case text
+
+    Subclasses implement ``_recognize`` and raise ``sr.UnknownValueError`` for
+    unintelligible audio or ``sr.RequestError`` when the engine is unavailable,
+    matching the errors ``speech_recognition`` already uses.
+    """
+
+    name = None
+    supports_streaming = False
+    # Can decode against a fixed phrase list, see recognize_constrained
+    supports_vocabulary = False
+    # Phrases it can usefully decode at once; None leaves it to the pipeline
+    workers = None
+    # Rate phrases are resampled to before recognition; None keeps the audio as captured
+    sample_rate = 16000
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.stats = LatencyStats()
+
+    def set_hints(self, phrases):
+        """Phrases to favour in open recognition from now on; ignored by backends without biasing"""
+
+    def recognize_constrained(self, audio, phrases):
+        """Decode using only the words in ``phrases``; returns (text, confidence 0..1)"""
+        raise NotImplementedError(f"{self.name} recognizer cannot restrict its vocabulary")
+
+    def recognize(self, audio):
+        return self.recognize_scored(audio)[0]
+
+    def recognize_scored(self, audio, hints=None):
+        """(text, confidence 0..1); backends that report no confidence give 1.0
+
+        ``hints`` stand in for the set_hints phrases for this call only, so
+        threads sharing a backend can each decode with their own.
+        """
+        start = time.perf_counter()
+        try:
+            text, confidence = self._recognize_scored(audio, hints)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return text.lower().strip(), confidence
+
+    def _recognize(self, audio):
+        raise NotImplementedError
+
+    def _recognize_scored(self, audio, hints=None):
+        return self._recognize(audio), 1.0
+
+    def create_stream(self, sample_rate):
+        """Incremental decoder for raw 16-bit mono chunks, see VoskStream"""
+        raise NotImplementedError(f"{self.name} recognizer does not support streaming")
+
+
+class GoogleRecognizer(RecognizerBackend):
+    """Google Web Speech API (needs network)"""
+
+    name = 'google'
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_google(audio)
+
+    def _recognize_scored(self, audio, hints=None):
+        # The raw response; only the best alternative usually has a confidence
+        response = self.recognizer.recognize_google(audio, show_all=True)
+        if not isinstance(response, dict) or not response.get('alternative'):
+            raise sr.UnknownValueError()
+        best = response['alternative'][0]
+        return best['transcript'], best.get('confidence', 1.0)
+
+
+class SphinxRecognizer(RecognizerBackend):
+    """CMU PocketSphinx, fully offline"""
+
+    name = 'sphinx'
+    supports_vocabulary = True
+
+    def _recognize(self, audio):
+        return self.recognizer.recognize_sphinx(audio)
+
+    def recognize_constrained(self, audio, phrases):
+        # Keyword spotting finds phrases anywhere in the audio, so "please copy
+        # that" would come back as "copy"; the score is the share of the speech
+        # the spotted phrases account for, and only a whole command scores high
+        entries = [(phrase, SPHINX_SENSITIVITY) for phrase in phrases if phrase.replace(" ", "").isalpha()]
+        decoder = self.recognizer.recognize_sphinx(audio, keyword_entries=entries, show_all=True)
+        spotted = [(seg.word, seg.start_frame, seg.end_frame) for seg in decoder.seg()
+                   if seg.word and seg.word[0] not in '<[']
+        if not spotted:
+            raise sr.UnknownValueError()
+        text = " ".join(" ".join(word.split()) for word, _, _ in spotted)
+        speech = speech_frames(audio.get_raw_data(convert_rate=SPHINX_SAMPLE_RATE, convert_width=2))
+        if not speech.any():
+            return text, 0.0
+        covered = np.zeros(len(speech), dtype=bool)
+        for _, start, end in spotted:
+            covered[max(0, start):end + 1] = True
+        return text, float(covered[speech].mean())
+
+
+class WhisperRecognizer(RecognizerBackend):
+    """OpenAI Whisper running locally on the CPU"""
+
+    name = 'whisper'
+
+    def __init__(self, recognizer=None, model='base.en'):
+        super().__init__(recognizer)
+        self.model = model
+        self.prompt = None
+
+    @staticmethod
+    def _prompt(phrases):
+        # Whisper continues in the style and vocabulary of its prompt
+        return ("Commands: " + ", ".join(phrases))[:WHISPER_PROMPT_CHARS] if phrases else None
+
+    def set_hints(self, phrases):
+        self.prompt = self._prompt(phrases)
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _recognize_scored(self, audio, hints=None):
+        prompt = self.prompt if hints is None else self._prompt(hints)
+        options = {'initial_prompt': prompt} if prompt else {}
+        return self.recognizer.recognize_whisper(audio, model=self.model, language='english', **options), 1.0
+
+
+class VoskRecognizer(RecognizerBackend):
+    """Vosk/Kaldi offline model, loaded once and shared between calls"""
+
+    name = 'vosk'
+    supports_streaming = True
+    supports_vocabulary = True
+
+    def __init__(self, recognizer=None, model_path=VOSK_MODEL_PATH):
+        super().__init__(recognizer)
+        self.model_path = model_path
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def load_model(self):
+        with self._model_lock:
+            if self._model is None:
+                try:
+                    import vosk
+                except ImportError:
+                    raise sr.RequestError("missing vosk module: ensure that vosk is set up correctly.")
+                if not os.path.isdir(self.model_path):
+                    raise sr.RequestError(f"missing vosk model: download one into '{self.model_path}'")
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path)
+        return self._model
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _recognize_scored(self, audio, hints=None):
+        import vosk
+
+        # KaldiRecognizer is not thread-safe, so each phrase gets its own
+        decoder = vosk.KaldiRecognizer(self.load_model(), VOSK_SAMPLE_RATE)
+        decoder.SetWords(True)
+        decoder.AcceptWaveform(audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2))
+        result = json.loads(decoder.FinalResult())
+        text = result.get('text', '')
+        if not text:
+            raise sr.UnknownValueError()
+        words = result.get('result', [])
+        return text, sum(word['conf'] for word in words) / len(words) if words else 1.0
+
+    def recognize_constrained(self, audio, phrases):
+        import vosk
+
+        # A grammar decoder only considers these phrases, anything else is [unk]
+        decoder = vosk.KaldiRecognizer(self.load_model(), VOSK_SAMPLE_RATE, json.dumps(list(phrases) + ['[unk]']))
+        decoder.SetWords(True)
+        decoder.AcceptWaveform(audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2))
+        result = json.loads(decoder.FinalResult())
+        words = result.get('result', [])
+        if not words:
+            raise sr.UnknownValueError()
+        if any(word['word'] == '[unk]' for word in words):
+            return result['text'], 0.0
+        return result['text'], min(word['conf'] for word in words)
+
+    def create_stream(self, sample_rate):
+        import vosk
+
+        return VoskStream(vosk.KaldiRecognizer(self.load_model(), sample_rate))
+
+
+class VoskStream:
+    """Partial and final hypotheses from a Vosk decoder fed chunk by chunk"""
+
+    def __init__(self, decoder):
+        self.decoder = decoder
+
+    def accept(self, chunk):
+        """Feed raw PCM, returns (text, is_final)"""
+        if self.decoder.AcceptWaveform(bytes(chunk)):
+            return json.loads(self.decoder.Result()).get('text', ''), True
+        return json.loads(self.decoder.PartialResult()).get('partial', ''), False
+
+    def finish(self):
+        return json.loads(self.decoder.FinalResult()).get('text', '')
+
+
+class FakeRecognizer(RecognizerBackend):
+    """Deterministic stand-in that maps known WAV fixtures to their transcripts
+
+    Fixtures are ``name.wav`` files with a ``name.txt`` transcript next to
+    them. Audio is matched on a hash of its raw PCM data, so replaying a
+    fixture through ``sr.AudioFile`` always yields the same text without any
+    network or model. ``delay`` simulates recognition time in seconds.
+    """
+
+    name = 'fake'
+    # Fixtures are matched byte for byte
+    sample_rate = None
+
+    def __init__(self, recognizer=None, fixtures_dir=FIXTURES_DIR, delay=0.0):
+        super().__init__(recognizer)
+        self.delay = delay
+        self.transcripts = {}
+        if fixtures_dir:
+            self.load_fixtures(fixtures_dir)
+
+    @staticmethod
+    def fingerprint(audio):
+        return hashlib.sha1(audio.get_raw_data()).hexdigest()
+
+    def add(self, audio, text):
+        self.transcripts[self.fingerprint(audio)] = text
+
+    def load_fixtures(self, fixtures_dir):
+        for wav_path in sorted(glob.glob(os.path.join(fixtures_dir, '*.wav'))):
+            txt_path = os.path.splitext(wav_path)[0] + '.txt'
+            if not os.path.exists(txt_path):
+                continue
+            with open(txt_path, encoding='utf-8') as f:
+                text = f.read().strip()
+            with sr.AudioFile(wav_path) as source:
+                self.add(self.recognizer.record(source), text)
+
+    def _recognize(self, audio):
+        if self.delay:
+            time.sleep(self.delay)
+        text = self.transcripts.get(self.fingerprint(audio))
+        if text is None:
+            raise sr.UnknownValueError()
+        return text
+
+
+def acoustic_fingerprint(audio):
+    """Quantized log band-energy envelope of an utterance as (int8 vector, seconds)
+
+    Leading and trailing silence are trimmed and the envelope is stretched to
+    a fixed number of time steps, so the same short command said at a
+    slightly different pace lands close by cosine similarity.
+    """
+    raw = audio.get_raw_data(convert_rate=FINGERPRINT_RATE, convert_width=2)
+    samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32)
+    seconds = samples.size / FINGERPRINT_RATE
+    if samples.size < FINGERPRINT_FRAME:
+        return None, seconds
+    count = 1 + (samples.size - FINGERPRINT_FRAME) // FINGERPRINT_HOP
+    index = np.arange(FINGERPRINT_FRAME)[None, :] + FINGERPRINT_HOP * np.arange(count)[:, None]
+    power = np.abs(np.fft.rfft(samples[index] * _FINGERPRINT_WINDOW, axis=1)) ** 2
+    bands = np.log(np.add.reduceat(power, _FINGERPRINT_EDGES, axis=1) + 1e-3)
+
+    # Keep frames within ~40 dB of the loudest one
+    loudness = bands.mean(axis=1)
+    voiced = np.flatnonzero(loudness > loudness.max() - 9.2)
+    bands = bands[voiced[0]:voiced[-1] + 1]
+    steps = np.linspace(0, len(bands) - 1, FINGERPRINT_STEPS)
+    grid = np.stack([np.interp(steps, np.arange(len(bands)), band) for band in bands.T], axis=1)
+
+    grid -= grid.mean()
+    peak = np.abs(grid).max()
+    if not peak:
+        return None, seconds
+    return np.round(grid.ravel() * (127 / peak)).astype(np.int8), seconds
+
+
+class CachedRecognizer(RecognizerBackend):
+    """LRU cache of recent short utterances in front of another backend
+
+    Audio whose fingerprint is at least ``similarity`` (cosine) close to a
+    cached one, with a similar duration, gets the cached text without calling
+    the wrapped recognizer. Only results for which ``cacheable(text)`` is
+    true are stored, typically command phrases, so dictation always goes to
+    the real recognizer.
+    """
+
+    def __init__(self, backend, size=CACHE_SIZE, similarity=CACHE_SIMILARITY,
+                 max_seconds=CACHE_MAX_SECONDS, cacheable=None):
+        super().__init__(backend.recognizer)
+        self.backend = backend
+        self.name = backend.name
+        self.supports_streaming = backend.supports_streaming
+        self.supports_vocabulary = backend.supports_vocabulary
+        self.workers = backend.workers
+        self.sample_rate = backend.sample_rate
+        self.similarity = similarity
+        self.max_seconds = max_seconds
+        self.cacheable = cacheable or (lambda text: True)
+        dim = FINGERPRINT_STEPS * FINGERPRINT_BANDS
+        self._vectors = np.zeros((size, dim), dtype=np.int8)
+        self._norms = np.ones(size, dtype=np.float32)
+        self._seconds = np.zeros(size, dtype=np.float32)
+        self._texts = [None] * size
+        self._lru = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_stats = {'hits': 0, 'misses': 0, 'skipped': 0, 'stored': 0, 'evictions': 0}
+
+    def _lookup(self, vector, seconds):
+        used = list(self._lru)
+        if not used:
+            return None
+        sims = (self._vectors[used].astype(np.int32) @ vector.astype(np.int32)) / (
+            self._norms[used] * float(np.linalg.norm(vector.astype(np.float32))))
+        ratio = self._seconds[used] / seconds
+        sims[(ratio < 0.7) | (ratio > 1.4)] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] < self.similarity:
+            return None
+        slot = used[best]
+        self._lru.move_to_end(slot)
+        return self._texts[slot]
+
+    def _store(self, vector, seconds, text):
+        if len(self._lru) < len(self._texts):
+            slot = len(self._lru)
+        else:
+            slot, _ = self._lru.popitem(last=False)
+            self.cache_stats['evictions'] += 1
+        self._vectors[slot] = vector
+        self._norms[slot] = float(np.linalg.norm(vector.astype(np.float32)))
+        self._seconds[slot] = seconds
+        self._texts[slot] = text
+        self._lru[slot] = None
+        self.cache_stats['stored'] += 1
+
+    def set_hints(self, phrases):
+        self.backend.set_hints(phrases)
+
+    def recognize_constrained(self, audio, phrases):
+        return self.backend.recognize_constrained(audio, phrases)
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _recognize_scored(self, audio, hints=None):
+        vector, seconds = acoustic_fingerprint(audio)
+        if vector is None or seconds > self.max_seconds:
+            with self._lock:
+                self.cache_stats['skipped'] += 1
+            return self.backend.recognize_scored(audio, hints)
+        with self._lock:
+            text = self._lookup(vector, seconds)
+            self.cache_stats['hits' if text is not None else 'misses'] += 1
+        if text is not None:
+            return text, 1.0
+        text, confidence = self.backend.recognize_scored(audio, hints)
+        if self.cacheable(text):
+            with self._lock:
+                self._store(vector, seconds, text)
+        return text, confidence
+
+    def create_stream(self, sample_rate):
+        return self.backend.create_stream(sample_rate)
+
+
+class CommandModeRecognizer(RecognizerBackend):
+    """Favours command phrases over open dictation for another backend
+
+    ``corrector`` (a fuzzy.CommandCorrector) supplies the command vocabulary
+    and decides what counts as a command. Backends that can restrict their
+    vocabulary first decode against it, and a command found with at least
+    ``threshold`` confidence is used as is. Otherwise the audio is decoded
+    normally, with the vocabulary as a hint where the backend takes one,
+    and a near miss at least ``threshold`` similar to a command is replaced
+    by that command. Everything else stays dictation.
+    """
+
+    def __init__(self, backend, corrector, threshold=COMMAND_THRESHOLD):
+        super().__init__(backend.recognizer)
+        self.backend = backend
+        self.name = backend.name
+        self.supports_streaming = backend.supports_streaming
+        self.workers = backend.workers
+        self.sample_rate = backend.sample_rate
+        self.corrector = corrector
+        self.threshold = threshold
+        self.command_stats = {'constrained': 0, 'corrected': 0, 'dictation': 0}
+        self._lock = threading.Lock()
+
+    def set_hints(self, phrases):
+        self.backend.set_hints(phrases)
+
+    def _count(self, key):
+        with self._lock:
+            self.command_stats[key] += 1
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _recognize_scored(self, audio, hints=None):
+        vocabulary = self.corrector.vocabulary()
+        if self.backend.supports_vocabulary:
+            try:
+                text, confidence = self.backend.recognize_constrained(audio, vocabulary)
+            except sr.UnknownValueError:
+                text, confidence = "", 0.0
+            if text and confidence >= self.threshold and self.corrector.is_command(text):
+                self._count('constrained')
+                return text, confidence
+        # Per call: the backend is shared with plain dictation and with other phrases in flight
+        text, confidence = self.backend.recognize_scored(audio, vocabulary)
+        corrected, score = self.corrector.correct(text)
+        if corrected != text and score >= self.threshold:
+            self._count('corrected')
+            return corrected, min(confidence, score)
+        self._count('dictation')
+        return text, confidence
+
+    def create_stream(self, sample_rate):
+        return self.backend.create_stream(sample_rate)
+
+
+class RacingRecognizer(RecognizerBackend):
+    """Sends every phrase to several backends at once and keeps the first good answer
+
+    The first result with at least ``threshold`` confidence wins; backends
+    that have not started yet are cancelled and the others' late answers are
+    ignored. If nobody is that confident, the most confident answer is used
+    once all have replied. ``race_stats`` counts wins per backend and keeps
+    the winner's lead over the runner-up in ``lead``, for both kinds of race.
+
+    Runs on threads rather than processes: the backends hold loaded models
+    and spend their time in network calls or native decoders that release
+    the GIL. A loser that already started cannot be stopped, so each
+    backend has at most ``in_flight`` phrases running; a backend still busy
+    with that many lost races sits the next one out, and the pool never
+    grows past ``in_flight`` threads per backend.
+    """
+
+    def __init__(self, backends, threshold=RACE_THRESHOLD, in_flight=RACE_IN_FLIGHT):
+        super().__init__(backends[0].recognizer)
+        self.backends = backends
+        self.name = "+".join(backend.name for backend in backends)
+        self.supports_streaming = any(backend.supports_streaming for backend in backends)
+        self.supports_vocabulary = any(backend.supports_vocabulary for backend in backends)
+        self.workers = max(backend.workers or 0 for backend in backends) or None
+        rates = [backend.sample_rate for backend in backends]
+        self.sample_rate = None if None in rates else max(rates)
+        self.threshold = threshold
+        self.in_flight = in_flight
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=in_flight * len(backends),
+                                                           thread_name_prefix="vk-race")
+        self._lock = threading.Lock()
+        self._running = {backend.name: 0 for backend in backends}
+        self.lead = LatencyStats()
+        self.race_stats = {'races': 0, 'undecided': 0, 'failed': 0, 'sat_out': 0,
+                           'wins': {backend.name: 0 for backend in backends}}
+
+    def set_hints(self, phrases):
+        for backend in self.backends:
+            backend.set_hints(phrases)
+
+    def recognize_constrained(self, audio, phrases):
+        # Constrained decodes are short and cheap; the first backend that can do one is enough
+        for backend in self.backends:
+            if backend.supports_vocabulary:
+                return backend.recognize_constrained(audio, phrases)
+        return super().recognize_constrained(audio, phrases)
+
+    def _recognize(self, audio):
+        return self._recognize_scored(audio)[0]
+
+    def _start(self, backend, audio, hints):
+        def done(_):
+            with self._lock:
+                self._running[backend.name] -= 1
+
+        with self._lock:
+            self._running[backend.name] += 1
+        future = self._pool.submit(backend.recognize_scored, audio, hints)
+        future.add_done_callback(done)
+        return future
+
+    def _recognize_scored(self, audio, hints=None):
+        with self._lock:
+            # Backends still tied up in lost races sit this one out, unless all of them are
+            entrants = [backend for backend in self.backends if self._running[backend.name] < self.in_flight]
+            self.race_stats['sat_out'] += len(self.backends) - len(entrants)
+        futures = {self._start(backend, audio, hints): backend for backend in entrants or self.backends}
+        pending = set(futures)
+        answers = []
+        errors = []
+        finished = []
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            now = time.perf_counter()
+            # Ties go to the backend listed first
+            for future in sorted(done, key=lambda future: self.backends.index(futures[future])):
+                finished.append((now, futures[future].name))
+                try:
+                    text, confidence = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                answers.append((confidence, futures[future].name, text))
+                if confidence >= self.threshold:
+                    self._finish(futures[future].name, now, finished, pending)
+                    return text, confidence
+        if not answers:
+            with self._lock:
+                self.race_stats['races'] += 1
+                self.race_stats['failed'] += 1
+            # A recognizer that heard nothing outranks one that is unreachable
+            unknown = [e for e in errors if isinstance(e, sr.UnknownValueError)]
+            raise (unknown or errors)[0]
+        confidence, name, text = max(answers, key=lambda answer: answer[0])
+        with self._lock:
+            self.race_stats['undecided'] += 1
+        self._finish(name, next(at for at, backend in finished if backend == name), finished)
+        return text, confidence
+
+    def _finish(self, winner, won, finished, pending=()):
+        """Count the win and record how long before any other backend the winner finished"""
+        with self._lock:
+            self.race_stats['races'] += 1
+            self.race_stats['wins'][winner] += 1
+        running = [future for future in pending if not future.cancel()]
+        others = [at for at, name in finished if name != winner]
+        if others:
+            # No lead when someone else was done first
+            self.lead.record(max(0.0, min(others) - won))
+            return
+        if not running:
+            return
+        timed = []
+
+        def runner_up(future):
+            with self._lock:
+                if timed:
+                    return
+                timed.append(future)
+            self.lead.record(time.perf_counter() - won)
+
+        for future in running:
+            future.add_done_callback(runner_up)
+
+    def create_stream(self, sample_rate):
+        for backend in self.backends:
+            if backend.supports_streaming:
+                return backend.create_stream(sample_rate)
+        return super().create_stream(sample_rate)
+
+
+RECOGNIZER_BACKENDS = {
+    backend.name: backend
+    for backend in [GoogleRecognizer, SphinxRecognizer, WhisperRecognizer, VoskRecognizer, FakeRecognizer]
+}
+
+
+def create_recognizer(name=DEFAULT_RECOGNIZER, recognizer=None, **options):
+    """Instantiate a recognizer backend by name"""
+    if name not in RECOGNIZER_BACKENDS:
+        raise ValueError(f"Unknown recognizer '{name}', choose from: {', '.join(RECOGNIZER_BACKENDS)}")
+    return RECOGNIZER_BACKENDS[name](recognizer, **options)
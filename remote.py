@@ -0,0 +1,500 @@
+"""Recognition server and thin capture client
+
+    python remote.py server --recognizer vosk --processes 4   # on the shared machine
+    python remote.py client --server recognition-host:8765    # on each workstation
+
+The client only captures audio and types: it cuts phrases with the voice
+detector, compresses them and sends them over one persistent TCP
+connection. The server recognizes each phrase, plans it with the command
+matcher and answers with the key events, which the client sends to its own
+keyboard. ``python bench.py remote`` load-tests a loopback server with many
+simulated clients.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import queue
+import re
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import zlib
+
+import numpy as np
+import speech_recognition as sr
+
+from audio_buffer import RING_SECONDS
+from preprocess import resample, to_float, trim_silence
+
+DEFAULT_PORT = int(os.environ.get('VK_REMOTE_PORT', 8765))
+# Shared secret every client must present; required to listen beyond this machine
+REMOTE_TOKEN = os.environ.get('VK_REMOTE_TOKEN')
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# Phrases travel as 16 kHz 8-bit mu-law, deflated: about 2.5x smaller than 16 kHz 16-bit
+# PCM speech (bench.py remote), more when the microphone records at a higher rate
+REMOTE_RATE = 16000
+MU = 255
+# Sample rates a phrase may be sent at, and the longest phrase the server decodes
+REMOTE_RATES = (8000, 16000)
+MAX_PHRASE_SECONDS = RING_SECONDS
+
+# Message kinds; each message is kind, header length, payload length, JSON header, payload
+HELLO, AUDIO, RESULT, ERROR = 1, 2, 3, 4
+_FRAME = struct.Struct('!BII')
+# Larger messages close the connection rather than fill the server's memory
+MAX_MESSAGE = 4 * 1024 * 1024
+
+# Phrases one client may have waiting on the server; more are refused as busy
+CLIENT_QUEUE_SIZE = 8
+# Seconds a client waits for an answer before giving up on the phrase
+REPLY_TIMEOUT = 30.0
+
+# Each client's macros are kept apart, one file per client id
+REMOTE_MACROS_DIR = os.path.join(os.path.expanduser('~'), '.voice_keyboard_remote_macros')
+
+
+class ServerBusy(sr.RequestError):
+    """The server's queue for this client is full"""
+
+
+def macros_file(client):
+    """File name for a client's macros; ids that are not plain names get a hash so they cannot clash"""
+    name = re.sub(r'[^A-Za-z0-9_-]', '_', client)[:64]
+    if name != client:
+        name += "-" + hashlib.sha1(client.encode('utf-8')).hexdigest()[:10]
+    return name + ".json"
+
+
+def encode_audio(audio, sample_rate=REMOTE_RATE, trim=True):
+    """Phrase -> compressed payload, trimmed and resampled to ``sample_rate``"""
+    samples = to_float(audio.frame_data, audio.sample_width)
+    if trim:
+        samples = trim_silence(samples, audio.sample_rate)
+    samples = np.clip(resample(samples, audio.sample_rate, sample_rate), -1.0, 1.0)
+    companded = np.sign(samples) * np.log1p(MU * np.abs(samples)) / np.log1p(MU)
+    return zlib.compress(np.round((companded + 1) * 127.5).astype(np.uint8).tobytes(), 1)
+
+
+def decode_audio(payload, sample_rate=REMOTE_RATE, max_seconds=MAX_PHRASE_SECONDS):
+    """Compressed payload -> 16-bit ``sr.AudioData``
+
+    Raises ValueError for a rate outside REMOTE_RATES or a phrase that
+    inflates past ``max_seconds``, before any of it is decoded.
+    """
+    if sample_rate not in REMOTE_RATES:
+        raise ValueError(f"unsupported sample rate {sample_rate!r}, expected one of {REMOTE_RATES}")
+    # A few MB of deflated zeros can inflate to gigabytes; stop at the longest phrase
+    inflater = zlib.decompressobj()
+    data = inflater.decompress(payload, int(sample_rate * max_seconds))
+    if inflater.unconsumed_tail:
+        raise ValueError(f"phrase is longer than {max_seconds} s")
+    companded = np.frombuffer(data, dtype=np.uint8).astype(np.float32) / 127.5 - 1
+    samples = np.sign(companded) * np.expm1(np.abs(companded) * np.log1p(MU)) / MU
+    return sr.AudioData((samples * 32767).astype(np.int16).tobytes(), sample_rate, 2)
+
+
+def send_message(sock, kind, header, payload=b""):
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    sock.sendall(_FRAME.pack(kind, len(header), len(payload)) + header + payload)
+
+
+def read_message(stream):
+    """(kind, header, payload) from a binary file object, or None once the peer has closed"""
+    frame = stream.read(_FRAME.size)
+    if len(frame) < _FRAME.size:
+        return None
+    kind, header_size, payload_size = _FRAME.unpack(frame)
+    if header_size + payload_size > MAX_MESSAGE:
+        raise ValueError(f"message of {header_size + payload_size} bytes is over the {MAX_MESSAGE} byte limit")
+    header = stream.read(header_size)
+    payload = stream.read(payload_size)
+    if len(header) < header_size or len(payload) < payload_size:
+        return None
+    return kind, json.loads(header), payload
+
+
+class RecognitionServer(socketserver.ThreadingTCPServer):
+    """Recognizes phrases and plans their key events for many thin clients
+
+    Each connection is one client session. The connection's thread reads
+    phrases into that client's own queue of ``queue_size``; a phrase
+    arriving when it is full is answered with a 'busy' error at once, so one
+    chatty client cannot delay the others. A worker thread per client takes
+    phrases in order, recognizes them with the shared ``backend``, plans them
+    with ``matcher`` and that client's own macros, and sends back the key
+    events. Clients keep their connection open and may send the next phrase
+    before the last answer is back. With a ``token`` set, a connection
+    whose hello does not carry the same token is refused and closed.
+    Recognition and planning are timed in ``metrics``; ``server_stats``
+    counts sessions, phrases and refusals.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # Many clients may connect at once after a server restart
+    request_queue_size = 128
+
+    def __init__(self, backend, host='127.0.0.1', port=DEFAULT_PORT, matcher=None, queue_size=CLIENT_QUEUE_SIZE,
+                 macros_dir=REMOTE_MACROS_DIR, metrics=None, token=REMOTE_TOKEN):
+        from commands import COMMAND_MATCHER
+        from metrics import METRICS
+
+        self.backend = backend
+        self.matcher = matcher or COMMAND_MATCHER
+        self.queue_size = queue_size
+        self.macros_dir = macros_dir
+        self.metrics = metrics or METRICS
+        self.token = token
+        self._lock = threading.Lock()
+        # One store per client id, shared by all of that client's sessions so
+        # two connections never overwrite each other's macros on disk
+        self._macros = {}
+        self.server_stats = {'sessions': 0, 'active': 0, 'max_active': 0, 'phrases': 0, 'busy': 0, 'errors': 0,
+                             'bytes_in': 0, 'unauthorized': 0}
+        super().__init__((host, port), _ClientHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a background thread; ``shutdown()`` stops it"""
+        threading.Thread(target=self.serve_forever, name="vk-remote", daemon=True).start()
+        return self
+
+    def _count(self, key, change=1):
+        with self._lock:
+            stats = self.server_stats
+            stats[key] += change
+            stats['max_active'] = max(stats['max_active'], stats['active'])
+
+    def authorized(self, hello):
+        if not self.token:
+            return True
+        token = str(hello.get('token') or "")
+        return hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def macros_for(self, client):
+        from macros import MacroStore
+
+        name = macros_file(client)
+        with self._lock:
+            if name not in self._macros:
+                os.makedirs(self.macros_dir, exist_ok=True)
+                self._macros[name] = MacroStore(os.path.join(self.macros_dir, name))
+            return self._macros[name]
+
+    def handle_phrase(self, header, payload, macros):
+        """RESULT header for one phrase, or raise for an ERROR"""
+        from commands import plan_actions
+
+        audio = decode_audio(payload, header.get('rate', REMOTE_RATE))
+        with self.metrics.span('recognize'):
+            text, confidence = self.backend.recognize_scored(audio)
+        with self.metrics.span('parse'):
+            events, results, stop = plan_actions(text, self.matcher, macros)
+        return {'seq': header.get('seq'), 'text': text, 'confidence': round(confidence, 3), 'events': events,
+                'result': " | ".join(results) if results else "No valid commands found", 'stop': stop}
+
+
+class _ClientHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        hello = read_message(self.rfile)
+        if hello is None or hello[0] != HELLO:
+            return
+        if not server.authorized(hello[1]):
+            server._count('unauthorized')
+            try:
+                send_message(self.connection, ERROR, {'seq': None, 'error': 'Unauthorized',
+                                                      'message': "wrong or missing token"})
+            except OSError:
+                pass
+            return
+        client = str(hello[1].get('client') or f"{self.client_address[0]}:{self.client_address[1]}")
+        macros = server.macros_for(client)
+        phrases = queue.Queue(maxsize=server.queue_size)
+        send_lock = threading.Lock()
+
+        def reply(kind, header):
+            with send_lock:
+                send_message(self.connection, kind, header)
+
+        def work():
+            while True:
+                item = phrases.get()
+                if item is None:
+                    return
+                header, payload = item
+                try:
+                    answer = server.handle_phrase(header, payload, macros)
+                except Exception as e:
+                    # A bad phrase is answered with an error; the session carries on
+                    server._count('errors')
+                    answer = {'seq': header.get('seq'), 'error': type(e).__name__, 'message': str(e)}
+                try:
+                    reply(ERROR if 'error' in answer else RESULT, answer)
+                except OSError:
+                    return
+
+        server._count('sessions')
+        server._count('active')
+        worker = threading.Thread(target=work, name=f"vk-remote-{client}", daemon=True)
+        worker.start()
+        try:
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+                kind, header, payload = message
+                if kind != AUDIO or not isinstance(header, dict):
+                    continue
+                server._count('phrases')
+                server._count('bytes_in', len(payload))
+                try:
+                    phrases.put_nowait((header, payload))
+                except queue.Full:
+                    server._count('busy')
+                    reply(ERROR, {'seq': header.get('seq'), 'error': 'ServerBusy', 'message': "server queue is full"})
+        except (OSError, ValueError):
+            pass
+        finally:
+            # Nobody is left to answer; drop what is still waiting
+            while True:
+                try:
+                    phrases.get_nowait()
+                except queue.Empty:
+                    break
+            phrases.put(None)
+            worker.join()
+            server._count('active', -1)
+
+
+class RemoteClient:
+    """One persistent connection to a RecognitionServer, shared by every phrase
+
+    ``request(audio)`` compresses the phrase, sends it and waits for the
+    answer. Several threads may have phrases in flight on the connection at
+    once; a reader thread hands each answer to the phrase it belongs to. A
+    dropped connection fails the phrases in flight and is reopened on the
+    next request. ``token`` must match the server's. ``client_stats``
+    compares the bytes captured with the bytes sent.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, client_id=None, timeout=REPLY_TIMEOUT, token=REMOTE_TOKEN):
+        self.address = (host, port)
+        self.client_id = client_id or socket.gethostname()
+        self.timeout = timeout
+        self.token = token
+        self._lock = threading.Lock()
+        self._sock = None
+        self._pending = {}
+        self._seq = itertools.count()
+        self.client_stats = {'requests': 0, 'connects': 0, 'bytes_captured': 0, 'bytes_sent': 0}
+
+    def _connect(self):
+        with self._lock:
+            if self._sock is None:
+                sock = socket.create_connection(self.address, timeout=10)
+                sock.settimeout(None)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                send_message(sock, HELLO, {'client': self.client_id, 'token': self.token})
+                self._sock = sock
+                self.client_stats['connects'] += 1
+                threading.Thread(target=self._read, args=(sock,), name="vk-remote-reader", daemon=True).start()
+            return self._sock
+
+    def _read(self, sock):
+        stream = sock.makefile('rb')
+        reason = "connection to the recognition server was lost"
+        try:
+            while True:
+                message = read_message(stream)
+                if message is None:
+                    break
+                kind, header, _ = message
+                if kind == ERROR and header.get('error') == 'Unauthorized':
+                    # The whole connection was refused
+                    reason = f"recognition server refused the connection: {header.get('message')}"
+                    break
+                with self._lock:
+                    _, future = self._pending.pop(header.get('seq'), (None, None))
+                if future is not None:
+                    future.set_result((kind, header))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+                # Phrases already sent on a newer connection are still answered there
+                lost = [seq for seq, (owner, _) in self._pending.items() if owner is sock]
+                pending = [self._pending.pop(seq)[1] for seq in lost]
+            for future in pending:
+                future.set_exception(sr.RequestError(reason))
+            sock.close()
+
+    def request(self, audio):
+        """The server's answer for one phrase: {'text', 'events', 'result', 'stop', ...}"""
+        payload = encode_audio(audio)
+        seq = next(self._seq)
+        future = concurrent.futures.Future()
+        try:
+            sock = self._connect()
+            with self._lock:
+                self._pending[seq] = (sock, future)
+                self.client_stats['requests'] += 1
+                self.client_stats['bytes_captured'] += len(audio.frame_data)
+                self.client_stats['bytes_sent'] += len(payload)
+                send_message(sock, AUDIO, {'seq': seq, 'rate': REMOTE_RATE}, payload)
+        except OSError as e:
+            self.close()
+            raise sr.RequestError(f"recognition server unavailable: {e}")
+        try:
+            kind, header = future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            with self._lock:
+                self._pending.pop(seq, None)
+            raise sr.RequestError("recognition server did not answer in time")
+        if kind == RESULT:
+            header['events'] = [tuple(event) for event in header['events']]
+            return header
+        if header['error'] == 'UnknownValueError':
+            raise sr.UnknownValueError()
+        if header['error'] == 'ServerBusy':
+            raise ServerBusy(header['message'])
+        raise sr.RequestError(f"recognition server: {header['error']}: {header['message']}")
+
+    def close(self):
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def serve(args):
+    from daemon import log
+    from recognizers import create_recognizer
+
+    if not args.token and args.host not in LOOPBACK_HOSTS:
+        log(f"Refusing to listen on {args.host} without a token; set --token or VK_REMOTE_TOKEN")
+        return 2
+    if args.processes:
+        from process_pool import ProcessPoolRecognizer
+        backend = ProcessPoolRecognizer(args.recognizer, workers=args.processes)
+    else:
+        backend = create_recognizer(args.recognizer)
+    if hasattr(backend, 'load_model'):
+        backend.load_model()
+    server = RecognitionServer(backend, args.host, args.port, queue_size=args.queue_size, token=args.token)
+    metrics_server = None
+    if args.metrics_port:
+        import metrics
+        metrics_server = metrics.serve(server.metrics, args.metrics_port, args.host)
+    log(f"Recognizing with {backend.name} on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        log(f"Served {server.server_stats}")
+    return 0
+
+
+def run_client(args):
+    from audio_buffer import MicrophoneRing
+    from daemon import log
+    from injection import create_backend
+    from pipeline import VoicePipeline
+    from vad import SpeechSegmenter, VoiceActivityDetector, read_segment
+
+    host, _, port = args.server.rpartition(":")
+    client = RemoteClient(host or args.server, int(port) if host else DEFAULT_PORT, args.client_id, token=args.token)
+    keyboard = create_backend(args.injector)
+
+    def act(answer):
+        if answer['events']:
+            keyboard.send(answer['events'])
+        return answer
+
+    with MicrophoneRing() as source:
+        segmenter = SpeechSegmenter(VoiceActivityDetector(source.SAMPLE_WIDTH), source.SAMPLE_RATE,
+                                    source.SAMPLE_WIDTH)
+
+        def capture():
+            segment = read_segment(source, segmenter)
+            return sr.AudioData(segment, source.SAMPLE_RATE, source.SAMPLE_WIDTH) if segment else None
+
+        worker = VoicePipeline(capture, client.request, act, stop_on=lambda answer: answer['stop']).start()
+        log(f"Listening, recognizing on {args.server}")
+        try:
+            while True:
+                try:
+                    kind, seq, payload = worker.events.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if kind == 'result' and not args.quiet:
+                    log(f"{payload['text']} -> {payload['result']}")
+                elif kind in ('error', 'fatal') and not isinstance(payload, sr.UnknownValueError):
+                    log(f"[error] {payload}")
+                elif kind == 'stopped':
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+            worker.join(timeout=2)
+            client.close()
+    stats = client.client_stats
+    if stats['bytes_captured']:
+        log(f"Sent {stats['bytes_sent']} of {stats['bytes_captured']} bytes captured "
+            f"({stats['bytes_captured'] / max(1, stats['bytes_sent']):.1f}x smaller), {stats['connects']} connections")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    server = sub.add_parser("server", help="recognize and plan phrases for remote clients")
+    server.add_argument("--recognizer", default=os.environ.get('VK_RECOGNIZER', 'google'),
+                        help="recognizer backend (default: VK_RECOGNIZER or google)")
+    server.add_argument("--processes", type=int, default=0,
+                        help="recognize in this many worker processes, for CPU-bound offline models")
+    server.add_argument("--host", default="127.0.0.1", help="address to listen on; 0.0.0.0 for every interface")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT)
+    server.add_argument("--queue-size", type=int, default=CLIENT_QUEUE_SIZE, help="phrases waiting per client")
+    server.add_argument("--token", default=REMOTE_TOKEN,
+                        help="shared secret clients must send (default: VK_REMOTE_TOKEN); required off loopback")
+    server.add_argument("--metrics-port", type=int, help="serve latency JSON at http://HOST:PORT/metrics")
+    server.set_defaults(func=serve)
+
+    client = sub.add_parser("client", help="capture phrases here, recognize them on a server")
+    client.add_argument("--server", default=f"127.0.0.1:{DEFAULT_PORT}", help="HOST:PORT of the recognition server")
+    client.add_argument("--client-id", help="name for this client's macros on the server (default: host name)")
+    client.add_argument("--token", default=REMOTE_TOKEN, help="the server's shared secret (default: VK_REMOTE_TOKEN)")
+    client.add_argument("--injector", default=os.environ.get('VK_INJECTOR', 'pyautogui'),
+                        help="keystroke backend (default: VK_INJECTOR or pyautogui)")
+    client.add_argument("--quiet", action="store_true", help="only report errors")
+    client.set_defaults(func=run_client)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
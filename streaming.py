@@ -0,0 +1,158 @@
+import audioop
+import queue
+import threading
+import time
+
+from recognizers import LatencyStats
+
+# Microphone chunk size in frames; ~64 ms at 16 kHz keeps partials frequent
+STREAM_CHUNK = 1024
+# While spoken feedback plays, only chunks this many times louder than the
+# energy threshold get through; the rest reach the recognizer as silence
+ECHO_FACTOR = 4
+
+
+class PartialTyper:
+    """Types a changing hypothesis, correcting the tail with backspaces
+
+    Only the words that are unlikely to change are typed while the user is
+    still speaking: every word of the partial hypothesis except the last one.
+    When an earlier word is revised, just the differing tail is erased and
+    retyped. ``keyboard`` needs ``write(text)`` and ``press(key, presses=n)``
+    (any injection.InjectionBackend works). ``holdback(text)`` returning True
+    keeps a hypothesis off screen, e.g. while it may still become a command.
+    """
+
+    def __init__(self, keyboard, holdback=None):
+        self.keyboard = keyboard
+        self.holdback = holdback or (lambda text: False)
+        self.typed = ""
+        self.backspaces = 0
+
+    def _show(self, text):
+        common = 0
+        for typed_char, new_char in zip(self.typed, text):
+            if typed_char != new_char:
+                break
+            common += 1
+        erase = len(self.typed) - common
+        if erase:
+            self.keyboard.press('backspace', presses=erase)
+            self.backspaces += erase
+        if text[common:]:
+            self.keyboard.write(text[common:])
+        self.typed = text
+
+    def update(self, partial):
+        """Show the stable prefix of a partial hypothesis"""
+        if self.holdback(partial):
+            return
+        words = partial.split()
+        stable = " ".join(words[:-1])
+        if stable:
+            self._show(stable + " ")
+
+    def hand_over(self):
+        """Start a new utterance, returning what was typed for the last one"""
+        typed, self.typed = self.typed, ""
+        return typed
+
+    def retract(self):
+        """Erase everything typed for the current utterance"""
+        self._show("")
+
+
+class StreamingDictation:
+    """Feeds microphone chunks to an incremental recognizer on a background thread
+
+    Partial hypotheses are typed as they arrive through a PartialTyper.
+    Every final hypothesis then goes to ``act(text, typed)`` like a phrase
+    from the pipeline, with the text already typed for it, so commands in
+    the middle of dictation run and only the typed words the plan does not
+    start with are erased (see commands.execute). Reports on ``events`` with the
+    same (kind, seq, payload) tuples as pipeline.VoicePipeline, and keeps the
+    time from speech onset to first typed character in ``first_char``.
+    ``gate`` and ``on_onset`` work as in vad.SpeechSegmenter.
+    """
+
+    def __init__(self, source, backend, keyboard, act, is_command, holdback=None,
+                 energy_threshold=300, stop_on=None, gate=None, on_onset=None):
+        self.source = source
+        self.backend = backend
+        self.act = act
+        self.is_command = is_command
+        self.energy_threshold = energy_threshold
+        self.stop_on = stop_on or (lambda result: False)
+        self.gate = gate
+        self.on_onset = on_onset
+        self.typer = PartialTyper(keyboard, holdback)
+        self.events = queue.Queue()
+        self.first_char = LatencyStats()
+        self.stats = {'utterances': 0, 'commands': 0, 'backspaces': 0, 'chunks_gated': 0}
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return not self._stopping.is_set() and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="vk-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        seq = 0
+        onset = None
+        timed = False
+        try:
+            stream = self.backend.create_stream(self.source.SAMPLE_RATE)
+            while not self._stopping.is_set():
+                chunk = self.source.stream.read(STREAM_CHUNK)
+                rms = audioop.rms(chunk, self.source.SAMPLE_WIDTH)
+                if self.gate is not None and self.gate() and rms < self.energy_threshold * ECHO_FACTOR:
+                    # Keep the recognizer's timeline intact but hide the feedback
+                    chunk = bytes(len(chunk))
+                    rms = 0
+                    self.stats['chunks_gated'] += 1
+                if onset is None and rms > self.energy_threshold:
+                    onset = time.perf_counter()
+                    if self.on_onset is not None:
+                        self.on_onset()
+                text, is_final = stream.accept(chunk)
+                if not is_final:
+                    self.typer.update(text)
+                    if self.typer.typed and onset is not None and not timed:
+                        self.first_char.record(time.perf_counter() - onset)
+                        timed = True
+                    continue
+
+                if text:
+                    self.stats['utterances'] += 1
+                    self.events.put(('recognized', seq, text))
+                    if self.is_command(text):
+                        self.stats['commands'] += 1
+                    result = self.act(text, self.typer.hand_over())
+                    if onset is not None and not timed:
+                        self.first_char.record(time.perf_counter() - onset)
+                    self.stats['backspaces'] = self.typer.backspaces
+                    self.events.put(('result', seq, result))
+                    seq += 1
+                    if self.stop_on(result):
+                        self.stop()
+                else:
+                    self.typer.retract()
+                onset = None
+                timed = False
+        except Exception as e:
+            self.events.put(('fatal', seq, e))
+        finally:
+            self._stopping.set()
+            self.events.put(('stopped', None, None))
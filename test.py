@@ -1,9 +1,11 @@
 import streamlit as st
 import speech_recognition as sr
 import pyttsx3
-import pyautogui
 import time
 
+from commands import plan_actions
+from injection import create_backend
+
 # Configure the application
 st.set_page_config(
     page_title="Voice Keyboard Assistant",
@@ -62,75 +64,10 @@ r = sr.Recognizer()
 r.pause_threshold = 0.5
 r.energy_threshold = 300
 
-# Configure PyAutoGUI
-pyautogui.FAILSAFE = True
-pyautogui.PAUSE = 0.1
-
-# Command mappings
-SPECIAL_KEYS = {
-    'enter': 'enter',
-    'next line': 'enter',
-    'new line': 'enter',
-    'space': 'space',
-    'tab': 'tab',
-    'backspace': 'backspace',
-    'delete': 'delete',
-    'escape': 'esc',
-    'stop listening': 'stop',  # Special command to stop listening
-}
-
-NAVIGATION_KEYS = {
-    'go left': 'left',
-    'go right': 'right',
-    'go up': 'up',
-    'go down': 'down',
-    'word left': ['ctrl', 'left'],
-    'word right': ['ctrl', 'right'],
-    'go to start': 'home',
-    'go to end': 'end',
-    'line start': 'home',
-    'line end': 'end',
-}
-
-SELECTION_KEYS = {
-    'select all': ['ctrl', 'a'],
-    'select word': ['ctrl', 'shift', 'right'],
-    'select line': ['home', 'shift', 'end'],
-    'select next word': ['ctrl', 'shift', 'right'],
-    'select previous word': ['ctrl', 'shift', 'left'],
-    'select up': ['shift', 'up'],
-    'select down': ['shift', 'down'],
-}
-
-EDIT_KEYS = {
-    'copy': ['ctrl', 'c'],
-    'paste': ['ctrl', 'v'],
-    'cut': ['ctrl', 'x'],
-    'copy line': ['ctrl', 'l', 'ctrl', 'c'],
-    'cut line': ['ctrl', 'l', 'ctrl', 'x'],
-    'copy word': ['ctrl', 'shift', 'right', 'ctrl', 'c'],
-    'cut word': ['ctrl', 'shift', 'right', 'ctrl', 'x'],
-    'undo': ['ctrl', 'z'],
-    'redo': ['ctrl', 'y'],
-}
-
-SYMBOLS = {
-    'double quote': '"',
-    'single quote': "'",
-    'open bracket': '(',
-    'close bracket': ')',
-    'square bracket': '[',
-    'close square bracket': ']',
-    'comma': ',',
-    'period': '.',
-    'semicolon': ';',
-    'plus': '+',
-    'minus': '-',
-    'equals': '=',
-    'underscore': '_',
-    'at sign': '@',
-    'hash': '#',
-}
+@st.cache_resource
+def get_keyboard():
+    """Keystrokes go through the configured injection backend (VK_INJECTOR), built once"""
+    return create_backend()
 
 def speak(text):
     """Text-to-speech output"""
@@ -150,58 +87,15 @@ def update_status(message, message_type="info"):
 
 def process_command(command):
     """Process voice commands and execute corresponding actions"""
-    command = command.lower().strip()
-    results = []
-    
-    # Split the command into potential multiple commands
-    # Common conjunctions and separators
-    separators = [' and ', ' then ', ', ', '; ']
-    commands = [command]
-    
-    # Split by each separator
-    for separator in separators:
-        new_commands = []
-        for cmd in commands:
-            new_commands.extend(cmd.split(separator))
-        commands = [cmd.strip() for cmd in new_commands if cmd.strip()]
-    
-    # Process each command
-    for single_command in commands:
-        # Check for stop command first
-        if single_command in ['stop', 'stop listening', 'quit', 'exit']:
-            st.session_state.is_listening = False
-            st.rerun()  # Force a rerun to update the UI
-            return "Stopping voice assistant..."
-        
-        # Process individual command
-        if single_command in SPECIAL_KEYS:
-            if SPECIAL_KEYS[single_command] == 'stop':
-                st.session_state.is_listening = False
-                st.rerun()  # Force a rerun to update the UI
-                return "Stopping voice assistant..."
-            pyautogui.press(SPECIAL_KEYS[single_command])
-            results.append(f"Executed: {single_command}")
-        elif single_command in NAVIGATION_KEYS:
-            keys = NAVIGATION_KEYS[single_command]
-            if isinstance(keys, list):
-                pyautogui.hotkey(*keys)
-            else:
-                pyautogui.press(keys)
-            results.append(f"Executed: {single_command}")
-        elif single_command in SELECTION_KEYS:
-            pyautogui.hotkey(*SELECTION_KEYS[single_command])
-            results.append(f"Selected: {single_command}")
-        elif single_command in EDIT_KEYS:
-            pyautogui.hotkey(*EDIT_KEYS[single_command])
-            results.append(f"Executed: {single_command}")
-        elif single_command in SYMBOLS:
-            pyautogui.write(SYMBOLS[single_command])
-            results.append(f"Typed symbol: {single_command}")
-        else:
-            # Only write text for commands that aren't recognized as special commands
-            if not any(single_command in d for d in [SPECIAL_KEYS, NAVIGATION_KEYS, SELECTION_KEYS, EDIT_KEYS, SYMBOLS]):
-                pyautogui.write(single_command + " ")
-                results.append(f"Typed: {single_command}")
+    # The compiled matcher splits the utterance into commands and dictated
+    # text in one pass, including commands embedded in a sentence; macros
+    # are recorded and played back by plan_actions like in the main app
+    events, results, stop = plan_actions(command)
+    get_keyboard().send(events)
+    if stop:
+        st.session_state.is_listening = False
+        st.rerun()  # Force a rerun to update the UI
+        return "Stopping voice assistant..."
     
     # Return combined results
     if not results:
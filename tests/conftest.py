@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import CommandMatcher  # noqa: E402
+from macros import MacroStore  # noqa: E402
+
+
+@pytest.fixture
+def matcher():
+    """The bundled grammar, unaffected by VK_GRAMMAR or edits on disk"""
+    return CommandMatcher()
+
+
+@pytest.fixture
+def macros(tmp_path):
+    """A macro store that never touches the user's home directory"""
+    return MacroStore(str(tmp_path / 'macros.json'))
@@ -0,0 +1,63 @@
+from commands import plan_actions
+
+
+def test_plain_dictation_is_typed(matcher, macros):
+    events, results, stop = plan_actions("hello world", matcher, macros)
+    assert events == [('write', "hello world ")]
+    assert results == ["Typed: hello world"]
+    assert not stop
+
+
+def test_command_inside_dictation(matcher, macros):
+    events, _, _ = plan_actions("hello comma world", matcher, macros)
+    assert events == [('write', "hello "), ('write', ","), ('write', "world ")]
+
+
+def test_key_command(matcher, macros):
+    events, results, _ = plan_actions("new line", matcher, macros)
+    assert events == [('press', ['enter'])]
+    assert results == ["Executed: new line"]
+
+
+def test_hotkey_command(matcher, macros):
+    events, _, _ = plan_actions("select all", matcher, macros)
+    assert events == [('hotkey', ['ctrl', 'a'])]
+
+
+def test_repeat_count(matcher, macros):
+    events, _, _ = plan_actions("press enter three times", matcher, macros)
+    assert events[-1] == ('press', ['enter', 'enter', 'enter'])
+
+
+def test_symbol_does_not_swallow_following_number(matcher, macros):
+    events, _, _ = plan_actions("plus one", matcher, macros)
+    assert events == [('write', "+"), ('write', "one ")]
+
+
+def test_stop_phrase_alone_stops(matcher, macros):
+    assert plan_actions("stop listening", matcher, macros) == ([], [], True)
+
+
+def test_stop_phrase_in_a_sentence_is_dictation(matcher, macros):
+    events, _, stop = plan_actions("hello stop listening", matcher, macros)
+    assert events == [('write', "hello stop listening ")]
+    assert not stop
+
+
+def test_format_word_only_at_segment_start(matcher, macros):
+    assert plan_actions("capital hello", matcher, macros)[0] == [('write', "Hello ")]
+    assert plan_actions("the capital of france", matcher, macros)[0] == [('write', "the capital of france ")]
+
+
+def test_macro_record_and_play(matcher, macros):
+    plan_actions("record macro sign", matcher, macros)
+    plan_actions("best regards", matcher, macros)
+    _, results, _ = plan_actions("stop recording", matcher, macros)
+    assert results == ["Saved macro: sign (1 events)"]
+    events, _, _ = plan_actions("play sign", matcher, macros)
+    assert events == [('write', "best regards ")]
+
+
+def test_unknown_macro_is_dictation(matcher, macros):
+    events, _, _ = plan_actions("play music and dance", matcher, macros)
+    assert events == [('write', "play music and dance ")]
@@ -0,0 +1,39 @@
+from commands import plan_actions
+from injection import VirtualTextBuffer
+
+
+def test_write_and_keys():
+    box = VirtualTextBuffer()
+    box.send([('write', "hello world "), ('press', ['enter']), ('write', "goodbye")])
+    assert box.text == "hello world \ngoodbye"
+    assert box.cursor == len(box.text)
+
+
+def test_backspace():
+    box = VirtualTextBuffer("abc")
+    box.send([('press', ['backspace'])])
+    assert box.text == "ab"
+
+
+def test_select_all_cut_undo():
+    box = VirtualTextBuffer("one two three")
+    box.send([('hotkey', ['ctrl', 'a'])])
+    assert box.selection == "one two three"
+    box.send([('hotkey', ['ctrl', 'x'])])
+    assert box.text == ""
+    assert box.clipboard == "one two three"
+    box.send([('hotkey', ['ctrl', 'z'])])
+    assert box.text == "one two three"
+
+
+def test_typing_replaces_selection():
+    box = VirtualTextBuffer("old")
+    box.send([('hotkey', ['ctrl', 'a']), ('write', "new")])
+    assert box.text == "new"
+
+
+def test_planned_utterance(matcher, macros):
+    box = VirtualTextBuffer()
+    events, _, _ = plan_actions("hello world new line goodbye", matcher, macros)
+    box.send(events)
+    assert box.text == "hello world \ngoodbye "
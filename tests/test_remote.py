@@ -0,0 +1,44 @@
+import zlib
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from remote import REMOTE_RATE, decode_audio, encode_audio
+
+
+def tone(seconds=1.0, rate=REMOTE_RATE, amplitude=8000):
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * amplitude).astype('<i2')
+    return sr.AudioData(samples.tobytes(), rate, 2)
+
+
+def test_round_trip_keeps_the_signal():
+    audio = tone()
+    decoded = decode_audio(encode_audio(audio, trim=False))
+    assert (decoded.sample_rate, decoded.sample_width) == (REMOTE_RATE, 2)
+    original = np.frombuffer(audio.frame_data, dtype='<i2').astype(np.float64)
+    restored = np.frombuffer(decoded.frame_data, dtype='<i2').astype(np.float64)
+    assert restored.shape == original.shape
+    assert np.corrcoef(original, restored)[0, 1] > 0.999
+
+
+def test_round_trip_resamples():
+    decoded = decode_audio(encode_audio(tone(rate=44100), trim=False))
+    assert len(decoded.frame_data) == REMOTE_RATE * 2
+
+
+def test_payload_is_smaller_than_pcm():
+    audio = tone()
+    assert len(encode_audio(audio, trim=False)) < len(audio.frame_data) / 2
+
+
+def test_rejects_unknown_rate():
+    with pytest.raises(ValueError):
+        decode_audio(encode_audio(tone(), trim=False), sample_rate=44100)
+
+
+def test_rejects_oversized_phrase():
+    bomb = zlib.compress(bytes(REMOTE_RATE * 2), 9)
+    with pytest.raises(ValueError):
+        decode_audio(bomb, max_seconds=1)
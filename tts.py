@@ -0,0 +1,155 @@
+import itertools
+import threading
+import time
+
+# Words per minute for spoken feedback
+SPEECH_RATE = 150
+
+# Lower numbers are spoken first
+URGENT = 0
+NORMAL = 1
+LOW = 2
+
+# Messages waiting beyond this are dropped, least important and oldest first
+MAX_PENDING = 8
+
+# The room keeps echoing the speaker briefly after an utterance ends
+ECHO_TAIL = 0.25
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The pyttsx3 engine, created on first use
+
+    Initialising the engine loads the platform speech driver, which takes
+    most of a second, so it is only done once something is actually spoken.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            import pyttsx3
+            _engine = pyttsx3.init()
+            _engine.setProperty('rate', SPEECH_RATE)
+        return _engine
+
+
+class SpeechQueue:
+    """Speaks messages on a worker thread so callers never wait for audio
+
+    ``say`` returns at once. Pending messages are spoken most urgent first;
+    a message with the same ``key`` as one still waiting replaces it, so a
+    burst of status updates is read out once. ``interrupt`` cuts the current
+    utterance short and discards everything below URGENT, which is what a
+    barge-in should do. ``gated()`` is true while audio plays (plus a short
+    echo tail) so the microphone side can ignore the assistant's own voice.
+    """
+
+    def __init__(self, engine_factory=get_engine, max_pending=MAX_PENDING, echo_tail=ECHO_TAIL):
+        self.engine_factory = engine_factory
+        self.max_pending = max_pending
+        self.echo_tail = echo_tail
+        self.stats = {'queued': 0, 'spoken': 0, 'coalesced': 0, 'dropped': 0, 'interrupted': 0}
+        self._pending = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+        self._speaking = False
+        self._gate_until = 0.0
+        self._closed = False
+        self._engine = None
+        self._thread = None
+
+    def say(self, text, priority=NORMAL, key=None):
+        """Queue ``text``; returns immediately"""
+        if not text:
+            return
+        with self._cond:
+            if self._closed:
+                return
+            for index, (_, _, pending_text, pending_key) in enumerate(self._pending):
+                if pending_text == text or (key is not None and pending_key == key):
+                    del self._pending[index]
+                    self.stats['coalesced'] += 1
+                    break
+            self._pending.append((priority, next(self._order), text, key))
+            self.stats['queued'] += 1
+            if len(self._pending) > self.max_pending:
+                self._pending.remove(max(self._pending, key=lambda item: (item[0], -item[1])))
+                self.stats['dropped'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vk-tts", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def interrupt(self):
+        """Barge-in: stop talking and forget everything that is not urgent"""
+        with self._cond:
+            kept = [item for item in self._pending if item[0] == URGENT]
+            self.stats['dropped'] += len(self._pending) - len(kept)
+            self._pending = kept
+            if self._speaking:
+                self._cancel.set()
+
+    def gated(self):
+        """True while feedback is audible"""
+        return self._speaking or time.monotonic() < self._gate_until
+
+    def close(self, wait=False, timeout=None):
+        """Stop the worker, after speaking what is queued if ``wait``"""
+        with self._cond:
+            if not wait:
+                self._pending.clear()
+                self._cancel.set()
+            self._closed = True
+            self._cond.notify()
+        if wait and self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        # pyttsx3 engines must be driven from the thread that uses them
+        engine = self._engine = self.engine_factory()
+        engine.connect('started-word', self._on_word)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                item = min(self._pending)
+                self._pending.remove(item)
+                self._cancel.clear()
+                self._speaking = True
+            try:
+                engine.say(item[2])
+                engine.runAndWait()
+            finally:
+                with self._cond:
+                    self._speaking = False
+                    self._gate_until = time.monotonic() + self.echo_tail
+                    if self._cancel.is_set():
+                        self.stats['interrupted'] += 1
+                    else:
+                        self.stats['spoken'] += 1
+
+    def _on_word(self, name, location, length):
+        # Runs inside runAndWait, the one place stop() is safe to call
+        if self._cancel.is_set():
+            self._engine.stop()
+
+
+_queue = None
+
+
+def get_queue():
+    """The shared SpeechQueue, started on first use"""
+    global _queue
+    with _engine_lock:
+        if _queue is None:
+            _queue = SpeechQueue()
+        return _queue
+
+
+def speak(text, priority=NORMAL, key=None):
+    """Text-to-speech output; queued and spoken in the background"""
+    get_queue().say(text, priority, key)
@@ -0,0 +1,186 @@
+import time
+
+import numpy as np
+
+# Frames this far above the noise floor count as speech
+SPEECH_MARGIN_DB = 10.0
+# Hiss and keyboard clatter cross zero far more often than voiced speech
+MAX_SPEECH_ZCR = 0.35
+# How fast the noise floor follows quieter and louder background noise
+FLOOR_FALL = 0.2
+FLOOR_RISE = 0.02
+FLOOR_RISE_IN_SPEECH = 0.001
+# Never let the floor sink into digital silence
+MIN_FLOOR_DB = -70.0
+# Extra margin while spoken feedback plays, so only someone talking over it counts
+ECHO_MARGIN_DB = 12.0
+
+_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+class VoiceActivityDetector:
+    """Energy + zero-crossing speech detector with an adaptive noise floor
+
+    Works on raw little-endian PCM frames of any length. The noise floor is
+    tracked continuously: it drops quickly when the room gets quieter and
+    rises slowly when it gets louder, so a noisy office does not keep the
+    detector permanently triggered.
+    """
+
+    def __init__(self, sample_width=2, margin_db=SPEECH_MARGIN_DB, max_zcr=MAX_SPEECH_ZCR):
+        self.dtype = _DTYPES[sample_width]
+        self.full_scale = float(np.iinfo(self.dtype).max)
+        self.margin_db = margin_db
+        self.max_zcr = max_zcr
+        self.noise_floor_db = None
+
+    def measure(self, frame):
+        """(energy in dBFS, zero-crossing rate) of one frame"""
+        samples = np.frombuffer(frame, dtype=self.dtype).astype(np.float32)
+        if not samples.size:
+            return MIN_FLOOR_DB, 0.0
+        rms = np.sqrt(np.mean(samples * samples)) / self.full_scale
+        energy_db = 20.0 * np.log10(max(rms, 1e-7))
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / samples.size
+        return float(energy_db), float(zcr)
+
+    def is_speech(self, frame, gated=False):
+        """Whether the frame is speech; ``gated`` frames need to be much louder
+        and do not move the noise floor, since they overlap spoken feedback"""
+        energy_db, zcr = self.measure(frame)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = max(energy_db, MIN_FLOOR_DB)
+        above = energy_db - self.noise_floor_db
+        margin = self.margin_db + ECHO_MARGIN_DB if gated else self.margin_db
+        # Loud frames are speech whatever their zero-crossing rate (sibilants)
+        speech = above > margin and (zcr < self.max_zcr or above > 2 * margin)
+        if gated:
+            return speech
+        if speech:
+            rate = FLOOR_RISE_IN_SPEECH
+        elif energy_db < self.noise_floor_db:
+            rate = FLOOR_FALL
+        else:
+            rate = FLOOR_RISE
+        self.noise_floor_db = max(MIN_FLOOR_DB, self.noise_floor_db + rate * (energy_db - self.noise_floor_db))
+        return speech
+
+
+class SpeechSegmenter:
+    """Groups VAD decisions into phrases, forwarding only speech to the recognizer
+
+    Frames are fed with their absolute byte position in the stream and a
+    finished phrase comes back as a (start, end) byte range, so the audio
+    itself stays in the ring buffer (see audio_buffer.py). A phrase opens on
+    speech and closes after ``pause`` seconds of silence or at
+    ``max_phrase`` seconds. ``preroll`` seconds before the onset are included
+    so the first syllable is not clipped. Phrases with less than
+    ``min_speech`` seconds of speech (clicks, coughs) are dropped.
+
+    While ``gate()`` is true (spoken feedback is playing) frames are judged
+    against a higher threshold, and ``on_onset()`` is called whenever a
+    phrase opens so the feedback can be cut off.
+
+    An ``endpointer`` (endpointing.AdaptiveEndpointer) sees every frame of
+    the phrase and replaces the fixed ``pause``: short once a complete
+    command has been heard, longer during dictation. ``last_pause`` is the
+    silence waited before the last phrase was closed.
+    """
+
+    def __init__(self, vad, sample_rate, sample_width=2, pause=0.5, min_speech=0.15,
+                 max_phrase=5.0, preroll=0.3, gate=None, on_onset=None, endpointer=None):
+        self.vad = vad
+        self.bytes_per_second = sample_rate * sample_width
+        self.pause = pause
+        self.min_speech = min_speech
+        self.max_phrase = max_phrase
+        self.preroll_bytes = int(preroll * sample_rate) * sample_width
+        self.gate = gate
+        self.on_onset = on_onset
+        self.endpointer = endpointer
+        self.last_pause = 0.0
+        self._start = None
+        self._last_end = 0
+        self._speech_seconds = 0.0
+        self._silence_seconds = 0.0
+        self.stats = {'frames': 0, 'speech_frames': 0, 'frames_dropped': 0,
+                      'segments_forwarded': 0, 'segments_rejected': 0, 'frames_gated': 0,
+                      'closed_command': 0, 'closed_dictation': 0, 'samples_lost': 0}
+
+    def feed(self, frame, position):
+        """Consume the frame starting at byte ``position``; returns a finished (start, end) or None"""
+        seconds = len(frame) / self.bytes_per_second
+        end = position + len(frame)
+        gated = self.gate is not None and self.gate()
+        speech = self.vad.is_speech(frame, gated)
+        self.stats['frames'] += 1
+        if speech:
+            self.stats['speech_frames'] += 1
+        elif gated:
+            self.stats['frames_gated'] += 1
+
+        if self._start is None:
+            if not speech:
+                self.stats['frames_dropped'] += 1
+                return None
+            # The preroll would be mostly feedback audio while gated
+            self._start = position if gated else max(self._last_end, position - self.preroll_bytes)
+            self._speech_seconds = self._silence_seconds = 0.0
+            if self.on_onset is not None:
+                self.on_onset()
+            if self.endpointer is not None:
+                self.endpointer.reset()
+
+        pause = self.pause if self.endpointer is None else self.endpointer.pause_for(frame, self._speech_seconds)
+        if speech:
+            self._speech_seconds += seconds
+            self._silence_seconds = 0.0
+        else:
+            self._silence_seconds += seconds
+        if self._silence_seconds >= pause or (end - self._start) / self.bytes_per_second >= self.max_phrase:
+            return self._close(end)
+        return None
+
+    def _close(self, end):
+        start, self._start = self._start, None
+        self._last_end = end
+        self.last_pause = self._silence_seconds
+        if self._speech_seconds < self.min_speech:
+            self.stats['segments_rejected'] += 1
+            return None
+        self.stats['segments_forwarded'] += 1
+        if self.endpointer is not None and self.endpointer.kind != 'normal':
+            self.stats['closed_' + self.endpointer.kind] += 1
+        return start, end
+
+    def flush(self, position):
+        """Close any open phrase at end of input, as a long pause would"""
+        if self._start is None:
+            return None
+        return self._close(position)
+
+    def summary(self):
+        floor = self.vad.noise_floor_db
+        return dict(self.stats, noise_floor_db=round(floor, 1) if floor is not None else None)
+
+
+def read_segment(source, segmenter, timeout=1.0):
+    """Read chunks from a MicrophoneRing until a phrase is ready or ``timeout`` passes
+
+    Chunks are inspected in place and only the finished phrase is copied out
+    of the ring. If the microphone lapped the reader, the chunk is placed at
+    the oldest audio still buffered and the skipped samples are counted.
+    """
+    stream = source.stream
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        expected = stream.position
+        frame = stream.read_view(source.CHUNK)
+        position = stream.position - len(frame)
+        if position > expected:
+            segmenter.stats['samples_lost'] += (position - expected) // source.SAMPLE_WIDTH
+        span = segmenter.feed(frame, position)
+        if span:
+            return source.ring.copy(*span)
+    return None
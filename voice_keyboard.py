@@ -1,9 +1,32 @@
+import functools
+import sys
+
+if __name__ == "__main__" and "streamlit" not in sys.modules:
+    # python -m voice_keyboard: run headless, without loading the web UI.
+    # The daemon stands in as the main module, so recognizer worker
+    # processes, which re-import it, never load the UI either.
+    import daemon
+    sys.modules['__main__'] = daemon
+    sys.exit(daemon.main())
+
 import streamlit as st
 import speech_recognition as sr
-import pyttsx3
-import pyautogui
 import time
 
+from activation import ACTIVATION_MODES, PUSH_TO_TALK_KEY, WAKE_PHRASE, create_gate
+from chunking import LONG_PHRASE, ChunkedRecognizer
+from commands import COMMAND_MATCHER, MACROS, execute
+from endpointing import create_endpointer
+from eventlog import DEFAULT_EVENT_LOG, EVENT_LOG
+from injection import create_backend
+from listener_service import MAX_PHRASE, ListenerService
+from metrics import METRICS
+from process_pool import DEFAULT_PROCESSES, ProcessPoolRecognizer
+from fuzzy import CommandCorrector
+from recognizers import (DEFAULT_RECOGNIZER, RECOGNIZER_BACKENDS, CachedRecognizer, CommandModeRecognizer,
+                         RacingRecognizer, create_recognizer)
+from tts import get_queue
+
 # Configure the application
 st.set_page_config(
     page_title="Voice Keyboard Assistant",
@@ -53,89 +76,57 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize text-to-speech engine
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)
+@st.cache_resource
+def get_speech_recognizer():
+    """The shared sr.Recognizer, created once per server rather than on every rerun"""
+    recognizer = sr.Recognizer()
+    recognizer.pause_threshold = 0.5
+    recognizer.energy_threshold = 300
+    return recognizer
 
-# Initialize the recognizer
-r = sr.Recognizer()
-r.pause_threshold = 0.5
-r.energy_threshold = 300
+@st.cache_resource
+def get_keyboard():
+    """Keystrokes go through the configured injection backend (VK_INJECTOR), built once"""
+    return create_backend()
 
-# Configure PyAutoGUI
-pyautogui.FAILSAFE = True
-pyautogui.PAUSE = 0.1
+@st.cache_resource
+def get_recognizer_backend(name, processes=0):
+    """Create each recognizer backend once per server so models load only once"""
+    if processes:
+        return ProcessPoolRecognizer(name, workers=processes)
+    return create_recognizer(name, get_speech_recognizer())
 
-# Command mappings
-SPECIAL_KEYS = {
-    'enter': 'enter',
-    'next line': 'enter',
-    'new line': 'enter',
-    'space': 'space',
-    'tab': 'tab',
-    'backspace': 'backspace',
-    'delete': 'delete',
-    'escape': 'esc',
-    'stop listening': 'stop',  # Special command to stop listening
-}
+@st.cache_resource
+def get_racing_recognizer(names, processes=0):
+    """Several backends racing on every phrase; the first confident answer wins"""
+    return RacingRecognizer([get_recognizer_backend(name, processes) for name in names])
 
-NAVIGATION_KEYS = {
-    'go left': 'left',
-    'go right': 'right',
-    'go up': 'up',
-    'go down': 'down',
-    'word left': ['ctrl', 'left'],
-    'word right': ['ctrl', 'right'],
-    'go to start': 'home',
-    'go to end': 'end',
-    'line start': 'home',
-    'line end': 'end',
-}
+@st.cache_resource
+def get_chunked_recognizer(names, processes=0):
+    """Same backend, with long phrases split into chunks recognized side by side"""
+    return ChunkedRecognizer(get_base_recognizer(names, processes))
 
-SELECTION_KEYS = {
-    'select all': ['ctrl', 'a'],
-    'select word': ['ctrl', 'shift', 'right'],
-    'select line': ['home', 'shift', 'end'],
-    'select next word': ['ctrl', 'shift', 'right'],
-    'select previous word': ['ctrl', 'shift', 'left'],
-    'select up': ['shift', 'up'],
-    'select down': ['shift', 'down'],
-}
+def get_base_recognizer(names, processes=0, chunked=False):
+    """One backend, or a race between them when more than one is chosen"""
+    if chunked:
+        return get_chunked_recognizer(names, processes)
+    if len(names) > 1:
+        return get_racing_recognizer(names, processes)
+    return get_recognizer_backend(names[0], processes)
 
-EDIT_KEYS = {
-    'copy': ['ctrl', 'c'],
-    'paste': ['ctrl', 'v'],
-    'cut': ['ctrl', 'x'],
-    'copy line': ['ctrl', 'l', 'ctrl', 'c'],
-    'cut line': ['ctrl', 'l', 'ctrl', 'x'],
-    'copy word': ['ctrl', 'shift', 'right', 'ctrl', 'c'],
-    'cut word': ['ctrl', 'shift', 'right', 'ctrl', 'x'],
-    'undo': ['ctrl', 'z'],
-    'redo': ['ctrl', 'y'],
-}
+@st.cache_resource
+def get_command_mode_recognizer(names, processes=0, chunked=False):
+    """Same backend steered towards command phrases, with fuzzy correction"""
+    return CommandModeRecognizer(get_base_recognizer(names, processes, chunked), CommandCorrector(COMMAND_MATCHER))
 
-SYMBOLS = {
-    'double quote': '"',
-    'single quote': "'",
-    'open bracket': '(',
-    'close bracket': ')',
-    'square bracket': '[',
-    'close square bracket': ']',
-    'comma': ',',
-    'period': '.',
-    'semicolon': ';',
-    'plus': '+',
-    'minus': '-',
-    'equals': '=',
-    'underscore': '_',
-    'at sign': '@',
-    'hash': '#',
-}
-
-def speak(text):
-    """Text-to-speech output"""
-    engine.say(text)
-    engine.runAndWait()
+@st.cache_resource
+def get_cached_recognizer(names, command_mode=False, processes=0, chunked=False):
+    """Same backend behind a cache of recently recognized command phrases"""
+    if command_mode:
+        backend = get_command_mode_recognizer(names, processes, chunked)
+    else:
+        backend = get_base_recognizer(names, processes, chunked)
+    return CachedRecognizer(backend, cacheable=COMMAND_MATCHER.is_command)
 
 def update_status(message, message_type="info"):
     """Update the status message with appropriate styling"""
@@ -148,99 +139,130 @@ def update_status(message, message_type="info"):
     else:
         st.session_state.message_placeholder.info(message)
 
-def process_command(command):
-    """Process voice commands and execute corresponding actions"""
-    command = command.lower().strip()
-    result = ""
-    
-    # Check for stop command first
-    if command in ['stop', 'stop listening', 'quit', 'exit']:
-        st.session_state.is_listening = False
-        st.rerun()  # Force a rerun to update the UI
-        return "Stopping voice assistant..."
-    
-    # Process the entire command at once
-    if command in SPECIAL_KEYS:
-        if SPECIAL_KEYS[command] == 'stop':
-            st.session_state.is_listening = False
-            st.rerun()  # Force a rerun to update the UI
-            return "Stopping voice assistant..."
-        pyautogui.press(SPECIAL_KEYS[command])
-        result = f"Executed: {command}"
-    elif command in NAVIGATION_KEYS:
-        keys = NAVIGATION_KEYS[command]
-        if isinstance(keys, list):
-            pyautogui.hotkey(*keys)
-        else:
-            pyautogui.press(keys)
-        result = f"Executed: {command}"
-    elif command in SELECTION_KEYS:
-        pyautogui.hotkey(*SELECTION_KEYS[command])
-        result = f"Selected: {command}"
-    elif command in EDIT_KEYS:
-        pyautogui.hotkey(*EDIT_KEYS[command])
-        result = f"Executed: {command}"
-    elif command in SYMBOLS:
-        pyautogui.write(SYMBOLS[command])
-        result = f"Typed symbol: {command}"
-    else:
-        pyautogui.write(command + " ")
-        result = f"Typed: {command}"
-    
+def show_metrics(placeholder):
+    """Per-stage p50/p95 latency and error rates since the server started"""
+    stages = METRICS.snapshot()['stages']
+    if not stages:
+        placeholder.caption("Nothing timed yet; start listening and speak a command.")
+        return
+    placeholder.table([
+        {
+            'stage': stage,
+            'count': summary['count'],
+            'p50 ms': summary['p50_ms'],
+            'p95 ms': summary['p95_ms'],
+            'max ms': summary['max_ms'],
+            'error rate': f"{100 * summary['error_rate']:.1f}%",
+            'errors': ", ".join(f"{kind} {n}" for kind, n in summary['errors'].items()),
+        }
+        for stage, summary in stages.items()
+    ])
+
+STOP_MESSAGE = "Stopping voice assistant..."
+
+def process_command(keyboard, command, typed=""):
+    """Process voice commands and execute corresponding actions
+
+    Runs on the pipeline's injector thread, so it must not touch Streamlit
+    (``keyboard`` is bound when the listener is built); returning
+    STOP_MESSAGE tells the pipeline and the UI to shut down.
+    """
+    # One pass over the utterance splits it into commands and dictated text,
+    # then the whole utterance is typed as a single merged batch
+    result, stop = execute(command, keyboard, typed=typed)
+    if stop:
+        return STOP_MESSAGE
     return result
 
-def listen_continuously():
-    """Listen for voice commands continuously"""
-    try:
-        with sr.Microphone() as source:
-            r.adjust_for_ambient_noise(source, duration=0.5)
-            update_status("🎤 Listening... Speak your command")
-            
-            while st.session_state.is_listening:
-                try:
-                    audio = r.listen(source, timeout=1, phrase_time_limit=5)
-                    text = r.recognize_google(audio).lower()
-                    
-                    if text:
-                        st.session_state.current_query = text
-                        update_status(f"Recognized: {text}", "info")
-                        result = process_command(text)
-                        if result == "Stopping voice assistant...":
-                            st.session_state.is_listening = False
-                            update_status("Voice assistant stopped!", "warning")
-                            break
-                        update_status(result, "success")
-                except sr.WaitTimeoutError:
-                    continue
-                except sr.UnknownValueError:
-                    update_status("Could not understand audio", "error")
-                    continue
-                except sr.RequestError:
-                    update_status("Could not connect to speech recognition service", "error")
-                    st.session_state.is_listening = False
-                    break
-                except Exception as e:
-                    update_status(f"Error: {str(e)}", "error")
-                    st.session_state.is_listening = False
-                    break
-                
-                time.sleep(0.1)
-                
-    except Exception as e:
-        update_status(f"Microphone Error: {str(e)}", "error")
-        st.session_state.is_listening = False
+@st.cache_resource
+def get_listener_service():
+    """One background listener per server; it outlives every script rerun"""
+    keyboard = get_keyboard()
+    return ListenerService(functools.partial(process_command, keyboard), get_speech_recognizer(), keyboard,
+                           COMMAND_MATCHER.is_command, COMMAND_MATCHER.is_prefix, STOP_MESSAGE, feedback=get_queue(),
+                           endpointer_factory=functools.partial(create_endpointer, COMMAND_MATCHER))
+
+@st.cache_resource
+def get_activation_gate(mode, phrase, hotkey):
+    """One gate per setting, so its hotkey listener and spotter outlive reruns"""
+    return create_gate(mode, phrase, hotkey)
+
+ACTIVATION_LABELS = {'always': "Always listening", 'wake': "After a wake phrase", 'push': "While a key is held"}
+
+def selected_names():
+    """The chosen recognizer followed by any others racing it"""
+    name = st.session_state.recognizer_backend
+    return (name,) + tuple(other for other in st.session_state.race_backends if other != name)
+
+def selected_backend():
+    """Recognizer backend chosen in the UI"""
+    names = selected_names()
+    processes = st.session_state.processes
+    chunked = st.session_state.long_dictation
+    if st.session_state.cache_commands:
+        return get_cached_recognizer(names, st.session_state.command_mode, processes, chunked)
+    if st.session_state.command_mode:
+        return get_command_mode_recognizer(names, processes, chunked)
+    return get_base_recognizer(names, processes, chunked)
 
 def main():
     st.title("Voice Keyboard Assistant 🎤")
     
+    # Listening happens in a background service that survives reruns
+    service = get_listener_service()
+    status = service.status()
+    is_listening = status['listening']
+    
     # Initialize session state
-    if 'is_listening' not in st.session_state:
-        st.session_state.is_listening = False
-    if 'current_query' not in st.session_state:
-        st.session_state.current_query = ""
+    if 'recognizer_backend' not in st.session_state:
+        st.session_state.recognizer_backend = DEFAULT_RECOGNIZER
+    if 'streaming' not in st.session_state:
+        st.session_state.streaming = False
+    if 'adaptive_vad' not in st.session_state:
+        st.session_state.adaptive_vad = True
+    if 'race_backends' not in st.session_state:
+        st.session_state.race_backends = []
+    if 'processes' not in st.session_state:
+        st.session_state.processes = 0
+    if 'long_dictation' not in st.session_state:
+        st.session_state.long_dictation = False
+    if 'cache_commands' not in st.session_state:
+        st.session_state.cache_commands = False
+    if 'command_mode' not in st.session_state:
+        st.session_state.command_mode = False
+    if 'endpointing' not in st.session_state:
+        st.session_state.endpointing = True
+    if 'preprocess' not in st.session_state:
+        st.session_state.preprocess = True
+    if 'activation' not in st.session_state:
+        st.session_state.activation = 'always'
+    if 'wake_phrase' not in st.session_state:
+        st.session_state.wake_phrase = WAKE_PHRASE
+    if 'push_key' not in st.session_state:
+        st.session_state.push_key = PUSH_TO_TALK_KEY
+    if 'spoken_feedback' not in st.session_state:
+        st.session_state.spoken_feedback = False
+    if 'event_log' not in st.session_state:
+        st.session_state.event_log = EVENT_LOG.enabled
         
     def toggle_listening():
-        st.session_state.is_listening = not st.session_state.is_listening
+        if service.listening:
+            service.stop()
+        else:
+            service.start(selected_backend(), streaming=st.session_state.streaming,
+                          adaptive_vad=st.session_state.adaptive_vad,
+                          spoken_feedback=st.session_state.spoken_feedback,
+                          preprocess=st.session_state.preprocess,
+                          endpointing=st.session_state.endpointing,
+                          activation=get_activation_gate(st.session_state.activation, st.session_state.wake_phrase,
+                                                         st.session_state.push_key),
+                          max_phrase=LONG_PHRASE if st.session_state.long_dictation else MAX_PHRASE)
+    
+    def toggle_event_log():
+        if st.session_state.event_log:
+            EVENT_LOG.open(EVENT_LOG.path or DEFAULT_EVENT_LOG)
+        else:
+            EVENT_LOG.disable()
     
     # Create tabs
     tab1, tab2 = st.tabs(["Main", "Help"])
@@ -249,6 +271,121 @@ def main():
         # Add test textbox
         st.text_area("Test your voice commands here:", height=200, key="test_area")
         
+        # Recognizer backend, fixed while listening
+        st.selectbox("Recognizer", list(RECOGNIZER_BACKENDS), key="recognizer_backend",
+                     disabled=is_listening)
+        st.multiselect("Race against (send every phrase to these too, keep the first confident answer)",
+                       list(RECOGNIZER_BACKENDS),
+                       key="race_backends", disabled=is_listening)
+        st.number_input(f"Worker processes for offline models (0 = none; this machine suggests {DEFAULT_PROCESSES})",
+                        min_value=0, max_value=32, key="processes", disabled=is_listening)
+        st.checkbox(f"Long dictation (up to {LONG_PHRASE:.0f} s, recognized in chunks side by side)",
+                    key="long_dictation", disabled=is_listening)
+        st.checkbox("Answer repeated short commands from a local cache", key="cache_commands",
+                    disabled=is_listening)
+        st.checkbox("Command mode (prefer commands, fix near misses like \"go lift\")", key="command_mode",
+                    disabled=is_listening)
+        backend = selected_backend()
+        st.checkbox("Streaming dictation (type while speaking)", key="streaming",
+                    disabled=is_listening or not backend.supports_streaming)
+        st.checkbox("Adaptive voice detection (ignore background noise)", key="adaptive_vad",
+                    disabled=is_listening)
+        st.checkbox("Adaptive endpointing (end commands early, let dictation pause longer)", key="endpointing",
+                    disabled=is_listening or not st.session_state.adaptive_vad)
+        st.checkbox("Trim silence and downsample phrases before recognition", key="preprocess",
+                    disabled=is_listening or not backend.sample_rate)
+        st.radio("Recognize speech", ACTIVATION_MODES, format_func=ACTIVATION_LABELS.get, key="activation",
+                 horizontal=True, disabled=is_listening)
+        if st.session_state.activation == 'wake':
+            st.text_input("Wake phrase (needs Vosk and a model)", key="wake_phrase", disabled=is_listening)
+        elif st.session_state.activation == 'push':
+            st.text_input("Push-to-talk key (needs pynput), e.g. scroll_lock, f9 or a letter", key="push_key",
+                          disabled=is_listening)
+        st.checkbox("Spoken feedback (read out commands; talk over it to interrupt)", key="spoken_feedback",
+                    disabled=is_listening)
+        st.checkbox(f"Keep a session log in {EVENT_LOG.path or DEFAULT_EVENT_LOG}", key="event_log",
+                    on_change=toggle_event_log)
+        stats = backend.stats.summary()
+        if stats['count']:
+            st.caption(f"{backend.name}: {stats['count']} phrases, p50 {stats['p50_ms']} ms, "
+                       f"p95 {stats['p95_ms']} ms, {stats['errors']} errors")
+        if isinstance(backend, CachedRecognizer) and backend.cache_stats['hits'] + backend.cache_stats['misses']:
+            cache_stats = backend.cache_stats
+            st.caption(f"Command cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                       f"{cache_stats['evictions']} evictions")
+        if len(selected_names()) > 1:
+            racer = get_racing_recognizer(selected_names(), st.session_state.processes)
+            if racer.race_stats['races']:
+                lead = racer.lead.summary()
+                wins = ", ".join(f"{name} {count}" for name, count in racer.race_stats['wins'].items())
+                st.caption(f"Race wins: {wins}; {racer.race_stats['undecided']} undecided, "
+                           f"{racer.race_stats['sat_out']} sat out while busy, median lead {lead['p50_ms']} ms")
+        if st.session_state.processes:
+            for name in selected_names():
+                pool = get_recognizer_backend(name, st.session_state.processes)
+                if pool.pool_stats['submitted']:
+                    pool_stats = pool.pool_stats
+                    st.caption(f"{name} worker processes: {pool_stats['in_flight']} phrases in flight, "
+                               f"{pool_stats['queued']} queued (at most {pool_stats['max_queued']}), "
+                               f"p95 wait for a worker {pool.queue_wait.summary()['p95_ms']} ms")
+        if st.session_state.long_dictation:
+            chunk_stats = get_chunked_recognizer(selected_names(), st.session_state.processes).chunk_stats
+            if chunk_stats['chunked']:
+                st.caption(f"Long dictation: {chunk_stats['chunked']} phrases split into {chunk_stats['chunks']} "
+                           f"chunks, {chunk_stats['overlap_words']} repeated words removed at the joins")
+        if st.session_state.command_mode:
+            command_stats = get_command_mode_recognizer(selected_names(), st.session_state.processes,
+                                                        st.session_state.long_dictation).command_stats
+            if sum(command_stats.values()):
+                st.caption(f"Command mode: {command_stats['constrained']} matched the command vocabulary, "
+                           f"{command_stats['corrected']} corrected, {command_stats['dictation']} dictation")
+        if status['first_char_stats'] and status['first_char_stats']['count']:
+            first_char = status['first_char_stats']
+            st.caption(f"Streaming time to first character: p50 {first_char['p50_ms']} ms, "
+                       f"p95 {first_char['p95_ms']} ms")
+        if status['vad_stats']:
+            vad_stats = status['vad_stats']
+            st.caption(f"Voice detection: {vad_stats['segments_forwarded']} phrases forwarded, "
+                       f"{vad_stats['segments_rejected']} noise bursts and {vad_stats['frames_dropped']} "
+                       f"silent frames dropped, noise floor {vad_stats['noise_floor_db']} dBFS")
+            if vad_stats['closed_command'] or vad_stats['closed_dictation']:
+                st.caption(f"Endpointing: {vad_stats['closed_command']} commands ended early, "
+                           f"{vad_stats['closed_dictation']} dictated phrases given a longer pause")
+        if status['preprocess_stats'] and status['preprocess_stats']['phrases']:
+            prep = status['preprocess_stats']
+            st.caption(f"Audio preprocessing: {prep['bytes_in'] // 1024} KB in, {prep['bytes_out'] // 1024} KB out "
+                       f"({100 * prep['reduction']:.0f}% less), {prep['seconds_trimmed']} s of silence trimmed and "
+                       f"about {prep['saved_ms']} ms saved per phrase, {prep['preprocess_ms']} ms spent")
+        if status['activation_stats'] and status['activation_stats']['forwarded'] + status['activation_stats']['gated']:
+            gate_stats = status['activation_stats']
+            st.caption(f"Activation: {gate_stats['forwarded']} phrases recognized, {gate_stats['gated']} ignored "
+                       f"({100 * gate_stats['gated_share']:.0f}%, {gate_stats['seconds_gated']} s of audio), "
+                       f"about {gate_stats['saved_ms']} ms of recognition saved, {gate_stats['check_ms']} ms "
+                       f"per check")
+        if COMMAND_MATCHER.stats['reloads']:
+            st.caption(f"Command grammar reloaded {COMMAND_MATCHER.stats['reloads']} times, "
+                       f"last in {COMMAND_MATCHER.stats['reload_ms']} ms")
+        if COMMAND_MATCHER.last_error:
+            st.warning(f"Grammar file has an error, still using the previous commands: {COMMAND_MATCHER.last_error}")
+        if MACROS.last_error:
+            st.warning(f"Macro file has an error: {MACROS.last_error}")
+        if status['feedback_stats'] and status['feedback_stats']['queued']:
+            feedback_stats = status['feedback_stats']
+            st.caption(f"Spoken feedback: {feedback_stats['spoken']} spoken, {feedback_stats['coalesced']} merged, "
+                       f"{feedback_stats['interrupted']} interrupted")
+        
+        with st.expander("Transcript"):
+            if status['history']:
+                st.markdown("\n".join(f"- {text}" for text in reversed(status['history'])))
+            else:
+                st.caption("Nothing recognized yet.")
+        
+        with st.expander("Latency by stage"):
+            metrics_placeholder = st.empty()
+            show_metrics(metrics_placeholder)
+            st.download_button("Download metrics (JSON)", METRICS.to_json(), file_name="voice_keyboard_metrics.json",
+                               mime="application/json")
+        
         st.markdown("---")
         
         col1, col2 = st.columns([1, 1])
@@ -258,27 +395,20 @@ def main():
             st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
             
             # Toggle button with dynamic text
-            button_text = "🎤 Stop Listening" if st.session_state.is_listening else "🎤 Start Listening"
+            button_text = "🎤 Stop Listening" if is_listening else "🎤 Start Listening"
             if st.button(button_text, key="toggle_button", on_click=toggle_listening):
                 pass  # The toggle is handled in the on_click function
             
             # Show status with enhanced styling
-            status_class = "listening" if st.session_state.is_listening else "stopped"
-            status_text = "🔴 Listening..." if st.session_state.is_listening else "⚪ Click to Start"
+            status_class = "listening" if is_listening else "stopped"
+            status_text = "🔴 Listening..." if is_listening else "⚪ Click to Start"
             st.markdown(f"<div class='status-text {status_class}'>{status_text}</div>", unsafe_allow_html=True)
             
-            if st.session_state.is_listening:
-                if 'message_placeholder' not in st.session_state:
-                    st.session_state.message_placeholder = st.empty()
-                update_status("Starting voice assistant... Say commands clearly!")
-                listen_continuously()
-            
             st.markdown("</div>", unsafe_allow_html=True)
         
             # Create a single placeholder for all messages
-            if 'message_placeholder' not in st.session_state:
-                st.session_state.message_placeholder = st.empty()
-                update_status("Click the button to begin")
+            st.session_state.message_placeholder = st.empty()
+            update_status(status['message'], status['message_type'])
         
         with col2:
             st.markdown("""
@@ -292,46 +422,19 @@ def main():
             """)
 
     with tab2:
-        st.markdown("""
-        ### Available Commands
-        
-        #### Basic Navigation
-        - "enter", "next line", "new line"
-        - "space", "tab"
-        - "backspace", "delete"
-        - "escape"
-        - "stop listening", "stop" (stops the assistant)
-        
-        #### Word Operations
-        - "remove word", "delete word"
-        - "capital [word]" (capitalizes next word)
-        - "all caps" (toggles caps lock)
-        
-        #### Navigation
-        - "go left", "go right", "go up", "go down"
-        - "word left", "word right"
-        - "go to start", "go to end"
-        - "line start", "line end"
-        
-        #### Selection
-        - "select word", "select line"
-        - "select next word", "select previous word"
-        - "select up", "select down"
-        - "select all"
-        
-        #### Copy/Paste
-        - "copy", "paste", "cut"
-        - "copy line", "cut line"
-        - "copy word", "cut word"
-        - "undo", "redo"
-        
-        #### Symbols
-        - Quotes: "double quote", "single quote"
-        - Brackets: "open bracket", "close bracket", "square bracket"
-        - Punctuation: "comma", "period", "semicolon"
-        - Math: "plus", "minus", "equals"
-        - Special: "underscore", "at sign", "hash"
-        """)
+        # Generated from the grammar file, so it always lists what actually works
+        st.markdown(COMMAND_MATCHER.help_markdown())
+        st.caption(f"Commands are defined in {COMMAND_MATCHER.path}; edits apply within a second.")
+    
+    # Poll the service while it listens. Clicking a widget just reruns the
+    # script; the microphone and workers keep going in the background.
+    while is_listening:
+        time.sleep(0.3)
+        status = service.status()
+        update_status(status['message'], status['message_type'])
+        show_metrics(metrics_placeholder)
+        if not status['listening']:
+            st.rerun()  # Force a rerun to update the UI
 
 if __name__ == "__main__":
     main()
\ No newline at end of file